@@ -0,0 +1,111 @@
+"""
+В данном модуле описан автомат Ахо-Корасик для поиска множества строк в тексте за один проход.
+Используется индексами автоответчика, автовыдачи и плагинов.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterator, Any
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик.
+
+    Строки добавляются через add(), после чего автомат собирается через build().
+    Время поиска зависит от длины текста и кол-ва найденных совпадений, но не от кол-ва строк в автомате.
+    """
+
+    def __init__(self):
+        self.__goto: list[dict[str, int]] = [{}]  # Переходы бора.
+        self.__fail: list[int] = [0]  # Суффиксные ссылки.
+        self.__output: list[int] = [-1]  # Ближайшая по суффиксным ссылкам вершина с данными (-1 - нет).
+        self.__values: list[list[tuple[int, Any]]] = [[]]  # Данные вершины: [(длина строки, значение), ...].
+        self.__built = True
+        self.size = 0  # Кол-во добавленных строк.
+
+    def add(self, pattern: str, value: Any) -> None:
+        """
+        Добавляет строку в автомат. Одна и та же строка может быть добавлена несколько раз с разными значениями.
+
+        :param pattern: строка (непустая).
+        :param value: значение, возвращаемое при нахождении строки.
+        """
+        if not pattern:
+            raise ValueError("Пустая строка не может быть добавлена в автомат.")
+        node = 0
+        for char in pattern:
+            if (next_node := self.__goto[node].get(char)) is None:
+                next_node = len(self.__goto)
+                self.__goto[node][char] = next_node
+                self.__goto.append({})
+                self.__fail.append(0)
+                self.__output.append(-1)
+                self.__values.append([])
+            node = next_node
+        self.__values[node].append((len(pattern), value))
+        self.__built = False
+        self.size += 1
+
+    def build(self) -> None:
+        """
+        Строит суффиксные ссылки. Должна вызываться после добавления всех строк.
+        """
+        q = deque()
+        for node in self.__goto[0].values():
+            self.__fail[node] = 0
+            self.__output[node] = -1
+            q.append(node)
+        while q:
+            node = q.popleft()
+            for char, child in self.__goto[node].items():
+                fail = self.__fail[node]
+                while fail and char not in self.__goto[fail]:
+                    fail = self.__fail[fail]
+                fail = self.__goto[fail].get(char, 0)
+                self.__fail[child] = fail if fail != child else 0
+                self.__output[child] = fail if self.__values[fail] else self.__output[fail]
+                q.append(child)
+        self.__built = True
+
+    def search(self, text: str) -> Iterator[tuple[int, int, Any]]:
+        """
+        Ищет все вхождения строк автомата в тексте.
+
+        :param text: текст.
+
+        :return: итератор (позиция начала, позиция конца (не включительно), значение).
+        """
+        if not self.__built:
+            self.build()
+        goto, fail, output, values = self.__goto, self.__fail, self.__output, self.__values
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if values[node] else output[node]
+            while match > 0:
+                for length, value in values[match]:
+                    yield i + 1 - length, i + 1, value
+                match = output[match]
+
+    def prefixes(self, text: str) -> Iterator[tuple[int, Any]]:
+        """
+        Ищет строки автомата, являющиеся префиксами текста (в порядке возрастания длины).
+
+        :param text: текст.
+
+        :return: итератор (длина префикса, значение).
+        """
+        goto, values = self.__goto, self.__values
+        node = 0
+        for char in text:
+            if (node := goto[node].get(char)) is None:
+                return
+            for length, value in values[node]:
+                yield length, value
+
+    def __len__(self):
+        return self.size
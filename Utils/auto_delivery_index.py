@@ -0,0 +1,74 @@
+"""
+В данном модуле описан индекс секций конфига автовыдачи (auto_delivery.cfg) для поиска секции по описанию лота.
+"""
+
+from __future__ import annotations
+
+from configparser import ConfigParser
+
+from Utils.aho_corasick import AhoCorasick
+
+
+class AutoDeliveryIndex:
+    """
+    Индекс секций конфига автовыдачи.
+
+    Порядок поиска совпадает с прежним линейным поиском: сначала точное совпадение, затем секция, с которой
+    начинается описание, затем секция, содержащаяся в описании. Если подходит несколько секций, выбирается первая
+    по порядку в конфиге.
+    """
+
+    def __init__(self, auto_delivery_config: ConfigParser):
+        """
+        :param auto_delivery_config: объект конфига автовыдачи (Cardinal.AD_CFG).
+        """
+        self.config = auto_delivery_config
+        # Названия секций в порядке итерации по конфигу (первой идет секция DEFAULT, как и при обходе конфига).
+        self.names: list[str] = list(auto_delivery_config)
+        self.exact: dict[str, int] = {}  # {название секции: порядковый номер}
+        self.automaton = AhoCorasick()
+        self.__empty = None  # Порядковый номер секции с пустым названием (подходит под любое описание).
+
+        for order, name in enumerate(self.names):
+            self.exact.setdefault(name, order)
+            if not name:
+                if self.__empty is None:
+                    self.__empty = order
+                continue
+            self.automaton.add(name, order)
+        self.automaton.build()
+
+    def match(self, description: str) -> str | None:
+        """
+        Ищет секцию для описания лота: точное совпадение -> начало описания -> подстрока описания.
+
+        :param description: описание лота.
+
+        :return: название секции или None.
+        """
+        if (order := self.exact.get(description)) is not None:
+            return self.names[order]
+
+        best = self.__empty
+        for _, order in self.automaton.prefixes(description):
+            if best is None or order < best:
+                best = order
+        if best is not None:
+            return self.names[best]
+        return self.find_substring(description, include_default=True)
+
+    def find_substring(self, description: str, include_default: bool = False) -> str | None:
+        """
+        Ищет первую по порядку в конфиге секцию, название которой содержится в описании лота.
+
+        :param description: описание лота.
+        :param include_default: учитывать ли секцию DEFAULT.
+
+        :return: название секции или None.
+        """
+        default_name = self.config.default_section
+        best = self.__empty
+        for _, _, order in self.automaton.search(description):
+            if (best is None or order < best) and (include_default or self.names[order] != default_name):
+                best = order
+        return self.names[best] if best is not None else None
@@ -0,0 +1,115 @@
+"""
+В данном модуле описан индекс команд автоответчика (auto_response.cfg).
+
+Тип команды задается необязательным параметром matchType секции:
+- exact (по умолчанию): сообщение совпадает с командой;
+- prefix: сообщение начинается с команды;
+- contains: сообщение содержит команду;
+- regex: сообщение соответствует регулярному выражению из параметра regex (по умолчанию - название секции).
+
+Алиасы (команды через "|") раскрываются при загрузке конфига, каждая команда индексируется отдельно.
+"""
+
+from __future__ import annotations
+
+from configparser import ConfigParser
+import logging
+import re
+
+from Utils.aho_corasick import AhoCorasick
+
+logger = logging.getLogger("FPC.auto_response_index")
+
+MATCH_TYPES = ("exact", "prefix", "contains", "regex")
+
+
+class AutoResponseIndex:
+    """
+    Индекс команд автоответчика. Строится один раз по конфигу и пересобирается при его изменении.
+
+    Порядок проверки: exact -> prefix (самая длинная команда) -> contains (первая по порядку в конфиге) ->
+    regex (самое левое совпадение).
+    """
+
+    def __init__(self, auto_response_config: ConfigParser):
+        """
+        :param auto_response_config: объект конфига автоответчика (Cardinal.AR_CFG).
+        """
+        self.config = auto_response_config
+        self.exact: set[str] = set()
+        self.prefix = AhoCorasick()
+        self.contains = AhoCorasick()
+        self.regex: re.Pattern | None = None  # Объединенное регулярное выражение всех regex-команд.
+        self.__regex_sections: dict[str, str] = {}  # {название группы: команда}
+        self.__regex_list: list[tuple[re.Pattern, str]] = []  # Если объединить выражения не удалось.
+
+        regex_parts = []
+        for order, command in enumerate(auto_response_config.sections()):
+            section = auto_response_config[command]
+            match_type = section.get("matchType", "exact").strip().lower()
+            if match_type not in MATCH_TYPES:
+                logger.warning(f"Неизвестный тип команды {match_type} у команды {command}, "
+                               f"используется exact.")  # locale
+                match_type = "exact"
+
+            if match_type == "exact":
+                self.exact.add(command)
+            elif match_type == "prefix":
+                self.prefix.add(command, (order, command))
+            elif match_type == "contains":
+                self.contains.add(command, (order, command))
+            else:
+                pattern = section.get("regex", raw=True) or command
+                try:
+                    self.__regex_list.append((re.compile(pattern, re.IGNORECASE), command))
+                except re.error:
+                    logger.error(f"Некорректное регулярное выражение у команды {command}.")  # locale
+                    logger.debug("TRACEBACK", exc_info=True)
+                    continue
+                group = f"_ar{len(regex_parts)}"
+                regex_parts.append(f"(?P<{group}>{pattern})")
+                self.__regex_sections[group] = command
+
+        self.prefix.build()
+        self.contains.build()
+        if regex_parts:
+            try:
+                self.regex = re.compile("|".join(regex_parts), re.IGNORECASE)
+                self.__regex_list = []
+            except re.error:  # Например, флаги внутри выражения или ссылки на группы по номеру.
+                logger.debug("TRACEBACK", exc_info=True)
+
+    def match(self, text: str) -> str | None:
+        """
+        Ищет команду, которой соответствует текст.
+
+        :param text: текст сообщения (без пробелов по краям, в нижнем регистре).
+
+        :return: название секции команды в конфиге или None.
+        """
+        if text in self.exact:
+            return text
+
+        longest = None
+        for _, value in self.prefix.prefixes(text):
+            longest = value
+        if longest is not None:
+            return longest[1]
+
+        best = None
+        for _, _, value in self.contains.search(text):
+            if best is None or value[0] < best[0]:
+                best = value
+        if best is not None:
+            return best[1]
+
+        if self.regex is not None:
+            if m := self.regex.search(text):
+                return self.__regex_sections[m.lastgroup]
+            return None
+
+        best = None
+        for pattern, command in self.__regex_list:
+            if (m := pattern.search(text)) and (best is None or m.start() < best[0]):
+                best = (m.start(), command)
+        return best[1] if best is not None else None
@@ -0,0 +1,105 @@
+"""
+В данном модуле описан фильтр Блума, хранящийся в файле (битовый массив отображается в память через mmap).
+Используется для поиска дубликатов товаров.
+"""
+
+from __future__ import annotations
+
+from threading import Lock
+import hashlib
+import struct
+import math
+import mmap
+import os
+
+MAGIC = b"FPCBLOOM"
+HEADER = struct.Struct("<QQQ")  # Кол-во бит, кол-во хэш-функций, кол-во добавленных ключей.
+HEADER_SIZE = len(MAGIC) + HEADER.size
+
+
+class BloomFilter:
+    """
+    Фильтр Блума в файле.
+
+    Проверка и добавление ключа - O(1) (k обращений к битовому массиву), память ограничена размером файла,
+    а в памяти процесса находятся только используемые страницы файла.
+    Ложноположительные срабатывания возможны с вероятностью error_rate (при кол-ве ключей не больше capacity),
+    ложноотрицательные - нет.
+    """
+
+    def __init__(self, path: str, capacity: int, error_rate: float):
+        """
+        :param path: путь до файла фильтра (создается, если не существует).
+        :param capacity: расчетное кол-во ключей (используется только при создании файла).
+        :param error_rate: допустимая вероятность ложноположительного срабатывания (используется только
+            при создании файла).
+        """
+        self.path = path
+        self.lock = Lock()
+        self.created = not os.path.exists(path)
+        if self.created:
+            bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+            bits = (bits + 7) // 8 * 8
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(MAGIC + HEADER.pack(bits, hashes, 0))
+                f.truncate(HEADER_SIZE + bits // 8)
+
+        self.__file = open(path, "r+b")
+        self.__mm = mmap.mmap(self.__file.fileno(), 0)
+        if self.__mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Файл {path} не является фильтром Блума.")
+        self.bits, self.hashes, self.count = HEADER.unpack_from(self.__mm, len(MAGIC))
+
+    def __positions(self, key: str) -> list[int]:
+        """
+        Возвращает номера бит ключа (двойное хэширование: h1 + i * h2).
+        """
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        mm = self.__mm
+        return all(mm[HEADER_SIZE + (i >> 3)] & (1 << (i & 7)) for i in self.__positions(key))
+
+    def add(self, key: str) -> bool:
+        """
+        Добавляет ключ в фильтр.
+
+        :param key: ключ.
+
+        :return: True, если ключа не было в фильтре, False, если он (вероятно) уже был добавлен.
+        """
+        positions = self.__positions(key)
+        mm = self.__mm
+        with self.lock:
+            new = False
+            for i in positions:
+                byte, mask = HEADER_SIZE + (i >> 3), 1 << (i & 7)
+                if not mm[byte] & mask:
+                    mm[byte] |= mask
+                    new = True
+            if new:
+                self.count += 1
+                HEADER.pack_into(mm, len(MAGIC), self.bits, self.hashes, self.count)
+        return new
+
+    def flush(self) -> None:
+        """
+        Сбрасывает изменения на диск.
+        """
+        self.__mm.flush()
+
+    def close(self) -> None:
+        """
+        Сбрасывает изменения на диск и закрывает файл.
+        """
+        try:
+            self.__mm.flush()
+            self.__mm.close()
+        except (AttributeError, ValueError):
+            pass
+        self.__file.close()
@@ -0,0 +1,110 @@
+"""
+В данном модуле описан диспетчер событий FunPay.
+События с разными ключами (чаты / заказы) обрабатываются параллельно, события с одинаковым ключом - строго по очереди.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable
+from collections import deque
+from threading import Condition
+import logging
+
+logger = logging.getLogger("FPC.event_dispatcher")
+
+
+class EventDispatcher:
+    """
+    Распределяет события между потоками-обработчиками.
+
+    Ключ события определяет очередь, в которой оно будет обработано: события одного чата / заказа выполняются
+    последовательно в порядке поступления, события разных чатов / заказов - параллельно.
+    События без ключа (None) являются барьерами: диспетчер дожидается завершения всех начатых событий,
+    выполняет барьерное событие и только после этого продолжает раздачу.
+    """
+
+    def __init__(self, handler: Callable[[object], None], key_func: Callable[[object], Hashable | None],
+                 workers: int = 8, max_pending: int = 1000):
+        """
+        :param handler: функция, обрабатывающая одно событие.
+        :param key_func: функция, возвращающая ключ очереди события (None - барьер).
+        :param workers: кол-во потоков-обработчиков.
+        :param max_pending: макс. кол-во принятых, но еще не обработанных событий.
+        """
+        self.handler = handler
+        self.key_func = key_func
+        self.max_pending = max_pending
+
+        self.__pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FPC-events")
+        self.__cond = Condition()
+        self.__queues: dict[Hashable, deque] = {}  # {ключ: ожидающие события}; ключ есть - очередь в работе.
+        self.__pending = 0  # Кол-во принятых, но еще не обработанных событий.
+
+    @property
+    def pending(self) -> int:
+        """
+        Кол-во принятых, но еще не обработанных событий.
+        """
+        return self.__pending
+
+    def dispatch(self, event) -> None:
+        """
+        Передает событие на обработку. Блокирует вызывающий поток, если достигнут лимит max_pending или
+        событие является барьером.
+
+        :param event: событие.
+        """
+        key = self.key_func(event)
+        with self.__cond:
+            if key is None:
+                self.__cond.wait_for(lambda: not self.__pending)
+            else:
+                self.__cond.wait_for(lambda: self.__pending < self.max_pending)
+                self.__pending += 1
+                if key in self.__queues:
+                    self.__queues[key].append(event)
+                    return
+                self.__queues[key] = deque()
+
+        if key is None:
+            self.__handle(event)
+        else:
+            self.__pool.submit(self.__run_queue, key, event)
+
+    def join(self) -> None:
+        """
+        Дожидается обработки всех принятых событий.
+        """
+        with self.__cond:
+            self.__cond.wait_for(lambda: not self.__pending)
+
+    def shutdown(self) -> None:
+        """
+        Дожидается обработки всех принятых событий и останавливает потоки-обработчики.
+        """
+        self.join()
+        self.__pool.shutdown(wait=True)
+
+    def __handle(self, event) -> None:
+        try:
+            self.handler(event)
+        except:
+            logger.error("Произошла ошибка при обработке события.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+
+    def __run_queue(self, key: Hashable, event) -> None:
+        """
+        Последовательно обрабатывает события очереди key, пока она не опустеет.
+        """
+        while True:
+            self.__handle(event)
+            with self.__cond:
+                self.__pending -= 1
+                if self.__queues[key]:
+                    event = self.__queues[key].popleft()
+                else:
+                    del self.__queues[key]
+                    self.__cond.notify_all()
+                    return
+                self.__cond.notify_all()
@@ -0,0 +1,142 @@
+"""
+В данном модуле описаны декларативные фильтры событий FunPay для хэндлеров.
+
+Плагин может объявить рядом с BIND_TO_* словарь HANDLER_FILTERS = {хэндлер: фильтр | [фильтр, ...]},
+где фильтр - словарь с условиями:
+
+- subcategory_ids: ID подкатегорий заказа;
+- message_types: типы сообщений (FunPayAPI.common.enums.MessageTypes);
+- text_prefixes: префиксы текста сообщения (без учета регистра и пробелов в начале);
+- text_regex: регулярное выражение (строка или re.Pattern), которое ищется в тексте сообщения (без пробелов по краям);
+- not_from_me: сообщение отправлено не с аккаунта кардинала;
+- active_dialog: функция (сообщение) -> bool, проверяющая, ведется ли с автором сообщения диалог.
+
+Все условия одного фильтра должны выполняться одновременно, из списка фильтров - хотя бы один.
+Условия, неприменимые к событию (например, text_regex для события нового заказа), считаются выполненными.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Iterable
+import re
+
+if TYPE_CHECKING:
+    from cardinal import Cardinal
+
+
+def get_order_subcategory_id(order) -> int | None:
+    """
+    :param order: заказ (FunPayAPI.types.OrderShortcut).
+
+    :return: ID подкатегории заказа или None, если подкатегория неизвестна.
+    """
+    subcategory = getattr(order, "subcategory", None)
+    return getattr(subcategory, "id", None)
+
+
+class EventFilter:
+    """
+    Фильтр событий. Все заданные условия должны выполняться одновременно.
+    """
+    __slots__ = ("subcategory_ids", "message_types", "text_prefixes", "text_regex", "not_from_me", "active_dialog")
+
+    def __init__(self, subcategory_ids: Iterable[int] | None = None, message_types: Iterable | None = None,
+                 text_prefixes: Iterable[str] | None = None, text_regex: str | re.Pattern | None = None,
+                 not_from_me: bool = False, active_dialog: Callable[[object], bool] | None = None):
+        """
+        :param subcategory_ids: ID подкатегорий заказа.
+        :param message_types: типы сообщений.
+        :param text_prefixes: префиксы текста сообщения.
+        :param text_regex: регулярное выражение для текста сообщения.
+        :param not_from_me: пропускать только сообщения, отправленные не с аккаунта кардинала.
+        :param active_dialog: функция (сообщение) -> bool.
+        """
+        self.subcategory_ids = frozenset(int(i) for i in subcategory_ids) if subcategory_ids is not None else None
+        self.message_types = frozenset(message_types) if message_types is not None else None
+        self.text_prefixes = tuple(i.lower() for i in text_prefixes) if text_prefixes is not None else None
+        self.text_regex = re.compile(text_regex) if isinstance(text_regex, str) else text_regex
+        self.not_from_me = not_from_me
+        self.active_dialog = active_dialog
+
+    def check(self, crd: Cardinal, event) -> bool:
+        """
+        Проверяет, подходит ли событие под фильтр.
+
+        :param crd: объект кардинала.
+        :param event: событие FunPay.
+        """
+        if self.subcategory_ids is not None and (order := getattr(event, "order", None)) is not None:
+            if get_order_subcategory_id(order) not in self.subcategory_ids:
+                return False
+
+        if (message := getattr(event, "message", None)) is None:
+            return True
+        if self.not_from_me and message.author_id == crd.account.id:
+            return False
+        if self.message_types is not None and message.type not in self.message_types:
+            return False
+        if self.text_prefixes is not None or self.text_regex is not None:
+            if message.text is None:
+                return False
+            text = message.text.strip()
+            if self.text_prefixes is not None and not text.lower().startswith(self.text_prefixes):
+                return False
+            if self.text_regex is not None and not self.text_regex.search(text):
+                return False
+        if self.active_dialog is not None and not self.active_dialog(message):
+            return False
+        return True
+
+
+def compile_filters(spec: dict | EventFilter | list[dict | EventFilter]) -> tuple[EventFilter, ...]:
+    """
+    Компилирует объявление фильтров хэндлера (значение из HANDLER_FILTERS).
+
+    :param spec: фильтр или список фильтров (словари с условиями или объекты EventFilter).
+
+    :return: кортеж фильтров.
+    """
+    if isinstance(spec, (dict, EventFilter)):
+        spec = [spec]
+    return tuple(i if isinstance(i, EventFilter) else EventFilter(**i) for i in spec)
+
+
+def check_filters(filters: tuple[EventFilter, ...], crd: Cardinal, event) -> bool:
+    """
+    Проверяет, подходит ли событие хотя бы под один фильтр.
+
+    :param filters: фильтры хэндлера.
+    :param crd: объект кардинала.
+    :param event: событие FunPay.
+    """
+    for f in filters:
+        if f.check(crd, event):
+            return True
+    return False
+
+
+def build_subcategory_index(table: tuple[tuple, ...]) -> dict[int | None, tuple[tuple, ...]] | None:
+    """
+    Строит индекс таблицы хэндлеров по ID подкатегории заказа.
+
+    :param table: таблица хэндлеров: ((хэндлер, имя хэндлера, UUID плагина, фильтры | None), ...).
+
+    :return: {ID подкатегории: подходящие хэндлеры, None: хэндлеры без ограничения по подкатегориям}
+        или None, если ни один хэндлер не ограничен по подкатегориям.
+    """
+    restrictions = []
+    for entry in table:
+        filters = entry[3]
+        if not filters or any(f.subcategory_ids is None for f in filters):
+            restrictions.append(None)
+        else:
+            restrictions.append(frozenset().union(*(f.subcategory_ids for f in filters)))
+
+    all_ids = frozenset().union(*(i for i in restrictions if i is not None))
+    if not all_ids:
+        return None
+    index = {None: tuple(entry for entry, ids in zip(table, restrictions) if ids is None)}
+    for subcategory_id in all_ids:
+        index[subcategory_id] = tuple(entry for entry, ids in zip(table, restrictions)
+                                      if ids is None or subcategory_id in ids)
+    return index
@@ -0,0 +1,126 @@
+"""
+В данном модуле описан журнал событий FunPay (запись событий FunPayAPI.Runner и их воспроизведение).
+Используется для нагрузочного тестирования хэндлеров и плагинов на реальном потоке событий (см. replay.py).
+
+Формат журнала: заголовок MAGIC, затем записи вида <длина: 4 байта, little-endian><pickle>.
+Первая запись - ("header", {...}), остальные - ("event", время получения, runner_tag, событие).
+Журнал содержит pickle-данные: воспроизводите только журналы, записанные вами.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator
+from threading import Lock
+import logging
+import pickle
+import struct
+import time
+import os
+
+logger = logging.getLogger("FPC.event_journal")
+
+MAGIC = b"FPCJOURNAL1\n"
+LENGTH = struct.Struct("<I")
+
+
+class EventJournalWriter:
+    """
+    Записывает события в журнал.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: путь до файла журнала. Если файл существует, он будет перезаписан.
+        """
+        self.path = path
+        self.events = 0  # Кол-во записанных событий.
+        self.skipped = 0  # Кол-во событий, которые не удалось сериализовать.
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.__file = open(path, "wb")
+        self.__file.write(MAGIC)
+        self.__lock = Lock()
+
+    def write_header(self, account_id: int, username: str, profile=None) -> None:
+        """
+        Записывает заголовок журнала (данные аккаунта, на котором записаны события).
+
+        :param account_id: ID аккаунта.
+        :param username: никнейм аккаунта.
+        :param profile: профиль аккаунта (FunPayAPI.types.UserProfile) для воспроизведения хэндлеров, работающих с лотами.
+        """
+        header = {"account_id": account_id, "username": username, "profile": profile, "created": time.time()}
+        try:
+            data = pickle.dumps(("header", header), protocol=pickle.HIGHEST_PROTOCOL)
+        except:
+            logger.warning("Не удалось сохранить профиль аккаунта в журнал событий.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+            header["profile"] = None
+            data = pickle.dumps(("header", header), protocol=pickle.HIGHEST_PROTOCOL)
+        self.__write(data)
+
+    def write_event(self, event) -> None:
+        """
+        Записывает событие в журнал.
+
+        :param event: событие FunPayAPI.Runner.
+        """
+        try:
+            data = pickle.dumps(("event", time.time(), getattr(event, "runner_tag", None), event),
+                                protocol=pickle.HIGHEST_PROTOCOL)
+        except:
+            self.skipped += 1
+            logger.warning(f"Не удалось записать событие {getattr(event, 'type', None)} в журнал.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+            return
+        self.__write(data)
+        self.events += 1
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
+
+    def __write(self, data: bytes) -> None:
+        with self.__lock:
+            self.__file.write(LENGTH.pack(len(data)))
+            self.__file.write(data)
+            self.__file.flush()
+
+
+def read_journal(path: str) -> tuple[dict, Iterator[tuple[float, str | None, object]]]:
+    """
+    Открывает журнал событий.
+
+    :param path: путь до файла журнала.
+
+    :return: заголовок журнала и итератор (время получения, runner_tag, событие).
+    """
+    f = open(path, "rb")
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise ValueError(f"{path} не является журналом событий.")  # locale
+
+    def read_record():
+        raw_length = f.read(LENGTH.size)
+        if len(raw_length) < LENGTH.size:
+            return None
+        length = LENGTH.unpack(raw_length)[0]
+        data = f.read(length)
+        if len(data) < length:
+            logger.warning("Журнал событий обрывается на неполной записи.")  # locale
+            return None
+        return pickle.loads(data)
+
+    first = read_record()
+    if first is None or first[0] != "header":
+        f.close()
+        raise ValueError(f"В журнале {path} отсутствует заголовок.")  # locale
+
+    def events():
+        with f:
+            while (record := read_record()) is not None:
+                if record[0] == "event":
+                    yield record[1], record[2], record[3]
+
+    return first[1], events()
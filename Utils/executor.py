@@ -0,0 +1,171 @@
+"""
+В данном модуле описан общий ограниченный пул потоков кардинала с именованными очередями (lanes).
+Используется вместо создания отдельного Thread() на каждое побочное действие хэндлеров и плагинов.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from threading import Lock, BoundedSemaphore, Condition, Thread
+from typing import Callable
+import itertools
+import logging
+import heapq
+import time
+
+logger = logging.getLogger("FPC.executor")
+
+FUNPAY_IO = "funpay-io"
+TELEGRAM_IO = "telegram-io"
+BACKGROUND = "background"
+
+DEFAULT_LANES = {
+    # название: (кол-во потоков, макс. кол-во задач в очереди)
+    FUNPAY_IO: (8, 500),
+    TELEGRAM_IO: (4, 500),
+    BACKGROUND: (4, 200),
+}
+
+
+class Lane:
+    """
+    Очередь задач с собственным набором потоков.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        """
+        :param name: название очереди.
+        :param workers: кол-во потоков.
+        :param queue_size: макс. кол-во задач, ожидающих свободный поток.
+        """
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"FPC-{name}")
+        self.slots = BoundedSemaphore(workers + queue_size)
+        self.lock = Lock()
+
+        self.queued = 0  # Задачи, ожидающие свободный поток.
+        self.active = 0  # Выполняющиеся задачи.
+        self.submitted = 0  # Всего принято задач.
+        self.completed = 0  # Всего выполнено задач.
+        self.failed = 0  # Задачи, завершившиеся исключением.
+        self.rejected = 0  # Задачи, не поместившиеся в очередь (выполнены в вызывающем потоке).
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {"workers": self.workers, "queue_size": self.queue_size, "queued": self.queued,
+                    "active": self.active, "submitted": self.submitted, "completed": self.completed,
+                    "failed": self.failed, "rejected": self.rejected}
+
+
+class Executor:
+    """
+    Общий ограниченный пул потоков кардинала.
+
+    Задачи распределяются по именованным очередям (lanes), у каждой очереди свой лимит потоков и длины очереди.
+    Если очередь переполнена, задача отклоняется (увеличивается счетчик rejected) и выполняется в вызывающем потоке,
+    что замедляет источник нагрузки вместо создания новых потоков.
+    """
+
+    def __init__(self, lanes: dict[str, tuple[int, int]] | None = None):
+        """
+        :param lanes: {название очереди: (кол-во потоков, макс. кол-во задач в очереди)}.
+        """
+        self.lanes: dict[str, Lane] = {name: Lane(name, *params)
+                                       for name, params in (lanes or DEFAULT_LANES).items()}
+        self.__timers = []  # Куча отложенных задач: (время запуска, порядковый номер, очередь, функция, args, kwargs)
+        self.__timers_counter = itertools.count()
+        self.__timers_cond = Condition()
+        self.__timers_thread: Thread | None = None
+
+    def submit(self, lane: str, func: Callable, *args, **kwargs) -> Future:
+        """
+        Ставит функцию в очередь на выполнение.
+
+        :param lane: название очереди.
+        :param func: функция.
+
+        :return: Future с результатом выполнения функции.
+        """
+        lane_obj = self.lanes[lane]
+        if not lane_obj.slots.acquire(blocking=False):
+            with lane_obj.lock:
+                lane_obj.rejected += 1
+            logger.warning(f"Очередь {lane} переполнена, выполняю задачу {getattr(func, '__name__', func)} "
+                           f"в текущем потоке.")  # locale
+            future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                logger.debug("TRACEBACK", exc_info=True)
+                future.set_exception(e)
+            return future
+
+        with lane_obj.lock:
+            lane_obj.queued += 1
+            lane_obj.submitted += 1
+        try:
+            return lane_obj.pool.submit(self.__run, lane_obj, func, args, kwargs)
+        except RuntimeError:
+            with lane_obj.lock:
+                lane_obj.queued -= 1
+            lane_obj.slots.release()
+            raise
+
+    def schedule(self, delay: float, lane: str, func: Callable, *args, **kwargs) -> None:
+        """
+        Ставит функцию в очередь через delay секунд (вместо threading.Timer).
+        Все отложенные задачи обслуживаются одним потоком.
+
+        :param delay: задержка в секундах.
+        :param lane: название очереди.
+        :param func: функция.
+        """
+        with self.__timers_cond:
+            heapq.heappush(self.__timers, (time.time() + delay, next(self.__timers_counter), lane, func, args, kwargs))
+            if self.__timers_thread is None:
+                self.__timers_thread = Thread(target=self.__timers_loop, daemon=True, name="FPC-timers")
+                self.__timers_thread.start()
+            self.__timers_cond.notify()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        :return: {название очереди: {счетчик: значение}}.
+        """
+        result = {name: lane.stats() for name, lane in self.lanes.items()}
+        with self.__timers_cond:
+            result["timers"] = {"scheduled": len(self.__timers)}
+        return result
+
+    @staticmethod
+    def __run(lane: Lane, func: Callable, args: tuple, kwargs: dict):
+        with lane.lock:
+            lane.queued -= 1
+            lane.active += 1
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with lane.lock:
+                lane.failed += 1
+            logger.error(f"Произошла ошибка при выполнении задачи {getattr(func, '__name__', func)} "
+                         f"в очереди {lane.name}.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+            raise
+        finally:
+            with lane.lock:
+                lane.active -= 1
+                lane.completed += 1
+            lane.slots.release()
+
+    def __timers_loop(self):
+        while True:
+            with self.__timers_cond:
+                while not self.__timers or self.__timers[0][0] > time.time():
+                    self.__timers_cond.wait(self.__timers[0][0] - time.time() if self.__timers else None)
+                _, _, lane, func, args, kwargs = heapq.heappop(self.__timers)
+            try:
+                self.submit(lane, func, *args, **kwargs)
+            except:
+                logger.error(f"Не удалось запустить отложенную задачу {getattr(func, '__name__', func)}.")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
@@ -0,0 +1,134 @@
+"""
+В данном модуле описан сбор статистики выполнения хэндлеров (время, ошибки).
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from threading import Lock
+import logging
+import json
+import math
+import time
+import os
+
+logger = logging.getLogger("FPC.handler_stats")
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """
+    Возвращает p-й перцентиль (0 <= p <= 100) отсортированного списка (метод ближайшего ранга).
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class HandlerRecord:
+    """
+    Статистика одного хэндлера для одного типа события.
+    """
+    __slots__ = ("calls", "errors", "wall_total", "cpu_total", "wall_samples", "cpu_samples", "last_call")
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.wall_total = 0.0
+        self.cpu_total = 0.0
+        self.wall_samples = deque(maxlen=window)
+        self.cpu_samples = deque(maxlen=window)
+        self.last_call = 0.0
+
+
+class HandlerStats:
+    """
+    Собирает время выполнения (реальное и процессорное время потока) и кол-во ошибок хэндлеров,
+    сгруппированные по имени хэндлера, UUID плагина и типу события.
+    Перцентили считаются по последним window вызовам.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        :param window: кол-во последних вызовов, по которым считаются перцентили.
+        """
+        self.window = window
+        self.started = time.time()
+        self.__records: dict[tuple[str, str | None, str], HandlerRecord] = {}
+        self.__lock = Lock()
+
+    def record(self, handler_name: str, plugin_uuid: str | None, event_type: str, wall: float, cpu: float,
+               error: bool) -> None:
+        """
+        Добавляет информацию о вызове хэндлера.
+
+        :param handler_name: имя хэндлера.
+        :param plugin_uuid: UUID плагина (None для встроенных хэндлеров).
+        :param event_type: тип события (название переменной BIND_TO_*).
+        :param wall: реальное время выполнения (сек).
+        :param cpu: процессорное время потока (сек).
+        :param error: завершился ли хэндлер исключением.
+        """
+        key = (handler_name, plugin_uuid, event_type)
+        with self.__lock:
+            if (rec := self.__records.get(key)) is None:
+                rec = self.__records[key] = HandlerRecord(self.window)
+            rec.calls += 1
+            rec.errors += error
+            rec.wall_total += wall
+            rec.cpu_total += cpu
+            rec.wall_samples.append(wall)
+            rec.cpu_samples.append(cpu)
+            rec.last_call = time.time()
+
+    def snapshot(self) -> list[dict]:
+        """
+        :return: список словарей со статистикой хэндлеров (время в миллисекундах),
+            отсортированный по убыванию p95 реального времени.
+        """
+        with self.__lock:
+            items = [(key, rec.calls, rec.errors, rec.wall_total, rec.cpu_total, sorted(rec.wall_samples),
+                      sorted(rec.cpu_samples), rec.last_call) for key, rec in self.__records.items()]
+        result = []
+        for (name, uuid, event_type), calls, errors, wall_total, cpu_total, wall, cpu, last_call in items:
+            result.append({
+                "handler": name,
+                "plugin_uuid": uuid,
+                "event": event_type,
+                "calls": calls,
+                "errors": errors,
+                "wall_total_ms": round(wall_total * 1000, 3),
+                "cpu_total_ms": round(cpu_total * 1000, 3),
+                "wall_p50_ms": round(percentile(wall, 50) * 1000, 3),
+                "wall_p95_ms": round(percentile(wall, 95) * 1000, 3),
+                "wall_p99_ms": round(percentile(wall, 99) * 1000, 3),
+                "cpu_p50_ms": round(percentile(cpu, 50) * 1000, 3),
+                "cpu_p95_ms": round(percentile(cpu, 95) * 1000, 3),
+                "cpu_p99_ms": round(percentile(cpu, 99) * 1000, 3),
+                "last_call": last_call
+            })
+        result.sort(key=lambda x: x["wall_p95_ms"], reverse=True)
+        return result
+
+    def dump(self, path: str = "storage/cache/handlers_stats.json") -> None:
+        """
+        Сохраняет статистику в JSON-файл.
+
+        :param path: путь до файла.
+        """
+        data = {"started": self.started, "dumped": time.time(), "window": self.window,
+                "handlers": self.snapshot()}
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def reset(self) -> None:
+        """
+        Сбрасывает собранную статистику.
+        """
+        with self.__lock:
+            self.__records.clear()
+            self.started = time.time()
@@ -0,0 +1,155 @@
+"""
+В данном модуле описан общий пул HTTP-сессий (Cardinal.http) для плагинов и встроенных модулей.
+
+Для каждого хоста создается своя requests.Session с keep-alive соединениями (до PER_HOST_CONNECTIONS одновременных
+соединений на хост), поэтому повторные запросы к одному API не тратят время на установку TCP / TLS соединения.
+Сессии не сохраняют cookies между запросами (куки нужно передавать явно, как и раньше), чтобы запросы разных
+аккаунтов к одному хосту не смешивались.
+"""
+
+from __future__ import annotations
+
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+from threading import Lock
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+DEFAULT_TIMEOUT = (10, 30)  # (подключение, чтение) в секундах.
+# Для неидемпотентных запросов (создание / оплата заказов): после таймаута чтения запрос мог быть выполнен,
+# поэтому ждем ответа дольше, а при таймауте проверяем результат, а не повторяем запрос (см. is_ambiguous_error).
+LONG_TIMEOUT = (10, 300)
+PER_HOST_CONNECTIONS = 10  # Макс. кол-во одновременных соединений с одним хостом.
+
+
+def is_ambiguous_error(error: Exception) -> bool:
+    """
+    Проверяет, мог ли запрос, завершившийся ошибкой, быть выполнен сервером. Для неидемпотентных запросов (создание /
+    оплата заказов) результат в этом случае неизвестен: повторять запрос или возвращать средства нельзя.
+
+    :param error: исключение, возникшее при выполнении запроса.
+
+    :return: False, если запрос точно не был отправлен (не удалось установить соединение) или получен ответ с
+        ошибкой, иначе - True (таймаут чтения, разрыв соединения, ошибка чтения ответа).
+    """
+    if isinstance(error, (requests.exceptions.ConnectTimeout, requests.exceptions.SSLError,
+                          requests.exceptions.ProxyError)):
+        return False
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+                          requests.exceptions.ContentDecodingError)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = error.args[0] if error.args else None
+        reason = getattr(reason, "reason", reason)  # urllib3.exceptions.MaxRetryError
+        # NewConnectionError / NameResolutionError - наследники ConnectTimeoutError: соединение не установлено.
+        return not isinstance(reason, ConnectTimeoutError)
+    return False
+
+
+class PooledSession(requests.Session):
+    """
+    Сессия с таймаутом по умолчанию и без сохранения cookies.
+    """
+
+    def __init__(self, timeout: float | tuple[float, float], max_connections: int):
+        super().__init__()
+        self.default_timeout = timeout
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        if "timeout" not in kwargs:  # timeout=None - без ограничения.
+            kwargs["timeout"] = self.default_timeout
+        return super().request(method, url, *args, **kwargs)
+
+
+class HttpPool:
+    """
+    Пул HTTP-сессий: одна сессия на хост (и на режим прокси).
+    """
+
+    def __init__(self, proxy_getter: Callable[[], dict] | None = None,
+                 timeout: float | tuple[float, float] = DEFAULT_TIMEOUT, max_connections: int = PER_HOST_CONNECTIONS):
+        """
+        :param proxy_getter: функция, возвращающая прокси в формате requests ({"http": ..., "https": ...}),
+            используется для запросов с use_proxy=True (Cardinal.proxy).
+        :param timeout: таймаут запросов по умолчанию.
+        :param max_connections: макс. кол-во одновременных соединений с одним хостом.
+        """
+        self.proxy_getter = proxy_getter
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.__sessions: dict[tuple[str, bool], PooledSession] = {}
+        self.__lock = Lock()
+
+    def session(self, url: str, use_proxy: bool = False) -> PooledSession:
+        """
+        :param url: URL (или хост) запроса.
+        :param use_proxy: использовать ли прокси Кардинала.
+
+        :return: сессия для хоста.
+        """
+        host = urlsplit(url).netloc or url
+        key = (host, use_proxy)
+        with self.__lock:
+            if (session := self.__sessions.get(key)) is None:
+                session = self.__sessions[key] = PooledSession(self.timeout, self.max_connections)
+        if use_proxy and self.proxy_getter is not None:
+            session.proxies = self.proxy_getter() or {}
+        return session
+
+    def request(self, method: str, url: str, use_proxy: bool = False, **kwargs) -> requests.Response:
+        """
+        Выполняет запрос через сессию хоста (аргументы - как у requests.request).
+
+        :param method: HTTP метод.
+        :param url: URL.
+        :param use_proxy: использовать ли прокси Кардинала.
+        """
+        return self.session(url, use_proxy).request(method, url, **kwargs)
+
+    def get(self, url: str, use_proxy: bool = False, **kwargs) -> requests.Response:
+        return self.request("GET", url, use_proxy, **kwargs)
+
+    def post(self, url: str, use_proxy: bool = False, **kwargs) -> requests.Response:
+        return self.request("POST", url, use_proxy, **kwargs)
+
+    def close(self) -> None:
+        """
+        Закрывает все сессии.
+        """
+        with self.__lock:
+            sessions, self.__sessions = list(self.__sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+_pool: HttpPool | None = None
+_pool_lock = Lock()
+
+
+def get_pool() -> HttpPool:
+    """
+    :return: общий пул HTTP-сессий (тот же, что Cardinal.http). Для кода, у которого нет доступа к Кардиналу.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HttpPool()
+        return _pool
+
+
+def set_pool(pool: HttpPool) -> None:
+    """
+    Заменяет общий пул HTTP-сессий (например, заглушкой в replay.py). Вызывается до создания Кардинала.
+
+    :param pool: новый пул.
+    """
+    global _pool
+    with _pool_lock:
+        _pool = pool
@@ -0,0 +1,55 @@
+"""
+В данном модуле описан поиск лота по описанию заказа для сопоставлений вида {ключ: {"name": название лота, ...}}
+(lot_mapping плагинов auto_smm, autogift и т.д.).
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from Utils.aho_corasick import AhoCorasick
+
+
+class LotNameMatcher:
+    """
+    Индекс названий лотов: все названия ищутся в описании заказа за один проход (без учета регистра).
+
+    Если в описании содержится несколько названий, выбирается самое длинное (самое точное); при одинаковой длине -
+    первое по порядку в сопоставлении. Лот с пустым названием подходит под любое описание, но только если не нашлось
+    другого лота.
+    """
+
+    def __init__(self, lot_mapping: dict[str, dict[str, Any]], name_field: str = "name"):
+        """
+        :param lot_mapping: сопоставление {ключ: данные лота}.
+        :param name_field: поле данных лота с названием.
+        """
+        self.lot_mapping = lot_mapping
+        self.keys: list[str] = list(lot_mapping)
+        self.automaton = AhoCorasick()
+        self.__empty = None  # Порядковый номер лота с пустым названием.
+
+        for order, (key, data) in enumerate(lot_mapping.items()):
+            if name := str(data.get(name_field) or "").casefold():
+                self.automaton.add(name, order)
+            elif self.__empty is None:
+                self.__empty = order
+        self.automaton.build()
+
+    def match(self, description: str) -> tuple[str, dict[str, Any]] | None:
+        """
+        Ищет лот, название которого содержится в описании заказа.
+
+        :param description: описание заказа.
+
+        :return: (ключ, данные лота) или None.
+        """
+        best, best_length = self.__empty, 0
+        for start, end, order in self.automaton.search(description.casefold()):
+            length = end - start
+            if length > best_length or (length == best_length and order < best):
+                best, best_length = order, length
+        if best is None:
+            return None
+        key = self.keys[best]
+        return key, self.lot_mapping[key]
@@ -0,0 +1,60 @@
+"""
+В данном модуле описан индекс описаний лотов одной подкатегории для определения лота по описанию заказа.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from FunPayAPI.types import LotShortcut
+
+from Utils.aho_corasick import AhoCorasick
+
+
+def get_lot_full_description(lot: LotShortcut) -> str:
+    """
+    :param lot: лот.
+
+    :return: описание лота в том виде, в котором оно попадает в описание заказа ("сервер, сторона, описание").
+    """
+    return ", ".join([i for i in [lot.server, lot.side, lot.description] if i])
+
+
+class LotsDescriptionIndex:
+    """
+    Индекс описаний лотов одной подкатегории.
+
+    Лоты упорядочены по убыванию длины описания; если в описании заказа содержатся описания нескольких лотов,
+    выбирается первый из них (самый длинный) за один проход автомата по описанию заказа.
+    """
+
+    def __init__(self, lots: Iterable[LotShortcut]):
+        """
+        :param lots: лоты подкатегории.
+        """
+        self.lots: list[LotShortcut] = sorted(lots, key=lambda l: len(f"{l.server}, {l.side}, {l.description}"),
+                                              reverse=True)
+        self.descriptions: list[str] = [get_lot_full_description(lot) for lot in self.lots]
+        self.automaton = AhoCorasick()
+        self.__empty = None  # Порядковый номер первого лота с пустым описанием (подходит под любой заказ).
+        for rank, description in enumerate(self.descriptions):
+            if description:
+                self.automaton.add(description, rank)
+            elif self.__empty is None:
+                self.__empty = rank
+        self.automaton.build()
+
+    def find(self, order_description: str) -> tuple[str, LotShortcut] | None:
+        """
+        Ищет лот, описание которого содержится в описании заказа.
+
+        :param order_description: описание заказа.
+
+        :return: (описание лота, лот) или None.
+        """
+        best = self.__empty
+        for _, _, rank in self.automaton.search(order_description):
+            if best is None or rank < best:
+                best = rank
+        return (self.descriptions[best], self.lots[best]) if best is not None else None
@@ -0,0 +1,75 @@
+"""
+В данном модуле описан разбор текста сообщения FunPay на части: тексты (по 20 строк), изображения ($photo=ID) и
+паузы ($sleep=сек). Используется Cardinal.parse_message_entities.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from Utils import cardinal_tools
+
+LINES_PER_MESSAGE = 20
+CACHE_MAX_LENGTH = 4096  # Тексты длиннее (например, выдача с множеством товаров) не кэшируются.
+
+
+def split_text(text: str) -> list[str]:
+    """
+    Разбивает текст на суб-тексты по 20 строк.
+
+    :param text: исходный текст.
+
+    :return: список из суб-текстов.
+    """
+    output = []
+    lines = text.split("\n")
+    for i in range(0, len(lines), LINES_PER_MESSAGE):
+        subtext = "\n".join(lines[i:i + LINES_PER_MESSAGE])
+        if (strip := subtext.strip()) and strip != "[a][/a]":
+            output.append(subtext)
+    return output
+
+
+def _parse(msg_text: str) -> tuple[str | int | float, ...]:
+    # Пустые строки внутри текста заменяются на [a][/a] (FunPay удаляет пустые строки), первая и последняя -
+    # остаются пустыми.
+    lines = [i.strip() for i in msg_text.split("\n")]
+    for i in range(1, len(lines) - 1):
+        if not lines[i]:
+            lines[i] = "[a][/a]"
+    msg_text = "\n".join(lines)
+
+    pos = 0
+    entities = []
+    for entity in cardinal_tools.ENTITY_RE.finditer(msg_text):
+        start, end = entity.span()
+        if text := msg_text[pos:start].strip():
+            entities.extend(split_text(text))
+
+        variable = msg_text[start:end]
+        if variable.startswith("$photo"):
+            entities.append(int(variable.split("=")[1]))
+        elif variable.startswith("$sleep"):
+            entities.append(float(variable.split("=")[1]))
+        pos = end
+    if text := msg_text[pos:].strip():
+        entities.extend(split_text(text))
+    return tuple(entities)
+
+
+_parse_cached = lru_cache(maxsize=512)(_parse)
+
+
+def parse_message_entities(msg_text: str) -> list[str | int | float]:
+    """
+    Разбивает сообщения по 20 строк, отделяет изображения от текста.
+    (обозначение изображения: $photo=1234567890, паузы: $sleep=1.5)
+    Результаты для коротких текстов (приветствия, автоответы и т.д.) кэшируются.
+
+    :param msg_text: текст сообщения.
+
+    :return: набор текстов сообщений / изображений / пауз.
+    """
+    if len(msg_text) <= CACHE_MAX_LENGTH:
+        return list(_parse_cached(msg_text))
+    return list(_parse(msg_text))
@@ -0,0 +1,135 @@
+"""
+В данном модуле описано хранилище пользователей, которым уже отправлялось приветствие / которые уже писали
+(Cardinal.old_users).
+
+Хранилище - словарь {ID чата: время}, изменения которого не записываются на диск сразу, а накапливаются и
+дописываются в журнал (storage/cache/old_users.log, строки "ID_чата время") пачками: при накоплении FLUSH_COUNT
+изменений или по таймеру (Cardinal.old_users_loop). Когда в журнале становится слишком много устаревших записей,
+он переписывается заново без них и без записей старше задержки приветствия.
+"""
+
+from __future__ import annotations
+
+from threading import Lock
+from typing import Iterator
+import logging
+import time
+import os
+
+from Utils import cardinal_tools
+
+logger = logging.getLogger("FPC.old_users")
+
+FLUSH_COUNT = 100  # Кол-во изменений, после которого они сразу записываются в журнал.
+COMPACT_MIN_RECORDS = 10_000  # Мин. кол-во записей в журнале для его сжатия.
+
+
+class OldUsersStore:
+    """
+    Хранилище {ID чата: время последнего сообщения / приветствия} с отложенной записью на диск.
+    Поддерживает операции словаря, которые используются с Cardinal.old_users (in, get, [], keys).
+    """
+
+    def __init__(self, greetings_cooldown: float, path: str = "storage/cache/old_users.log"):
+        """
+        :param greetings_cooldown: задержка приветствия (в днях); записи старше удаляются при сжатии журнала.
+        :param path: путь до журнала.
+        """
+        self.path = path
+        self.greetings_cooldown = greetings_cooldown
+        self.__users: dict[int, int] = {}
+        self.__pending: list[tuple[int, int]] = []  # Изменения, еще не записанные в журнал.
+        self.__records = 0  # Кол-во записей в журнале.
+        self.__lock = Lock()
+        self.__file_lock = Lock()
+        self.__load()
+
+    def __load(self) -> None:
+        """
+        Загружает журнал. Если журнала нет, переносит данные из старого формата (storage/cache/old_users.json).
+        """
+        if not os.path.exists(self.path):
+            self.__users = {int(k): int(v) for k, v in
+                            cardinal_tools.load_old_users(self.greetings_cooldown).items()}
+            self.compact()
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    chat_id, timestamp = line.split()
+                    self.__users[int(chat_id)] = int(timestamp)
+                except ValueError:  # Недописанная строка в конце журнала.
+                    continue
+                self.__records += 1
+        self.__expire()
+
+    def __expire(self) -> None:
+        """
+        Удаляет записи старше задержки приветствия.
+        """
+        border = time.time() - self.greetings_cooldown * 24 * 60 * 60
+        self.__users = {k: v for k, v in self.__users.items() if v > border}
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.__users
+
+    def __getitem__(self, chat_id: int) -> int:
+        return self.__users[chat_id]
+
+    def __setitem__(self, chat_id: int, timestamp: int | float) -> None:
+        timestamp = int(timestamp)
+        with self.__lock:
+            self.__users[chat_id] = timestamp
+            self.__pending.append((chat_id, timestamp))
+            flush = len(self.__pending) >= FLUSH_COUNT
+        if flush:
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self.__users)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self.__users))
+
+    def get(self, chat_id: int, default: int | None = None) -> int | None:
+        return self.__users.get(chat_id, default)
+
+    def keys(self) -> list[int]:
+        return list(self.__users)
+
+    def items(self) -> list[tuple[int, int]]:
+        return list(self.__users.items())
+
+    def flush(self) -> None:
+        """
+        Дописывает накопленные изменения в журнал. Сжимает журнал, если устаревших записей в нем больше, чем
+        актуальных.
+        """
+        with self.__lock:
+            pending, self.__pending = self.__pending, []
+        if pending:
+            with self.__file_lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{chat_id} {timestamp}\n" for chat_id, timestamp in pending))
+                self.__records += len(pending)
+        if self.__records >= COMPACT_MIN_RECORDS and self.__records > 2 * len(self.__users):
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Переписывает журнал: удаляет устаревшие записи и записи старше задержки приветствия.
+        """
+        with self.__file_lock:
+            with self.__lock:
+                self.__expire()
+                users = list(self.__users.items())
+                self.__pending = []
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+                f.write("".join(f"{chat_id} {timestamp}\n" for chat_id, timestamp in users))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{self.path}.tmp", self.path)
+            self.__records = len(users)
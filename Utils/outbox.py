@@ -0,0 +1,277 @@
+"""
+В данном модуле описана очередь исходящих сообщений FunPay (Cardinal.outbox).
+
+- Сообщения одного чата отправляются строго по очереди (FIFO), сообщения разных чатов - параллельно.
+- Из готовых к отправке чатов первым выбирается чат с самым приоритетным сообщением в очереди
+  (выдача товара > автоответ > прочее > приветствие > напоминание).
+- Все запросы отправки (текст / изображение) проходят через общий лимит (token bucket); при ответе 429 лимит
+  приостанавливается для всех отправителей.
+- Паузы (задержки между частями сообщения, ожидание перед повторной попыткой) не занимают поток отправки: функция
+  отправки возвращает Defer, и продолжение выполняется по таймеру. Чат на время паузы остается занятым, поэтому
+  порядок сообщений в чате сохраняется.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future
+from collections import deque
+from threading import Condition, Thread
+from typing import Callable, Hashable
+import itertools
+import logging
+import random
+import heapq
+import time
+
+logger = logging.getLogger("FPC.outbox")
+
+# Приоритеты (меньше - важнее).
+DELIVERY = 0
+AUTO_RESPONSE = 10
+NORMAL = 20
+GREETING = 30
+REMINDER = 40
+
+RATE = 2.0  # Кол-во запросов отправки в секунду.
+BURST = 6  # Макс. кол-во запросов отправки подряд без ожидания.
+WORKERS = 4  # Кол-во потоков отправки.
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """
+    Возвращает задержку перед повторной попыткой: экспоненциальный рост со случайным разбросом
+    (от половины до полной задержки), чтобы отправители не повторяли запросы одновременно.
+
+    :param attempt: номер повторной попытки (с 0).
+    :param base: задержка первой попытки (сек).
+    :param cap: макс. задержка (сек).
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket:
+    """
+    Общий лимит запросов. Ожидающие получают токены в порядке приоритета.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        :param rate: кол-во токенов в секунду.
+        :param capacity: макс. кол-во накопленных токенов.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = float(capacity)
+        self.__updated = time.monotonic()
+        self.__paused_until = 0.0
+        self.__waiters = []  # Куча (приоритет, порядковый номер).
+        self.__counter = itertools.count()
+        self.__cond = Condition()
+
+    def __refill(self, now: float) -> None:
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+    def acquire(self, priority: int = NORMAL) -> None:
+        """
+        Ожидает и забирает токен.
+
+        :param priority: приоритет ожидающего.
+        """
+        with self.__cond:
+            me = (priority, next(self.__counter))
+            heapq.heappush(self.__waiters, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.__refill(now)
+                    if self.__waiters[0] == me and now >= self.__paused_until and self.__tokens >= 1:
+                        self.__tokens -= 1
+                        return
+                    if self.__waiters[0] != me:
+                        wait = None
+                    elif now < self.__paused_until:
+                        wait = self.__paused_until - now
+                    else:
+                        wait = (1 - self.__tokens) / self.rate
+                    self.__cond.wait(wait)
+            finally:
+                self.__waiters.remove(me)
+                heapq.heapify(self.__waiters)
+                self.__cond.notify_all()
+
+    def try_acquire(self) -> float:
+        """
+        Забирает токен без ожидания (если нет других ожидающих).
+
+        :return: 0, если токен получен, иначе - примерное время ожидания токена (сек).
+        """
+        with self.__cond:
+            now = time.monotonic()
+            self.__refill(now)
+            if now < self.__paused_until:
+                return self.__paused_until - now
+            if self.__waiters or self.__tokens < 1:
+                return max((1 - self.__tokens) / self.rate, 0.01)
+            self.__tokens -= 1
+            return 0.0
+
+    def pause(self, delay: float) -> None:
+        """
+        Приостанавливает выдачу токенов на delay секунд (например, после ответа 429).
+        """
+        with self.__cond:
+            self.__paused_until = max(self.__paused_until, time.monotonic() + delay)
+            self.__tokens = 0
+            self.__cond.notify_all()
+
+
+class Defer:
+    """
+    Результат функции отправки: продолжить отправку через delay секунд вызовом func(*args, **kwargs).
+    Результат продолжения становится результатом сообщения (Future).
+    """
+    __slots__ = ("delay", "func", "args", "kwargs")
+
+    def __init__(self, delay: float, func: Callable, *args, **kwargs):
+        self.delay = delay
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+
+class OutboundMessage:
+    """
+    Сообщение в очереди отправки.
+    """
+    __slots__ = ("chat_id", "priority", "seq", "func", "args", "kwargs", "future")
+
+    def __init__(self, chat_id: Hashable, priority: int, seq: int, func: Callable, args: tuple, kwargs: dict):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class Outbox:
+    """
+    Очередь исходящих сообщений: FIFO-очереди чатов, приоритеты, общий лимит запросов.
+    """
+
+    def __init__(self, workers: int = WORKERS, rate: float = RATE, burst: int = BURST):
+        """
+        :param workers: кол-во потоков отправки.
+        :param rate: кол-во запросов отправки в секунду.
+        :param burst: макс. кол-во запросов отправки подряд без ожидания.
+        """
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self.__queues: dict[Hashable, deque[OutboundMessage]] = {}
+        self.__ready = []  # Куча (приоритет, порядковый номер, ID чата); возможны устаревшие записи.
+        self.__deferred = []  # Куча (время продолжения, порядковый номер, сообщение).
+        self.__resumed = []  # Куча (приоритет, порядковый номер, сообщение) - продолжения, время которых наступило.
+        self.__in_flight: set[Hashable] = set()  # Чаты, сообщение в которые отправляется прямо сейчас.
+        self.__counter = itertools.count()
+        self.__cond = Condition()
+        self.__threads: list[Thread] = []
+
+    def submit(self, chat_id: Hashable, priority: int, func: Callable, *args, **kwargs) -> Future:
+        """
+        Ставит отправку сообщения в очередь чата.
+
+        :param chat_id: ID чата.
+        :param priority: приоритет (DELIVERY, AUTO_RESPONSE, NORMAL, GREETING, REMINDER).
+        :param func: функция отправки (выполняется в потоке отправки).
+
+        :return: Future с результатом функции отправки.
+        """
+        msg = OutboundMessage(chat_id, priority, next(self.__counter), func, args, kwargs)
+        with self.__cond:
+            self.__queues.setdefault(chat_id, deque()).append(msg)
+            if chat_id not in self.__in_flight:
+                heapq.heappush(self.__ready, (priority, msg.seq, chat_id))
+            if not self.__threads:
+                for i in range(self.workers):
+                    thread = Thread(target=self.__loop, daemon=True, name=f"FPC-outbox-{i}")
+                    thread.start()
+                    self.__threads.append(thread)
+            self.__cond.notify()
+        return msg.future
+
+    def stats(self) -> dict[str, int]:
+        """
+        :return: {"chats": кол-во чатов с сообщениями в очереди, "queued": кол-во сообщений в очереди,
+            "in_flight": кол-во отправляемых сообщений}.
+        """
+        with self.__cond:
+            return {"chats": len(self.__queues), "queued": sum(len(i) for i in self.__queues.values()),
+                    "in_flight": len(self.__in_flight), "deferred": len(self.__deferred)}
+
+    def __next(self) -> OutboundMessage:
+        """
+        Ожидает и забирает первое сообщение самого приоритетного чата, не занятого другим потоком
+        (или продолжение отложенной отправки, время которого наступило).
+        """
+        with self.__cond:
+            while True:
+                now = time.monotonic()
+                while self.__deferred and self.__deferred[0][0] <= now:
+                    _, _, msg = heapq.heappop(self.__deferred)
+                    heapq.heappush(self.__resumed, (msg.priority, msg.seq, msg))
+                while self.__ready and (self.__ready[0][2] in self.__in_flight or
+                                        not self.__queues.get(self.__ready[0][2])):
+                    heapq.heappop(self.__ready)
+                if self.__resumed and (not self.__ready or self.__resumed[0][:2] < self.__ready[0][:2]):
+                    return heapq.heappop(self.__resumed)[2]  # Чат уже занят этим сообщением.
+                if self.__ready:
+                    _, _, chat_id = heapq.heappop(self.__ready)
+                    queue = self.__queues[chat_id]
+                    msg = queue.popleft()
+                    if not queue:
+                        del self.__queues[chat_id]
+                    self.__in_flight.add(chat_id)
+                    return msg
+                self.__cond.wait(self.__deferred[0][0] - now if self.__deferred else None)
+
+    def __defer(self, msg: OutboundMessage, defer: Defer) -> None:
+        """
+        Откладывает продолжение отправки сообщения; чат остается занятым.
+        """
+        msg.func, msg.args, msg.kwargs = defer.func, defer.args, defer.kwargs
+        with self.__cond:
+            heapq.heappush(self.__deferred, (time.monotonic() + max(defer.delay, 0), msg.seq, msg))
+            self.__cond.notify_all()  # Ожидающие потоки пересчитывают время ожидания.
+
+    def __done(self, chat_id: Hashable) -> None:
+        with self.__cond:
+            self.__in_flight.discard(chat_id)
+            if queue := self.__queues.get(chat_id):
+                # Чат встает в очередь с приоритетом самого важного из оставшихся сообщений.
+                best = min(queue, key=lambda i: (i.priority, i.seq))
+                heapq.heappush(self.__ready, (best.priority, best.seq, chat_id))
+                self.__cond.notify()
+
+    def __loop(self):
+        while True:
+            msg = self.__next()
+            deferred = False
+            try:
+                if msg.future.running() or msg.future.set_running_or_notify_cancel():
+                    try:
+                        result = msg.func(*msg.args, **msg.kwargs)
+                    except Exception as e:
+                        logger.debug("TRACEBACK", exc_info=True)
+                        msg.future.set_exception(e)
+                    else:
+                        if isinstance(result, Defer):
+                            self.__defer(msg, result)
+                            deferred = True
+                        else:
+                            msg.future.set_result(result)
+            finally:
+                if not deferred:
+                    self.__done(msg.chat_id)
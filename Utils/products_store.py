@@ -0,0 +1,868 @@
+"""
+В данном модуле описано хранилище товаров автовыдачи (storage/products/*).
+
+Файлы товаров остаются обычными текстовыми файлами (один товар на строку, пустые строки игнорируются).
+Выданные товары не вырезаются из файла, а затираются символами переноса строки на месте, поэтому файл
+остается корректным для всех, кто читает его как текст (cardinal_tools, панель Telegram), а выдача N товаров
+требует чтения и записи только N строк.
+
+Рядом с файлом (в storage/cache/products/) хранятся:
+- <файл>.idx - смещения непустых строк файла;
+- <файл>.head - номер первой невыданной строки, размер и время изменения файла (обновляется с fsync).
+
+Если файл был изменен извне (не совпадают размер / время изменения), индекс строится заново одним проходом.
+Когда затертая часть файла становится больше половины файла, файл сжимается.
+
+Для поиска дубликатов ведутся два фильтра Блума (storage/cache/products/*.bloom): все когда-либо загруженные
+товары (add_products) и все выданные товары (commit).
+
+Для выдачи товаров используются резервы (reserve -> commit / release): зарезервированные товары убираются из файла
+и записываются в журнал резервов (storage/cache/products/reservations.journal). Если Кардинал завершился до
+подтверждения или отмены резерва, товары возвращаются в файл при следующем запуске (recover).
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Any, BinaryIO, Iterator
+from dataclasses import dataclass, field
+from threading import Lock
+from array import array
+import logging
+import json
+import time
+import uuid
+import re
+import os
+
+from Utils.exceptions import NoProductsError, NotEnoughProductsError
+from Utils.bloom_filter import BloomFilter
+
+logger = logging.getLogger("FPC.products_store")
+
+CHUNK_SIZE = 1024 * 1024
+COMPACT_MIN_BYTES = 4 * 1024 * 1024  # Мин. размер затертой части файла для сжатия.
+RESERVATION_TIMEOUT = 600  # Время (в секундах), через которое неподтвержденный резерв отменяется.
+JOURNAL_COMPACT_BYTES = 64 * 1024  # Размер журнала резервов, после которого он очищается (при отсутствии резервов).
+KEYS_CAPACITY = 20_000_000  # Расчетное кол-во товаров в фильтрах дубликатов (~36 МБ на фильтр).
+KEYS_ERROR_RATE = 0.001  # Вероятность ложного срабатывания фильтров дубликатов.
+LINE_SEPARATORS = re.compile(rb"\r\n|\r|\n")
+
+
+def _atomic_write(path: str, data: bytes, tmp_path: str | None = None) -> None:
+    """
+    Атомарно записывает данные в файл (через временный файл и os.replace) с fsync.
+    """
+    tmp_path = tmp_path or f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ProductsFile:
+    """
+    Состояние одного файла товаров: смещения непустых строк и номер первой невыданной строки.
+    """
+
+    def __init__(self, path: str, cache_folder: str):
+        """
+        :param path: путь до файла товаров.
+        :param cache_folder: папка для индексов.
+        """
+        self.path = path
+        name = os.path.basename(path)
+        self.head_path = os.path.join(cache_folder, f"{name}.head")
+        self.index_path = os.path.join(cache_folder, f"{name}.idx")
+        self.tmp_path = os.path.join(cache_folder, f"{name}.tmp")  # Не в папке товаров, чтобы не попасть в списки.
+        self.append_path = os.path.join(cache_folder, f"{name}.append")  # Размер файла до незавершенной дозаписи.
+        self.lock = Lock()
+
+        self.starts = array("Q")  # Начала непустых строк (байты).
+        self.ends = array("Q")  # Концы непустых строк (байты, без \r\n).
+        self.pos = 0  # Номер первой невыданной строки.
+        self.generation = ""  # Идентификатор индекса (совпадает в .head и .idx).
+        self.size = -1  # Размер файла на момент последней синхронизации.
+        self.mtime_ns = -1  # Время изменения файла на момент последней синхронизации.
+
+    @property
+    def count(self) -> int:
+        """
+        Кол-во невыданных товаров.
+        """
+        return len(self.starts) - self.pos
+
+    def ensure_loaded(self) -> None:
+        """
+        Проверяет актуальность индекса и при необходимости загружает его с диска или строит заново.
+        """
+        stat = os.stat(self.path)
+        if (stat.st_size, stat.st_mtime_ns) == (self.size, self.mtime_ns):
+            return
+        if os.path.exists(self.append_path):  # Дозапись файла была прервана - откатываем ее.
+            with open(self.append_path, "r", encoding="utf-8") as f:
+                size = int(f.read())
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+                f.flush()
+                os.fsync(f.fileno())
+            os.remove(self.append_path)
+            logger.warning(f"Незавершенная загрузка товаров в файл {self.path} отменена.")  # locale
+            stat = os.stat(self.path)
+        if self.__load(stat):
+            return
+        self.__scan(stat)
+
+    def take(self, amount: int) -> list[str]:
+        """
+        Выдает amount товаров (затирает их в файле и сдвигает указатель).
+        Индекс должен быть актуален (ensure_loaded).
+        """
+        first, last = self.pos, self.pos + amount - 1
+        start, end = self.starts[first], self.ends[last]
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            data = f.read(end - start)
+            products = [data[self.starts[i] - start:self.ends[i] - start].decode("utf-8")
+                        for i in range(first, last + 1)]
+            f.seek(start)
+            f.write(b"\n" * (end - start))
+            f.flush()
+            os.fsync(f.fileno())
+        self.pos += amount
+        self.__save_head()
+        if self.pos < len(self.starts):
+            blank = self.starts[self.pos]
+        else:
+            blank = self.size
+        if blank >= COMPACT_MIN_BYTES and blank * 2 >= self.size:
+            self.compact()
+        return products
+
+    def peek(self, amount: int) -> list[str]:
+        """
+        Возвращает первые amount невыданных товаров, не выдавая их.
+        Индекс должен быть актуален (ensure_loaded).
+        """
+        last = min(self.pos + amount, len(self.starts))
+        products = []
+        with open(self.path, "rb") as f:
+            for i in range(self.pos, last):
+                f.seek(self.starts[i])
+                products.append(f.read(self.ends[i] - self.starts[i]).decode("utf-8"))
+        return products
+
+    def append(self, products: list[str]) -> None:
+        """
+        Дописывает товары в конец файла одной записью.
+        Индекс должен быть актуален (ensure_loaded).
+        """
+        lines = [i.encode("utf-8") for i in products if i]
+        if not lines:
+            return
+        with open(self.path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            prefix = b""
+            if offset:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    prefix = b"\n"
+            f.write(prefix + b"\n".join(lines) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        offset += len(prefix)
+        for line in lines:
+            self.starts.append(offset)
+            self.ends.append(offset + len(line))
+            offset += len(line) + 1
+        self.__save_index()
+        self.__save_head()
+
+    def append_file(self, source: str, starts: array, ends: array) -> None:
+        """
+        Дописывает в конец файла содержимое другого файла (товары, разделенные \\n). Если дозапись будет прервана,
+        она откатывается при следующей загрузке индекса.
+        Индекс должен быть актуален (ensure_loaded).
+
+        :param source: путь до файла с товарами.
+        :param starts: начала товаров в файле source.
+        :param ends: концы товаров в файле source.
+        """
+        if not starts:
+            return
+        size = self.size
+        _atomic_write(self.append_path, str(size).encode())
+        with open(self.path, "r+b") as f, open(source, "rb") as src:
+            f.seek(size)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            offset = f.tell()
+            while chunk := src.read(CHUNK_SIZE):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        # Данные уже на диске: если упасть до сохранения индекса, он будет перестроен по файлу, а откат по метке
+        # стер бы записанные товары.
+        os.remove(self.append_path)
+        self.starts.extend(i + offset for i in starts)
+        self.ends.extend(i + offset for i in ends)
+        self.__save_index()
+        self.__save_head()
+
+    def put_back(self, products: list[str]) -> None:
+        """
+        Возвращает товары в начало очереди (на место затертых строк, если хватает места, иначе - перезаписью файла).
+        Индекс должен быть актуален (ensure_loaded).
+        """
+        lines = [i.encode("utf-8") for i in products if i]
+        if not lines:
+            return
+        data = b"\n".join(lines) + b"\n"
+        head = self.starts[self.pos] if self.pos < len(self.starts) else self.size
+        region = head - len(data)
+
+        if self.pos >= len(lines) and region >= 0:
+            with open(self.path, "r+b") as f:
+                if region:
+                    f.seek(region - 1)
+                    in_place = f.read(1) == b"\n"
+                else:
+                    in_place = True
+                if in_place:
+                    f.seek(region)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if in_place:
+                offset = region
+                self.pos -= len(lines)
+                for i, line in enumerate(lines):
+                    self.starts[self.pos + i] = offset
+                    self.ends[self.pos + i] = offset + len(line)
+                    offset += len(line) + 1
+                self.__save_index()
+                self.__save_head()
+                return
+
+        # Не хватает места: перезаписываем файл (возвращенные товары + невыданные товары).
+        with open(self.path, "rb") as f:
+            f.seek(head)
+            rest = f.read()
+        _atomic_write(self.path, data + rest, self.tmp_path)
+        self.__scan(os.stat(self.path))
+
+    def compact(self) -> None:
+        """
+        Удаляет затертую часть файла (переписывает файл начиная с первой невыданной строки).
+        """
+        head = self.starts[self.pos] if self.pos < len(self.starts) else self.size
+        tmp_path = self.tmp_path
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            src.seek(head)
+            while chunk := src.read(CHUNK_SIZE):
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.path)
+        self.starts = array("Q", (i - head for i in self.starts[self.pos:]))
+        self.ends = array("Q", (i - head for i in self.ends[self.pos:]))
+        self.pos = 0
+        self.generation = uuid.uuid4().hex
+        self.__save_index()
+        self.__save_head()
+        logger.info(f"Файл товаров {self.path} сжат.")  # locale
+
+    def __scan(self, stat: os.stat_result) -> None:
+        """
+        Строит индекс одним проходом по файлу.
+        """
+        starts, ends = array("Q"), array("Q")
+        offset = 0
+        tail = b""
+        with open(self.path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                buffer = tail + chunk
+                base = offset - len(tail)
+                line_start = 0
+                while (nl := buffer.find(b"\n", line_start)) != -1:
+                    line_end = nl - 1 if nl > line_start and buffer[nl - 1] == 13 else nl  # 13 = \r
+                    if line_end > line_start:
+                        starts.append(base + line_start)
+                        ends.append(base + line_end)
+                    line_start = nl + 1
+                tail = buffer[line_start:]
+                offset += len(chunk)
+        if tail:
+            line_end = len(tail) - 1 if tail.endswith(b"\r") else len(tail)
+            if line_end > 0:
+                starts.append(offset - len(tail))
+                ends.append(offset - len(tail) + line_end)
+
+        self.starts, self.ends, self.pos = starts, ends, 0
+        self.generation = uuid.uuid4().hex
+        self.size, self.mtime_ns = stat.st_size, stat.st_mtime_ns
+        try:
+            self.__save_index()
+            self.__save_head()
+        except:
+            logger.warning(f"Не удалось сохранить индекс файла товаров {self.path}.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+
+    def __load(self, stat: os.stat_result) -> bool:
+        """
+        Загружает индекс с диска, если он соответствует файлу.
+        """
+        try:
+            with open(self.head_path, "r", encoding="utf-8") as f:
+                head = json.load(f)
+            if (head["size"], head["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                return False
+            with open(self.index_path, "rb") as f:
+                if f.readline().decode().strip() != head["generation"]:
+                    return False
+                starts, ends = array("Q"), array("Q")
+                count = head["count"]
+                starts.fromfile(f, count)
+                ends.fromfile(f, count)
+        except (OSError, EOFError, ValueError, KeyError):
+            return False
+        self.starts, self.ends, self.pos = starts, ends, head["pos"]
+        self.generation = head["generation"]
+        self.size, self.mtime_ns = stat.st_size, stat.st_mtime_ns
+        return True
+
+    def __save_index(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        _atomic_write(self.index_path, f"{self.generation}\n".encode() + self.starts.tobytes() + self.ends.tobytes())
+
+    def __save_head(self) -> None:
+        stat = os.stat(self.path)
+        self.size, self.mtime_ns = stat.st_size, stat.st_mtime_ns
+        os.makedirs(os.path.dirname(self.head_path) or ".", exist_ok=True)
+        head = {"generation": self.generation, "count": len(self.starts), "pos": self.pos,
+                "size": self.size, "mtime_ns": self.mtime_ns}
+        _atomic_write(self.head_path, json.dumps(head).encode())
+
+
+@dataclass
+class ImportResult:
+    """
+    Результат загрузки товаров из файла.
+    """
+    added: int
+    """Кол-во добавленных товаров."""
+    duplicates: int
+    """Кол-во пропущенных дубликатов."""
+    total: int
+    """Кол-во товаров в файле после загрузки."""
+    skipped_path: str | None = None
+    """Путь до файла с пропущенными дубликатами (None, если дубликатов нет). Поиск дубликатов вероятностный
+    (фильтр Блума): в файл попадают все пропущенные строки, чтобы продавец мог их проверить."""
+
+
+def _read_lines(f: BinaryIO) -> Iterator[tuple[bytes, int]]:
+    """
+    Читает строки бинарного файла блоками по CHUNK_SIZE байт (переносы строк \\n, \\r\\n и \\r).
+
+    :param f: файл, открытый в режиме rb.
+
+    :return: генератор (строка без переноса, кол-во прочитанных байт файла).
+    """
+    tail, processed = b"", 0
+    while chunk := f.read(CHUNK_SIZE):
+        processed += len(chunk)
+        lines = LINE_SEPARATORS.split(tail + chunk)
+        tail = lines.pop()  # Незавершенная строка (\r в конце блока дает лишь пустую строку в следующем).
+        for line in lines:
+            yield line, processed
+    if tail:
+        yield tail, processed
+
+
+def normalize_product(line: str) -> str:
+    """
+    Приводит строку загружаемого файла к виду, в котором товары хранятся в файлах товаров: без пробелов по краям,
+    переносы строк внутри товара - в виде \\n (deliver_goods заменяет их на настоящие переносы).
+
+    :param line: строка файла (без символа переноса строки).
+
+    :return: товар (пустая строка, если строка не содержит товара).
+    """
+    return line.strip().replace("\\r\\n", "\\n")
+
+
+@dataclass
+class Reservation:
+    """
+    Резерв товаров для заказа.
+    """
+    id: str
+    """ID резерва."""
+    order_id: str
+    """ID заказа."""
+    path: str
+    """Путь до файла товаров."""
+    products: list[str]
+    """Зарезервированные товары."""
+    left: int
+    """Кол-во товаров, оставшихся в файле после резервирования."""
+    created: float = field(default_factory=time.time)
+    """Время создания резерва."""
+    state: str = "reserved"
+    """Состояние резерва: reserved, sending (товары отправляются), releasing, committed, released."""
+
+
+class ProductsStore:
+    """
+    Хранилище товаров автовыдачи. Операции с одним файлом выполняются под блокировкой файла.
+    """
+
+    def __init__(self, cache_folder: str = "storage/cache/products", products_folder: str = "storage/products"):
+        """
+        :param cache_folder: папка для индексов файлов товаров.
+        :param products_folder: папка с файлами товаров.
+        """
+        self.cache_folder = cache_folder
+        self.products_folder = products_folder
+        self.journal_path = os.path.join(cache_folder, "reservations.journal")
+        self.quarantine_path = os.path.join(cache_folder, "quarantine.txt")
+        self.__files: dict[str, ProductsFile] = {}
+        self.__lock = Lock()
+        self.__reservations: dict[str, Reservation] = {}  # Неподтвержденные резервы {ID резерва: резерв}.
+        self.__journal_lock = Lock()
+        self.__keys_filter: BloomFilter | None = None  # Все загруженные товары (открывается при первом обращении).
+        # Отдельная блокировка: первое заполнение фильтра читает все файлы товаров и не должно задерживать выдачу.
+        self.__keys_filter_lock = Lock()
+        self.__delivered_filter: BloomFilter | None = None  # Все выданные товары (открывается при первом обращении).
+
+    def get_file(self, path: str) -> ProductsFile:
+        """
+        :param path: путь до файла товаров.
+
+        :return: состояние файла товаров.
+        """
+        path = os.path.normpath(path)
+        with self.__lock:
+            if (products_file := self.__files.get(path)) is None:
+                products_file = self.__files[path] = ProductsFile(path, self.cache_folder)
+        return products_file
+
+    def take(self, path: str, amount: int = 1) -> tuple[list[str], int]:
+        """
+        Берет товары из начала файла (аналог cardinal_tools.get_products).
+
+        :param path: путь до файла товаров.
+        :param amount: кол-во товаров.
+
+        :return: (список товаров, кол-во оставшихся товаров).
+        """
+        products_file = self.get_file(path)
+        with products_file.lock:
+            products_file.ensure_loaded()
+            if not products_file.count:
+                raise NoProductsError(path)
+            if products_file.count < amount:
+                raise NotEnoughProductsError(path, products_file.count, amount)
+            products = products_file.take(amount)
+            return products, products_file.count
+
+    def put_back(self, path: str, products: list[str]) -> None:
+        """
+        Возвращает товары в начало файла (аналог cardinal_tools.add_products(..., at_zero_position=True)).
+
+        :param path: путь до файла товаров.
+        :param products: товары.
+        """
+        products_file = self.get_file(path)
+        with products_file.lock:
+            products_file.ensure_loaded()
+            products_file.put_back(products)
+
+    def count(self, path: str) -> int:
+        """
+        :param path: путь до файла товаров.
+
+        :return: кол-во товаров в файле (0, если файла нет).
+        """
+        # Кол-во хранится в памяти и обновляется при выдаче / возврате товаров; файл перечитывается, только если
+        # он был изменен извне (например, загрузка товаров через Telegram).
+        if not os.path.exists(path):
+            return 0
+        products_file = self.get_file(path)
+        with products_file.lock:
+            products_file.ensure_loaded()
+            return products_file.count
+
+    def get_keys_filter(self) -> BloomFilter:
+        """
+        :return: фильтр всех загруженных товаров. При создании в него добавляются товары из всех файлов товаров.
+        """
+        if (keys_filter := self.__keys_filter) is not None:
+            return keys_filter
+        with self.__keys_filter_lock:
+            if self.__keys_filter is not None:
+                return self.__keys_filter
+            filter_path = os.path.join(self.cache_folder, "keys.bloom")
+            if not os.path.exists(filter_path):
+                # Фильтр заполняется во временном файле: прерванное заполнение не оставит неполный фильтр.
+                tmp_path = f"{filter_path}.tmp"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                keys_filter = BloomFilter(tmp_path, KEYS_CAPACITY, KEYS_ERROR_RATE)
+                if os.path.isdir(self.products_folder):
+                    for file_name in os.listdir(self.products_folder):
+                        path = os.path.join(self.products_folder, file_name)
+                        if not os.path.isfile(path):
+                            continue
+                        with open(path, "r", encoding="utf-8", errors="replace") as f:
+                            for line in f:
+                                if line := line.rstrip("\r\n"):
+                                    keys_filter.add(line)
+                count = keys_filter.count
+                keys_filter.close()
+                os.replace(tmp_path, filter_path)
+                logger.info(f"Создан индекс товаров для поиска дубликатов ({count} товаров).")  # locale
+            self.__keys_filter = BloomFilter(filter_path, KEYS_CAPACITY, KEYS_ERROR_RATE)
+            return self.__keys_filter
+
+    def get_delivered_filter(self) -> BloomFilter:
+        """
+        :return: фильтр всех выданных товаров.
+        """
+        with self.__lock:
+            if self.__delivered_filter is None:
+                self.__delivered_filter = BloomFilter(os.path.join(self.cache_folder, "delivered.bloom"),
+                                                      KEYS_CAPACITY, KEYS_ERROR_RATE)
+            return self.__delivered_filter
+
+    def add_products(self, path: str, products: list[str], skip_duplicates: bool = True) -> tuple[int, list[str]]:
+        """
+        Добавляет товары в конец файла (аналог cardinal_tools.add_products) и в фильтр загруженных товаров.
+
+        :param path: путь до файла товаров (создается, если не существует).
+        :param products: товары.
+        :param skip_duplicates: пропускать ли товары, которые уже загружались (в любой файл товаров) или
+            повторяются в самом списке.
+
+        :return: (кол-во добавленных товаров, список пропущенных дубликатов).
+        """
+        keys_filter = self.get_keys_filter()
+        added, duplicates = [], []
+        for product in products:
+            if not product:
+                continue
+            if not keys_filter.add(product) and skip_duplicates:
+                duplicates.append(product)
+                continue
+            added.append(product)
+        keys_filter.flush()
+
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8"):
+                pass
+        products_file = self.get_file(path)
+        with products_file.lock:
+            products_file.ensure_loaded()
+            products_file.append(added)
+        return len(added), duplicates
+
+    def import_products(self, source: str, path: str, skip_duplicates: bool = True,
+                        progress: Callable[[int, int, int, int], Any] | None = None) -> ImportResult:
+        """
+        Загружает товары из файла (например, загруженного через Telegram) в файл товаров. Файл читается потоково:
+        строки нормализуются (normalize_product), дубликаты пропускаются, товары пишутся во временный файл, который
+        затем дописывается в конец файла товаров одной операцией.
+
+        :param source: путь до загружаемого файла (UTF-8, переносы строк \\n, \\r\\n или \\r).
+        :param path: путь до файла товаров (создается, если не существует).
+        :param skip_duplicates: пропускать ли товары, которые уже загружались или повторяются в самом файле.
+        :param progress: функция, вызываемая каждые CHUNK_SIZE байт загружаемого файла и по окончании загрузки:
+            progress(обработано байт, размер файла, добавлено товаров, пропущено дубликатов).
+
+        :return: результат загрузки (пропущенные дубликаты сохраняются в файл ImportResult.skipped_path).
+        """
+        keys_filter = self.get_keys_filter()
+        total_bytes = os.path.getsize(source)
+        name = os.path.basename(path)
+        batch_path = os.path.join(self.cache_folder, f"{name}.import")
+        batch_filter_path = os.path.join(self.cache_folder, f"{name}.import.bloom")
+        skipped_path = os.path.join(self.cache_folder, f"{name}.skipped.txt")
+        batch_filter = None
+        if skip_duplicates:
+            if os.path.exists(batch_filter_path):
+                os.remove(batch_filter_path)
+            batch_filter = BloomFilter(batch_filter_path, min(KEYS_CAPACITY, total_bytes // 2 + 1), KEYS_ERROR_RATE)
+
+        starts, ends = array("Q"), array("Q")
+        added = duplicates = 0
+        skipped = None
+        try:
+            with open(source, "rb") as src, open(batch_path, "wb") as dst:
+                next_report, first = CHUNK_SIZE, True
+                for raw, processed in _read_lines(src):
+                    if first and raw.startswith(b"\xef\xbb\xbf"):  # BOM
+                        raw = raw[3:]
+                    first = False
+                    if progress is not None and processed >= next_report:
+                        next_report = processed + CHUNK_SIZE
+                        progress(processed, total_bytes, added, duplicates)
+                    if not (product := normalize_product(raw.decode("utf-8", errors="replace"))):
+                        continue
+                    data = product.encode("utf-8")
+                    if batch_filter is not None and (product in keys_filter or not batch_filter.add(product)):
+                        # Фильтр Блума может ошибиться: пропущенные строки сохраняются, а не теряются.
+                        if skipped is None:
+                            skipped = open(skipped_path, "wb")
+                        skipped.write(data + b"\n")
+                        duplicates += 1
+                        continue
+                    starts.append(dst.tell())
+                    ends.append(starts[-1] + len(data))
+                    dst.write(data + b"\n")
+                    added += 1
+
+            if not os.path.exists(path):
+                with open(path, "w", encoding="utf-8"):
+                    pass
+            products_file = self.get_file(path)
+            with products_file.lock:
+                products_file.ensure_loaded()
+                products_file.append_file(batch_path, starts, ends)
+                total = products_file.count
+
+            with open(batch_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    keys_filter.add(line.rstrip("\n"))
+            keys_filter.flush()
+        finally:
+            if skipped is not None:
+                skipped.close()
+            if batch_filter is not None:
+                batch_filter.close()
+                os.remove(batch_filter_path)
+            if os.path.exists(batch_path):
+                os.remove(batch_path)
+
+        if progress is not None:
+            progress(total_bytes, total_bytes, added, duplicates)
+        logger.info(f"В файл {path} загружено {added} товаров (пропущено дубликатов: {duplicates}, "
+                    f"всего товаров: {total}).")  # locale
+        if skipped is None:
+            if os.path.exists(skipped_path):  # Файл предыдущей загрузки.
+                os.remove(skipped_path)
+            return ImportResult(added, duplicates, total)
+        logger.info(f"Пропущенные дубликаты сохранены в {skipped_path}.")  # locale
+        return ImportResult(added, duplicates, total, skipped_path)
+
+    def find_delivered(self, products: list[str]) -> list[str]:
+        """
+        Ищет среди товаров те, которые (вероятно) уже выдавались.
+
+        :param products: товары.
+
+        :return: список товаров, которые уже выдавались.
+        """
+        delivered_filter = self.get_delivered_filter()
+        return [i for i in products if i in delivered_filter]
+
+    def reserve(self, path: str, amount: int, order_id: str) -> Reservation:
+        """
+        Резервирует товары из начала файла для заказа. Зарезервированные товары убираются из файла до вызова commit()
+        (товары выданы) или release() (товары возвращаются в начало файла).
+
+        :param path: путь до файла товаров.
+        :param amount: кол-во товаров.
+        :param order_id: ID заказа.
+
+        :return: резерв.
+        """
+        self.release_expired()
+        products_file = self.get_file(path)
+        with products_file.lock:
+            products_file.ensure_loaded()
+            if not products_file.count:
+                raise NoProductsError(path)
+            if products_file.count < amount:
+                raise NotEnoughProductsError(path, products_file.count, amount)
+            # Сначала резерв записывается в журнал, затем товары убираются из файла: если Кардинал завершится
+            # между этими шагами, recover() увидит товары резерва в начале файла и не вернет их повторно.
+            # Резерв добавляется в __reservations вместе с записью в журнал, поэтому журнал не будет очищен,
+            # пока резерв не завершен.
+            reservation = Reservation(uuid.uuid4().hex, str(order_id), products_file.path,
+                                      products_file.peek(amount), products_file.count - amount)
+            with self.__journal_lock:
+                self.__append_journal({"op": "reserve", "id": reservation.id, "order_id": reservation.order_id,
+                                       "path": reservation.path, "products": reservation.products,
+                                       "time": reservation.created})
+                self.__reservations[reservation.id] = reservation
+            try:
+                products_file.take(amount)
+            except:
+                with self.__journal_lock:
+                    self.__reservations.pop(reservation.id, None)
+                    self.__append_journal({"op": "release", "id": reservation.id})
+                raise
+        return reservation
+
+    def mark_sending(self, reservation: Reservation) -> None:
+        """
+        Отмечает, что товары резерва отправляются покупателю. Такой резерв не отменяется по таймауту, а после
+        аварийного завершения Кардинала его товары не возвращаются в файл (см. recover()).
+        Вызывается непосредственно перед отправкой товаров.
+
+        :param reservation: резерв.
+        """
+        with self.__journal_lock:
+            if self.__reservations.get(reservation.id) is not reservation or reservation.state != "reserved":
+                raise RuntimeError(f"Резерв {reservation.id} для заказа {reservation.order_id} "
+                                   f"уже завершен или отменен.")  # locale
+            self.__append_journal({"op": "sending", "id": reservation.id})
+            reservation.state = "sending"
+
+    def commit(self, reservation: Reservation) -> None:
+        """
+        Подтверждает резерв (товары выданы).
+
+        :param reservation: резерв.
+        """
+        with self.__journal_lock:
+            if self.__reservations.get(reservation.id) is not reservation or \
+                    reservation.state not in ("reserved", "sending"):
+                logger.error(f"Не удалось подтвердить выдачу товаров для заказа {reservation.order_id}: резерв уже "
+                             f"отменен, товары могли быть возвращены в файл {reservation.path}.")  # locale
+                return
+            self.__append_journal({"op": "commit", "id": reservation.id})
+            reservation.state = "committed"
+            del self.__reservations[reservation.id]
+            self.__compact_journal()
+        try:
+            delivered_filter = self.get_delivered_filter()
+            for product in reservation.products:
+                delivered_filter.add(product)
+            delivered_filter.flush()
+        except:
+            logger.warning("Не удалось добавить выданные товары в индекс дубликатов.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+
+    def release(self, reservation: Reservation) -> None:
+        """
+        Отменяет резерв: возвращает товары в начало файла.
+
+        :param reservation: резерв.
+        """
+        with self.__journal_lock:
+            if self.__reservations.get(reservation.id) is not reservation or \
+                    reservation.state not in ("reserved", "sending"):
+                return
+            # Резерв остается в __reservations до записи об отмене, чтобы журнал не был очищен раньше времени.
+            reservation.state = "releasing"
+        try:
+            self.put_back(reservation.path, reservation.products)
+        except:
+            with self.__journal_lock:
+                reservation.state = "reserved"
+            raise
+        with self.__journal_lock:
+            self.__append_journal({"op": "release", "id": reservation.id})
+            reservation.state = "released"
+            del self.__reservations[reservation.id]
+            self.__compact_journal()
+
+    def release_expired(self) -> None:
+        """
+        Отменяет резервы, не подтвержденные в течение RESERVATION_TIMEOUT секунд.
+        Резервы, товары которых отправляются покупателю (mark_sending()), не отменяются.
+        """
+        now = time.time()
+        with self.__journal_lock:
+            expired = [i for i in self.__reservations.values()
+                       if i.state == "reserved" and now - i.created > RESERVATION_TIMEOUT]
+        for reservation in sorted(expired, key=lambda i: i.created, reverse=True):
+            logger.warning(f"Резерв товаров для заказа {reservation.order_id} не был подтвержден "
+                           f"в течение {RESERVATION_TIMEOUT} секунд. Возвращаю товары в файл "
+                           f"{reservation.path}.")  # locale
+            self.release(reservation)
+
+    def recover(self) -> list[dict]:
+        """
+        Возвращает в файлы товары резервов, которые не были подтверждены или отменены до завершения Кардинала.
+        Товары резервов, отправка которых уже началась (товары могли быть выданы), в файлы не возвращаются, а
+        записываются в карантин (quarantine.txt в папке кэша) - их судьбу должен решить продавец.
+        Вызывается при запуске.
+
+        :return: записи журнала резервов, помещенных в карантин.
+        """
+        if not os.path.exists(self.journal_path):
+            return []
+        reservations: dict[str, dict] = {}
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # Недописанная запись в конце журнала.
+                    continue
+                if record["op"] == "reserve":
+                    reservations[record["id"]] = record
+                elif record["op"] == "sending":
+                    if record["id"] in reservations:
+                        reservations[record["id"]]["sending"] = True
+                else:
+                    reservations.pop(record["id"], None)
+
+        quarantined = [i for i in reservations.values() if i.get("sending")]
+        if quarantined:
+            with open(self.quarantine_path, "a", encoding="utf-8") as f:
+                for record in quarantined:
+                    f.write(f"# {time.strftime('%Y-%m-%d %H:%M:%S')} | заказ {record['order_id']} | "
+                            f"{record['path']}\n")
+                    f.write("".join(f"{i}\n" for i in record["products"]))
+                    logger.error(f"Выдача товаров для заказа {record['order_id']} была прервана во время отправки. "
+                                 f"Товары ({len(record['products'])} шт.) не возвращены в файл {record['path']} "
+                                 f"и сохранены в {self.quarantine_path}.")  # locale
+                f.flush()
+                os.fsync(f.fileno())
+
+        # Резервы отменяются в обратном порядке, чтобы товары вернулись в файл в исходном порядке.
+        for record in reversed([i for i in reservations.values() if not i.get("sending")]):
+            path, products = record["path"], record["products"]
+            try:
+                if not os.path.exists(path):
+                    with open(path, "w", encoding="utf-8"):
+                        pass
+                products_file = self.get_file(path)
+                with products_file.lock:
+                    products_file.ensure_loaded()
+                    if products_file.peek(len(products)) == products:  # Товары не успели убрать из файла.
+                        continue
+                    products_file.put_back(products)
+                logger.warning(f"Товары незавершенной выдачи для заказа {record['order_id']} "
+                               f"возвращены в файл {path}.")  # locale
+            except:
+                logger.error(f"Не удалось вернуть товары незавершенной выдачи для заказа {record['order_id']} "
+                             f"в файл {path} ({len(products)} шт.).")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
+
+        with self.__journal_lock:
+            _atomic_write(self.journal_path, b"")
+        return quarantined
+
+    def __append_journal(self, record: dict) -> None:
+        """
+        Дописывает запись в журнал резервов (с fsync). Вызывается под __journal_lock.
+        """
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "ab") as f:
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __compact_journal(self) -> None:
+        """
+        Очищает журнал резервов, если он слишком большой и незавершенных резервов нет. Вызывается под __journal_lock.
+        """
+        if not self.__reservations and os.path.exists(self.journal_path) and \
+                os.path.getsize(self.journal_path) >= JOURNAL_COMPACT_BYTES:
+            _atomic_write(self.journal_path, b"")
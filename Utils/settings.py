@@ -0,0 +1,105 @@
+"""
+В данном модуле описан неизменяемый снимок основных настроек кардинала (_main.cfg).
+Хэндлеры читают готовые значения из снимка вместо разбора configparser на каждом событии.
+Снимок пересоздается при сохранении _main.cfg (Cardinal.save_config / Cardinal.update_settings).
+"""
+
+from __future__ import annotations
+
+from configparser import ConfigParser
+from types import MappingProxyType
+
+
+class Settings:
+    """
+    Неизменяемый снимок основных настроек кардинала.
+    """
+    __slots__ = (
+        # FunPay
+        "autoraise_enabled", "autoresponse_enabled", "autodelivery_enabled", "multidelivery_enabled",
+        "autorestore_enabled", "autodisable_enabled", "old_mode_enabled", "keep_sent_messages_unread",
+        # NewMessageView
+        "show_image_name", "include_my_msg_enabled", "include_fp_msg_enabled", "include_bot_msg_enabled",
+        "only_my_msg_enabled", "only_fp_msg_enabled", "only_bot_msg_enabled",
+        # BlockList
+        "bl_delivery_enabled", "bl_response_enabled", "bl_msg_notification_enabled", "bl_order_notification_enabled",
+        "bl_cmd_notification_enabled",
+        # Telegram
+        "telegram_enabled", "block_tg_login",
+        # Greetings
+        "greetings_enabled", "greetings_only_new_chats", "greetings_ignore_system_messages", "greetings_cooldown",
+        "greetings_text",
+        # OrderConfirm
+        "order_confirm_reply_enabled", "order_confirm_reply_text", "order_confirm_watermark",
+        # ReviewReply
+        "review_replies",
+        # Other
+        "watermark", "requests_delay"
+    )
+
+    def __init__(self, main_config: ConfigParser):
+        """
+        :param main_config: объект основного конфига (_main.cfg).
+        """
+        funpay = main_config["FunPay"]
+        view = main_config["NewMessageView"]
+        block_list = main_config["BlockList"]
+        greetings = main_config["Greetings"]
+        order_confirm = main_config["OrderConfirm"]
+        review_reply = main_config["ReviewReply"]
+        other = main_config["Other"]
+
+        values = {
+            "autoraise_enabled": funpay.getboolean("autoRaise"),
+            "autoresponse_enabled": funpay.getboolean("autoResponse"),
+            "autodelivery_enabled": funpay.getboolean("autoDelivery"),
+            "multidelivery_enabled": funpay.getboolean("multiDelivery"),
+            "autorestore_enabled": funpay.getboolean("autoRestore"),
+            "autodisable_enabled": funpay.getboolean("autoDisable"),
+            "old_mode_enabled": funpay.getboolean("oldMsgGetMode"),
+            "keep_sent_messages_unread": funpay.getboolean("keepSentMessagesUnread"),
+
+            "show_image_name": view.getboolean("showImageName"),
+            "include_my_msg_enabled": view.getboolean("includeMyMessages"),
+            "include_fp_msg_enabled": view.getboolean("includeFPMessages"),
+            "include_bot_msg_enabled": view.getboolean("includeBotMessages"),
+            "only_my_msg_enabled": view.getboolean("notifyOnlyMyMessages"),
+            "only_fp_msg_enabled": view.getboolean("notifyOnlyFPMessages"),
+            "only_bot_msg_enabled": view.getboolean("notifyOnlyBotMessages"),
+
+            "bl_delivery_enabled": block_list.getboolean("blockDelivery"),
+            "bl_response_enabled": block_list.getboolean("blockResponse"),
+            "bl_msg_notification_enabled": block_list.getboolean("blockNewMessageNotification"),
+            "bl_order_notification_enabled": block_list.getboolean("blockNewOrderNotification"),
+            "bl_cmd_notification_enabled": block_list.getboolean("blockCommandNotification"),
+
+            "telegram_enabled": main_config["Telegram"].getboolean("enabled"),
+            "block_tg_login": main_config["Telegram"].getboolean("blockLogin"),
+
+            "greetings_enabled": greetings.getboolean("sendGreetings"),
+            "greetings_only_new_chats": greetings.getboolean("onlyNewChats"),
+            "greetings_ignore_system_messages": greetings.getboolean("ignoreSystemMessages"),
+            "greetings_cooldown": float(greetings["greetingsCooldown"]),  # дни
+            "greetings_text": greetings["greetingsText"],
+
+            "order_confirm_reply_enabled": order_confirm.getboolean("sendReply"),
+            "order_confirm_reply_text": order_confirm["replyText"],
+            "order_confirm_watermark": order_confirm.getboolean("watermark"),
+
+            # {кол-во звезд: текст ответа} - только включенные ответы с непустым текстом.
+            "review_replies": MappingProxyType({stars: review_reply.get(f"star{stars}ReplyText")
+                                                for stars in range(1, 6)
+                                                if review_reply.getboolean(f"star{stars}Reply", fallback=False)
+                                                and review_reply.get(f"star{stars}ReplyText")}),
+
+            "watermark": other.get("watermark") or "",
+            "requests_delay": int(other["requestsDelay"]),
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Settings is immutable.")
+
+    def __delattr__(self, key):
+        raise AttributeError("Settings is immutable.")
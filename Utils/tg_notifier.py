@@ -0,0 +1,236 @@
+"""
+В данном модуле описан диспетчер уведомлений Telegram (TGBot.notifier).
+
+- Уведомления рассылаются во все чаты параллельно, в каждый чат - по очереди (FIFO) с учетом лимитов Telegram
+  (общий лимит бота и лимит на чат, для групп - строже).
+- Однотипные уведомления (поднятие / восстановление / деактивация лотов), пришедшие в течение COALESCE_WINDOW
+  секунд, объединяются в одно сообщение.
+- Неотправленные уведомления хранятся в журнале (storage/cache/tg_notifications.journal): при ошибке отправка
+  повторяется с увеличивающейся задержкой (после MAX_ATTEMPTS попыток - не чаще раза в SLOW_RETRY_CAP секунд),
+  а оставшиеся в журнале после перезапуска уведомления отправляются заново.
+- Ожидание лимита чата и повторной попытки не занимает поток отправки (outbox.Defer); чат на это время остается
+  занятым, поэтому неотправленное уведомление остается первым в очереди чата.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from tg_bot.bot import TGBot
+    from Utils.executor import Executor
+
+from threading import Lock
+import logging
+import json
+import uuid
+import os
+
+from tg_bot.utils import NotificationTypes
+from Utils.executor import TELEGRAM_IO
+from Utils.outbox import Outbox, TokenBucket, Defer, backoff_delay
+
+logger = logging.getLogger("FPC.tg_notifier")
+
+COALESCE_WINDOW = 5  # Окно объединения однотипных уведомлений (сек).
+COALESCE_TYPES = (NotificationTypes.lots_raise, NotificationTypes.lots_deactivate, NotificationTypes.lots_restore)
+MAX_MESSAGE_LENGTH = 4096  # Макс. длина сообщения Telegram.
+MAX_ATTEMPTS = 5  # Кол-во быстрых попыток отправки, после них - медленные повторы.
+SLOW_RETRY_BASE = 60  # Задержка первого медленного повтора (сек).
+SLOW_RETRY_CAP = 3600  # Макс. задержка медленных повторов (сек).
+GLOBAL_RATE = 25  # Сообщений в секунду для всего бота (лимит Telegram - 30).
+PRIVATE_RATE = 1  # Сообщений в секунду в личный чат.
+GROUP_RATE = 20 / 60  # Сообщений в секунду в группу.
+CHAT_BURST = 3
+JOURNAL_COMPACT_BYTES = 64 * 1024
+
+
+class TelegramNotifier:
+    """
+    Диспетчер уведомлений Telegram.
+    """
+
+    def __init__(self, tg: TGBot, executor: Executor, journal_path: str = "storage/cache/tg_notifications.journal"):
+        """
+        :param tg: экземпляр Telegram бота.
+        :param executor: пул потоков Кардинала (для объединения уведомлений).
+        :param journal_path: путь до журнала неотправленных уведомлений.
+        """
+        self.tg = tg
+        self.executor = executor
+        self.journal_path = journal_path
+        self.outbox = Outbox(workers=4, rate=GLOBAL_RATE, burst=GLOBAL_RATE)
+        self.__chat_buckets: dict[int, TokenBucket] = {}
+        self.__pending: dict[str, dict] = {}  # Неотправленные уведомления {ID: запись журнала}.
+        self.__coalesce: dict[str, list[tuple[str, Any]]] = {}  # {тип уведомления: [(текст, клавиатура), ...]}
+        self.__lock = Lock()
+        self.__journal_lock = Lock()
+        self.__compacted_size = 0  # Размер журнала после последнего сжатия.
+
+    def notify(self, text: str, keyboard: Any = None, notification_type: str = NotificationTypes.other) -> None:
+        """
+        Рассылает уведомление во все чаты, в которых включены уведомления данного типа
+        (замена TGBot.send_notification для текстовых уведомлений).
+
+        :param text: текст уведомления.
+        :param keyboard: клавиатура.
+        :param notification_type: тип уведомления.
+        """
+        if notification_type in COALESCE_TYPES:
+            with self.__lock:
+                batch = self.__coalesce.setdefault(notification_type, [])
+                batch.append((text, keyboard))
+                if len(batch) > 1:
+                    return
+            self.executor.schedule(COALESCE_WINDOW, TELEGRAM_IO, self.__flush_coalesced, notification_type)
+            return
+        self.notify_now(text, keyboard, notification_type)
+
+    def notify_now(self, text: str, keyboard: Any = None, notification_type: str = NotificationTypes.other) -> None:
+        """
+        Рассылает уведомление без объединения с однотипными.
+        """
+        chat_ids = [chat_id for chat_id in list(self.tg.notification_settings)
+                    if notification_type == NotificationTypes.important_announcement or
+                    self.tg.is_notification_enabled(chat_id, notification_type)]
+        self.send_to(chat_ids, text, keyboard)
+
+    def send_to(self, chat_ids: list[int | str], text: str, keyboard: Any = None,
+                parse_mode: str | None = None) -> None:
+        """
+        Рассылает сообщение в указанные чаты (например, авторизованным пользователям из плагинов).
+
+        :param chat_ids: ID чатов.
+        :param text: текст сообщения.
+        :param keyboard: клавиатура.
+        :param parse_mode: режим форматирования (по умолчанию - режим бота).
+        """
+        markup = keyboard.to_json() if hasattr(keyboard, "to_json") else keyboard
+        for chat_id in chat_ids:
+            record = {"op": "add", "id": uuid.uuid4().hex, "chat_id": chat_id, "text": text, "keyboard": markup,
+                      "parse_mode": parse_mode}
+            with self.__journal_lock:
+                self.__pending[record["id"]] = record
+            try:
+                self.__write_journal(record)
+            except:
+                logger.warning("Не удалось записать уведомление в журнал.")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
+            self.__submit(record, 0)
+
+    def recover(self) -> None:
+        """
+        Отправляет уведомления, оставшиеся неотправленными с прошлого запуска. Вызывается при запуске.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        pending: dict[str, dict] = {}
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record["op"] == "add":
+                    pending[record["id"]] = record
+                else:
+                    pending.pop(record["id"], None)
+        with self.__journal_lock:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(f"{self.journal_path}.tmp", "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(i, ensure_ascii=False) + "\n" for i in pending.values()))
+            os.replace(f"{self.journal_path}.tmp", self.journal_path)
+            self.__pending.update(pending)
+        if pending:
+            logger.info(f"Отправляю {len(pending)} неотправленных уведомлений Telegram.")  # locale
+        for record in pending.values():
+            self.__submit(record, 0)
+
+    def __flush_coalesced(self, notification_type: str) -> None:
+        with self.__lock:
+            batch = self.__coalesce.pop(notification_type, [])
+        if not batch:
+            return
+        if len(batch) == 1:
+            text, keyboard = batch[0]
+            self.notify_now(text, keyboard, notification_type)
+            return
+        # Объединяем тексты в сообщения не длиннее MAX_MESSAGE_LENGTH (клавиатуры при объединении не сохраняются).
+        messages, current = [], ""
+        for text, _ in batch:
+            if current and len(current) + len(text) + 2 > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n\n{text}" if current else text
+        messages.append(current)
+        for text in messages:
+            self.notify_now(text, None, notification_type)
+
+    def __get_chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        with self.__lock:
+            if (bucket := self.__chat_buckets.get(chat_id)) is None:
+                rate = GROUP_RATE if str(chat_id).startswith("-") else PRIVATE_RATE
+                bucket = self.__chat_buckets[chat_id] = TokenBucket(rate, CHAT_BURST)
+            return bucket
+
+    def __submit(self, record: dict, attempt: int) -> None:
+        self.outbox.submit(record["chat_id"], 0, self.__send, record, attempt)
+
+    def __send(self, record: dict, attempt: int) -> Defer | None:
+        chat_id = record["chat_id"]
+        bucket = self.__get_chat_bucket(chat_id)
+        if wait := bucket.try_acquire():  # Лимит чата исчерпан - освобождаем поток до появления токена.
+            return Defer(wait, self.__send, record, attempt)
+        self.outbox.bucket.acquire()
+        kwargs = {}
+        if record["keyboard"] is not None:
+            kwargs["reply_markup"] = record["keyboard"]
+        if record["parse_mode"] is not None:
+            kwargs["parse_mode"] = record["parse_mode"]
+        try:
+            self.tg.bot.send_message(chat_id, record["text"], **kwargs)
+        except Exception as e:
+            error_code = getattr(e, "error_code", None)
+            if error_code in (400, 403):  # Чат недоступен / бот заблокирован - повторять бессмысленно.
+                logger.error(f"Не удалось отправить уведомление в чат {chat_id}: {e}")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
+                self.__done(record)
+                return
+            if attempt + 1 < MAX_ATTEMPTS:
+                delay = backoff_delay(attempt, base=2, cap=120)
+            else:  # Telegram долго недоступен - не прекращаем попытки, но повторяем редко.
+                delay = backoff_delay(min(attempt + 1 - MAX_ATTEMPTS, 16), base=SLOW_RETRY_BASE, cap=SLOW_RETRY_CAP)
+            if error_code == 429:
+                retry_after = (getattr(e, "result_json", None) or {}).get("parameters", {}).get("retry_after")
+                delay = max(delay, retry_after or 0)
+                bucket.pause(delay)
+            if attempt + 1 == MAX_ATTEMPTS:
+                logger.error(f"Не удалось отправить уведомление в чат {chat_id} за {MAX_ATTEMPTS} попыток, "
+                             f"повтор через {delay:.1f} сек.")  # locale
+            else:
+                logger.warning(f"Не удалось отправить уведомление в чат {chat_id}, "
+                               f"повтор через {delay:.1f} сек.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+            return Defer(delay, self.__send, record, attempt + 1)
+        self.__done(record)
+
+    def __done(self, record: dict) -> None:
+        with self.__journal_lock:
+            self.__pending.pop(record["id"], None)
+        try:
+            self.__write_journal({"op": "done", "id": record["id"]})
+        except:
+            logger.debug("TRACEBACK", exc_info=True)
+
+    def __write_journal(self, record: dict) -> None:
+        with self.__journal_lock:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                size = f.tell()
+            if record["op"] == "done" and size >= max(JOURNAL_COMPACT_BYTES, 2 * self.__compacted_size):
+                # Переписываем журнал только с неотправленными уведомлениями (они могут ждать отправки долго).
+                with open(f"{self.journal_path}.tmp", "w", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(i, ensure_ascii=False) + "\n" for i in self.__pending.values()))
+                    self.__compacted_size = f.tell()
+                os.replace(f"{self.journal_path}.tmp", self.journal_path)
@@ -7,9 +7,10 @@ if TYPE_CHECKING:
 from tg_bot.utils import NotificationTypes
 from telebot.types import InlineKeyboardMarkup as K, InlineKeyboardButton as B
 from locales.localizer import Localizer
+from Utils.executor import TELEGRAM_IO
 from threading import Thread
 from logging import getLogger
-import requests
+from Utils import http_pool
 import json
 import os
 import time
@@ -61,7 +62,7 @@ def get_announcement(ignore_last_tag: bool = False) -> dict | None:
         'accept': 'application/vnd.github+json'
     }
     try:
-        response = requests.get("https://api.github.com/gists/cfd2177869feab9e64ab62918f708389", headers=headers)
+        response = http_pool.get_pool().get("https://api.github.com/gists/cfd2177869feab9e64ab62918f708389", headers=headers)
         if not response.status_code == 200:
             return None
 
@@ -82,7 +83,7 @@ def download_photo(url: str) -> bytes | None:
     :return: фотографию в виде массива байтов.
     """
     try:
-        response = requests.get(url)
+        response = http_pool.get_pool().get(url)
         if response.status_code != 200:
             return None
     except:
@@ -194,11 +195,8 @@ def announcements_loop_iteration(crd: Cardinal, ignore_last_tag: bool = False):
     pin = get_pin(data)
 
     if text or photo:
-        Thread(target=crd.telegram.send_notification,
-               args=(text,),
-               kwargs={"photo": photo, 'notification_type': notification_type, 'keyboard': keyboard,
-                       'pin': pin},
-               daemon=True).start()
+        crd.executor.submit(TELEGRAM_IO, crd.telegram.send_notification, text, photo=photo,
+                            notification_type=notification_type, keyboard=keyboard, pin=pin)
 
 
 def announcements_loop(crd: Cardinal):
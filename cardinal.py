@@ -8,16 +8,18 @@ if TYPE_CHECKING:
     from configparser import ConfigParser
 
 from tg_bot import auto_response_cp, config_loader_cp, auto_delivery_cp, templates_cp, plugins_cp, file_uploader, \
-    authorized_users_cp, proxy_cp, default_cp
+    authorized_users_cp, proxy_cp, default_cp, handlers_stats_cp
 from types import ModuleType
 import Utils.exceptions
 from uuid import UUID
 import importlib.util
 import configparser
 import itertools
+import queue
 import requests
 import datetime
 import logging
+import atexit
 import random
 import time
 import sys
@@ -29,9 +31,26 @@ import announcements
 from locales.localizer import Localizer
 from FunPayAPI import utils as fp_utils
 from Utils import cardinal_tools
+from Utils.event_dispatcher import EventDispatcher
+from Utils.executor import Executor
+from Utils.handler_stats import HandlerStats
+from Utils import event_filters
+from Utils.event_journal import EventJournalWriter
+from Utils.settings import Settings
+from Utils.auto_response_index import AutoResponseIndex
+from Utils.auto_delivery_index import AutoDeliveryIndex
+from Utils.lots_index import LotsDescriptionIndex
+from Utils.products_store import ProductsStore
+from Utils.old_users import OldUsersStore
+from Utils import outbox
+from Utils import message_entities
+from Utils import http_pool
+from Utils.tg_notifier import TelegramNotifier
 import tg_bot.bot
+from tg_bot.utils import NotificationTypes
 
 from threading import Thread
+from concurrent.futures import Future
 
 logger = logging.getLogger("FPC")
 localizer = Localizer()
@@ -80,6 +99,12 @@ class PluginData:
 
 
 class Cardinal(object):
+    EVENTS_WORKERS = 8  # Кол-во потоков, обрабатывающих события FunPay.
+    EVENTS_QUEUE_SIZE = 1000  # Макс. кол-во полученных, но еще не обработанных событий.
+    HANDLER_STATS_DUMP_INTERVAL = 60  # Интервал сохранения статистики хэндлеров в storage/cache (сек).
+    EVENTS_JOURNAL_PATH = "storage/cache/events.journal"  # Журнал событий при FPC_RECORD_EVENTS=1.
+    OLD_USERS_FLUSH_INTERVAL = 10  # Интервал записи накопленных изменений old_users на диск (сек).
+
     def __new__(cls, *args, **kwargs):
         if not hasattr(cls, "instance"):
             cls.instance = super(Cardinal, cls).__new__(cls)
@@ -99,6 +124,12 @@ class Cardinal(object):
         self.AD_CFG = auto_delivery_config
         self.AR_CFG = auto_response_config
         self.RAW_AR_CFG = raw_auto_response_config
+        # Неизменяемый снимок настроек из MAIN_CFG (пересоздается в update_settings).
+        self.settings = Settings(self.MAIN_CFG)
+        # Индекс команд автоответчика (пересобирается в rebuild_auto_response_index).
+        self.auto_response_index = AutoResponseIndex(self.AR_CFG)
+        # Индекс секций автовыдачи (пересобирается в rebuild_auto_delivery_index).
+        self.auto_delivery_index = AutoDeliveryIndex(self.AD_CFG)
         # Прокси
         self.proxy = {}
         self.proxy_dict = cardinal_tools.load_proxy_dict()  # прокси {0: "login:password@ip:port", 1: "ip:port"...}
@@ -128,6 +159,13 @@ class Cardinal(object):
         self.runner: FunPayAPI.Runner | None = None
         self.telegram: tg_bot.bot.TGBot | None = None
 
+        # Общий пул потоков для побочных действий хэндлеров и плагинов (отправка сообщений, уведомлений и т.д.)
+        self.executor = Executor()
+        self.outbox = outbox.Outbox()  # Очередь исходящих сообщений FunPay.
+        # Общий пул HTTP-сессий для плагинов (запросы с use_proxy=True идут через прокси Кардинала).
+        self.http = http_pool.get_pool()
+        self.http.proxy_getter = lambda: self.proxy
+
         self.running = False
         self.run_id = 0
         self.start_time = int(time.time())
@@ -137,6 +175,11 @@ class Cardinal(object):
         self.raised_time = {}  # Время последнего поднятия категории {id игры: время последнего поднятия}
         self.__exchange_rates = {}  # Курс валют {(валюта1, валюта2): (курс, время обновления)}
         self.profile: FunPayAPI.types.UserProfile | None = None  # FunPay профиль для всего кардинала (+ хэндлеров)
+        # {подкатегория: индекс описаний лотов self.profile}, строятся при первом обращении
+        # (см. get_lots_description_index).
+        self.lots_description_indexes: dict[FunPayAPI.types.SubCategory, LotsDescriptionIndex] = {}
+        # Хранилище товаров автовыдачи (выдача без перезаписи файлов товаров).
+        self.products_store = ProductsStore()
         self.tg_profile: FunPayAPI.types.UserProfile | None = None  # FunPay профиль (для Telegram-ПУ)
         self.last_tg_profile_update = datetime.datetime.now()  # Последнее время обновления профиля для TG-ПУ
         self.curr_profile: FunPayAPI.types.UserProfile | None = None  # Текущий профиль (для восст. / деакт. лотов.)
@@ -150,8 +193,8 @@ class Cardinal(object):
         self.last_greeting_chat_id_threshold_change_tag: str | None = None
         self.greeting_threshold_chat_ids = set()  # ID чатов для последующего обновления  self.greeting_chat_id_threshold
         self.blacklist = cardinal_tools.load_blacklist()  # ЧС.
-        self.old_users = cardinal_tools.load_old_users(
-            float(self.MAIN_CFG["Greetings"]["greetingsCooldown"]))  # Уже написавшие пользователи.
+        self.old_users = OldUsersStore(self.settings.greetings_cooldown)  # Уже написавшие пользователи.
+        atexit.register(self.old_users.flush)
         self.greeting_chat_id_threshold = max(self.old_users.keys(), default=0)
         # пороговое значение для определения новых чатов (для приветствия)
 
@@ -199,9 +242,24 @@ class Cardinal(object):
             "BIND_TO_POST_LOTS_RAISE": self.post_lots_raise_handlers,
         }
 
+        # {id(список хэндлеров): название переменной BIND_TO_*} - тип события для статистики хэндлеров.
+        self.__handlers_list_names = {id(v): k for k, v in self.handler_bind_var_names.items()}
+        self.handler_stats = HandlerStats()
+        # Журнал событий для воспроизведения (replay.py). Включается переменной окружения FPC_RECORD_EVENTS
+        # (1 или путь до файла журнала).
+        self.event_journal: EventJournalWriter | None = None
+
         self.plugins: dict[str, PluginData] = {}
         self.disabled_plugins = cardinal_tools.load_disabled_plugins()
 
+        # {название переменной BIND_TO_*: ((хэндлер, имя хэндлера, UUID плагина, фильтры | None), ...)}
+        # - только активные хэндлеры.
+        self.handler_tables: dict[str, tuple[tuple[Callable, str, str | None, tuple | None], ...]] = {}
+        # {название переменной BIND_TO_*: {ID подкатегории: таблица хэндлеров}} - для хэндлеров с фильтрами
+        # по подкатегориям (см. Utils.event_filters.build_subcategory_index).
+        self.handler_subcategory_index: dict[str, dict[int | None, tuple]] = {}
+        self.rebuild_handler_tables()
+
     def __init_account(self) -> None:
         """
         Инициализирует класс аккаунта (self.account)
@@ -262,6 +320,7 @@ class Cardinal(object):
 
         if update_main_profile:
             self.profile = profile
+            self.invalidate_lots_description_indexes()
             self.curr_profile = profile
             self.lots_ids = [i.id for i in profile.get_lots()]
             logger.info(_("crd_profile_updated", len(profile.get_lots()), len(profile.get_sorted_lots(2))))
@@ -277,6 +336,8 @@ class Cardinal(object):
         """
         self.telegram = tg_bot.bot.TGBot(self)
         self.telegram.init()
+        self.telegram.notifier = TelegramNotifier(self.telegram, self.executor)
+        self.telegram.notifier.recover()
 
     def get_balance(self, attempts: int = 3) -> FunPayAPI.types.Balance:
         subcategories = self.account.get_sorted_subcategories()[FunPayAPI.enums.SubCategoryTypes.COMMON]
@@ -401,14 +462,7 @@ class Cardinal(object):
 
         :return: список из суб-текстов.
         """
-        output = []
-        lines = text.split("\n")
-        while lines:
-            subtext = "\n".join(lines[:20])
-            del lines[:20]
-            if (strip := subtext.strip()) and strip != "[a][/a]":
-                output.append(subtext)
-        return output
+        return message_entities.split_text(text)
 
     def parse_message_entities(self, msg_text: str) -> list[str | int | float]:
         """
@@ -419,32 +473,13 @@ class Cardinal(object):
 
         :return: набор текстов сообщений / изображений.
         """
-        msg_text = "\n".join(i.strip() for i in msg_text.split("\n"))
-        while "\n\n" in msg_text:
-            msg_text = msg_text.replace("\n\n", "\n[a][/a]\n")
-
-        pos = 0
-        entities = []
-        while entity := cardinal_tools.ENTITY_RE.search(msg_text, pos=pos):
-            if text := msg_text[pos:entity.span()[0]].strip():
-                entities.extend(self.split_text(text))
-
-            variable = msg_text[entity.span()[0]:entity.span()[1]]
-            if variable.startswith("$photo"):
-                entities.append(int(variable.split("=")[1]))
-            elif variable.startswith("$sleep"):
-                entities.append(float(variable.split("=")[1]))
-            pos = entity.span()[1]
-        else:
-            if text := msg_text[pos:].strip():
-                entities.extend(self.split_text(text))
-        return entities
+        return message_entities.parse_message_entities(msg_text)
 
     def send_message(self, chat_id: int | str, message_text: str, chat_name: str | None = None,
                      interlocutor_id: int | None = None, attempts: int = 3,
-                     watermark: bool = True) -> list[FunPayAPI.types.Message] | None:
+                     watermark: bool = True, priority: int = outbox.NORMAL) -> list[FunPayAPI.types.Message] | None:
         """
-        Отправляет сообщение в чат FunPay.
+        Отправляет сообщение в чат FunPay (через очередь исходящих сообщений) и ожидает результат.
 
         :param chat_id: ID чата.
         :param message_text: текст сообщения.
@@ -452,49 +487,81 @@ class Cardinal(object):
         :param interlocutor_id: ID собеседника (необязательно).
         :param attempts: кол-во попыток на отправку сообщения.
         :param watermark: добавлять ли водяной знак в начало сообщения?
+        :param priority: приоритет сообщения (outbox.DELIVERY, outbox.AUTO_RESPONSE, outbox.NORMAL,
+            outbox.GREETING, outbox.REMINDER).
 
         :return: объект сообщения / последнего сообщения, если оно доставлено, иначе - None
         """
-        if self.MAIN_CFG["Other"].get("watermark") and watermark and not message_text.strip().startswith("$photo="):
-            message_text = f"{self.MAIN_CFG['Other']['watermark']}\n" + message_text
+        return self.queue_message(chat_id, message_text, chat_name, interlocutor_id, attempts, watermark,
+                                  priority).result()
+
+    def queue_message(self, chat_id: int | str, message_text: str, chat_name: str | None = None,
+                      interlocutor_id: int | None = None, attempts: int = 3,
+                      watermark: bool = True, priority: int = outbox.NORMAL) -> Future:
+        """
+        Ставит сообщение в очередь исходящих сообщений, не дожидаясь отправки.
+        Параметры совпадают с send_message.
+
+        :return: Future с результатом send_message.
+        """
+        return self.outbox.submit(chat_id, priority, self.__send_message_now, chat_id, message_text, chat_name,
+                                  interlocutor_id, attempts, watermark, priority)
+
+    def __send_message_now(self, chat_id: int | str, message_text: str, chat_name: str | None,
+                           interlocutor_id: int | None, attempts: int, watermark: bool,
+                           priority: int) -> list[FunPayAPI.types.Message] | None:
+        """
+        Отправляет сообщение в чат FunPay. Выполняется в потоке очереди исходящих сообщений.
+        """
+        if self.settings.watermark and watermark and not message_text.strip().startswith("$photo="):
+            message_text = f"{self.settings.watermark}\n" + message_text
 
         entities = self.parse_message_entities(message_text)
         if all(isinstance(i, float) for i in entities) or not entities:
             return
+        return self.__send_entities(chat_id, entities, 0, [], chat_name, interlocutor_id, attempts, attempts, priority)
 
-        result = []
-        for entity in entities:
-            current_attempts = attempts
-            while current_attempts:
-                try:
-                    if isinstance(entity, str):
-                        msg = self.account.send_message(chat_id, entity, chat_name,
-                                                        interlocutor_id or self.account.interlocutor_ids.get(chat_id),
-                                                        None, not self.old_mode_enabled,
-                                                        self.old_mode_enabled,
-                                                        self.keep_sent_messages_unread)
-                        result.append(msg)
-                        logger.info(_("crd_msg_sent", chat_id))
-                    elif isinstance(entity, int):
-                        msg = self.account.send_image(chat_id, entity, chat_name,
-                                                      interlocutor_id or self.account.interlocutor_ids.get(chat_id),
-                                                      not self.old_mode_enabled,
-                                                      self.old_mode_enabled,
-                                                      self.keep_sent_messages_unread)
-                        result.append(msg)
-                        logger.info(_("crd_msg_sent", chat_id))
-                    elif isinstance(entity, float):
-                        time.sleep(entity)
-                    break
-                except Exception as ex:
-                    logger.warning(_("crd_msg_send_err", chat_id))
-                    logger.debug("TRACEBACK", exc_info=True)
-                    logger.info(_("crd_msg_attempts_left", current_attempts))
-                    current_attempts -= 1
-                    time.sleep(1)
-            else:
-                logger.error(_("crd_msg_no_more_attempts_err", chat_id))
-                return []
+    def __send_entities(self, chat_id: int | str, entities: list, index: int, result: list,
+                        chat_name: str | None, interlocutor_id: int | None, attempts: int, attempts_left: int,
+                        priority: int) -> list[FunPayAPI.types.Message] | outbox.Defer:
+        """
+        Отправляет части сообщения, начиная с entities[index]. Паузы ($sleep) и ожидание перед повторной попыткой
+        не занимают поток очереди исходящих сообщений: возвращается outbox.Defer с продолжением отправки.
+        """
+        while index < len(entities):
+            entity = entities[index]
+            if isinstance(entity, float):
+                return outbox.Defer(entity, self.__send_entities, chat_id, entities, index + 1, result, chat_name,
+                                    interlocutor_id, attempts, attempts, priority)
+            try:
+                self.outbox.bucket.acquire(priority)
+                if isinstance(entity, str):
+                    msg = self.account.send_message(chat_id, entity, chat_name,
+                                                    interlocutor_id or self.account.interlocutor_ids.get(chat_id),
+                                                    None, not self.old_mode_enabled,
+                                                    self.old_mode_enabled,
+                                                    self.keep_sent_messages_unread)
+                else:
+                    msg = self.account.send_image(chat_id, entity, chat_name,
+                                                  interlocutor_id or self.account.interlocutor_ids.get(chat_id),
+                                                  not self.old_mode_enabled,
+                                                  self.old_mode_enabled,
+                                                  self.keep_sent_messages_unread)
+                result.append(msg)
+                logger.info(_("crd_msg_sent", chat_id))
+            except Exception as ex:
+                logger.warning(_("crd_msg_send_err", chat_id))
+                logger.debug("TRACEBACK", exc_info=True)
+                logger.info(_("crd_msg_attempts_left", attempts_left))
+                delay = outbox.backoff_delay(attempts - attempts_left)
+                if isinstance(ex, FunPayAPI.exceptions.RequestFailedError) and ex.status_code == 429:
+                    self.outbox.bucket.pause(delay)  # Лимит FunPay: приостанавливаем все отправки.
+                if attempts_left <= 1:
+                    logger.error(_("crd_msg_no_more_attempts_err", chat_id))
+                    return []
+                return outbox.Defer(delay, self.__send_entities, chat_id, entities, index, result, chat_name,
+                                    interlocutor_id, attempts, attempts_left - 1, priority)
+            index, attempts_left = index + 1, attempts
         return result
 
     def get_exchange_rate(self, base_currency: types.Currency, target_currency: types.Currency, min_interval: int = 60):
@@ -578,24 +645,91 @@ class Cardinal(object):
     def process_events(self):
         """
         Запускает хэндлеры, привязанные к тому или иному событию.
+        События получаются в отдельном потоке (poll_events), хэндлеры выполняются через EventDispatcher.
         """
         instance_id = self.run_id
         events_handlers = {
-            FunPayAPI.events.EventTypes.INITIAL_CHAT: self.init_message_handlers,
-            FunPayAPI.events.EventTypes.CHATS_LIST_CHANGED: self.messages_list_changed_handlers,
-            FunPayAPI.events.EventTypes.LAST_CHAT_MESSAGE_CHANGED: self.last_chat_message_changed_handlers,
-            FunPayAPI.events.EventTypes.NEW_MESSAGE: self.new_message_handlers,
-
-            FunPayAPI.events.EventTypes.INITIAL_ORDER: self.init_order_handlers,
-            FunPayAPI.events.EventTypes.ORDERS_LIST_CHANGED: self.orders_list_changed_handlers,
-            FunPayAPI.events.EventTypes.NEW_ORDER: self.new_order_handlers,
-            FunPayAPI.events.EventTypes.ORDER_STATUS_CHANGED: self.order_status_changed_handlers,
+            FunPayAPI.events.EventTypes.INITIAL_CHAT: "BIND_TO_INIT_MESSAGE",
+            FunPayAPI.events.EventTypes.CHATS_LIST_CHANGED: "BIND_TO_MESSAGES_LIST_CHANGED",
+            FunPayAPI.events.EventTypes.LAST_CHAT_MESSAGE_CHANGED: "BIND_TO_LAST_CHAT_MESSAGE_CHANGED",
+            FunPayAPI.events.EventTypes.NEW_MESSAGE: "BIND_TO_NEW_MESSAGE",
+
+            FunPayAPI.events.EventTypes.INITIAL_ORDER: "BIND_TO_INIT_ORDER",
+            FunPayAPI.events.EventTypes.ORDERS_LIST_CHANGED: "BIND_TO_ORDERS_LIST_CHANGED",
+            FunPayAPI.events.EventTypes.NEW_ORDER: "BIND_TO_NEW_ORDER",
+            FunPayAPI.events.EventTypes.ORDER_STATUS_CHANGED: "BIND_TO_ORDER_STATUS_CHANGED",
         }
 
-        for event in self.runner.listen(requests_delay=int(self.MAIN_CFG["Other"]["requestsDelay"])):
-            if instance_id != self.run_id:
+        def handle_event(event):
+            event_type = events_handlers[event.type]
+            self.run_handlers_table(self.get_handlers_table(event_type, event), event_type, (self, event), event)
+
+        events_queue = queue.Queue(maxsize=self.EVENTS_QUEUE_SIZE)
+        dispatcher = EventDispatcher(handle_event, self.get_event_key, workers=self.EVENTS_WORKERS,
+                                     max_pending=self.EVENTS_QUEUE_SIZE)
+        Thread(target=self.poll_events, args=(events_queue, instance_id), daemon=True, name="FPC-poller").start()
+
+        while True:
+            event = events_queue.get()
+            if event is None or instance_id != self.run_id:
                 break
-            self.run_handlers(events_handlers[event.type], (self, event))
+            dispatcher.dispatch(event)
+        dispatcher.shutdown()
+
+    def poll_events(self, events_queue: queue.Queue, instance_id: int):
+        """
+        Получает события от FunPayAPI.Runner и складывает их в очередь для process_events.
+
+        :param events_queue: очередь событий (None в очереди - события закончились).
+        :param instance_id: ID запуска кардинала (run_id), для которого получаются события.
+        """
+        try:
+            for event in self.runner.listen(requests_delay=self.settings.requests_delay):
+                if self.event_journal:
+                    self.event_journal.write_event(event)
+                events_queue.put(event)
+                if instance_id != self.run_id:
+                    break
+        finally:
+            events_queue.put(None)  # Иначе при исключении process_events будет ждать события вечно.
+
+    def start_events_recording(self, path: str) -> None:
+        """
+        Включает запись событий FunPayAPI.Runner в журнал (для воспроизведения через replay.py).
+
+        :param path: путь до файла журнала.
+        """
+        try:
+            journal = EventJournalWriter(path)
+            journal.write_header(self.account.id, self.account.username, self.profile)
+        except:
+            logger.error(f"Не удалось начать запись событий в {path}.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+            return
+        self.event_journal = journal
+        logger.info(f"Запись событий FunPay включена: {path}.")  # locale
+
+    @staticmethod
+    def get_event_key(event) -> tuple[str, int | str] | None:
+        """
+        Возвращает ключ очереди, в которой должно обрабатываться событие.
+        События одного чата / заказа обрабатываются по порядку, события разных чатов / заказов - параллельно.
+        События изменения списков чатов / заказов обрабатываются после завершения всех предыдущих событий
+        и до начала следующих.
+
+        :param event: событие FunPayAPI.Runner.
+
+        :return: ключ очереди или None, если событие должно обрабатываться отдельно от остальных.
+        """
+        if event.type is FunPayAPI.events.EventTypes.NEW_MESSAGE:
+            return "chat", event.message.chat_id
+        elif event.type in (FunPayAPI.events.EventTypes.INITIAL_CHAT,
+                            FunPayAPI.events.EventTypes.LAST_CHAT_MESSAGE_CHANGED):
+            return "chat", event.chat.id
+        elif event.type in (FunPayAPI.events.EventTypes.INITIAL_ORDER, FunPayAPI.events.EventTypes.NEW_ORDER,
+                            FunPayAPI.events.EventTypes.ORDER_STATUS_CHANGED):
+            return "order", event.order.id
+        return None
 
     def lots_raise_loop(self):
         """
@@ -608,7 +742,7 @@ class Cardinal(object):
         logger.info(_("crd_raise_loop_started"))
         while True:
             try:
-                if not self.MAIN_CFG["FunPay"].getboolean("autoRaise"):
+                if not self.settings.autoraise_enabled:
                     time.sleep(10)
                     continue
                 next_time = self.raise_lots()
@@ -636,6 +770,8 @@ class Cardinal(object):
         Инициализирует кардинал: регистрирует хэндлеры, инициализирует и запускает Telegram бота,
         получает данные аккаунта и профиля.
         """
+        # Возвращаем товары выдач, не завершенных до остановки Кардинала.
+        quarantined = self.products_store.recover()
         self.add_handlers_from_plugin(handlers)
         self.add_handlers_from_plugin(announcements)
         self.load_plugins()
@@ -643,11 +779,19 @@ class Cardinal(object):
 
         if self.MAIN_CFG["Telegram"].getboolean("enabled"):
             self.__init_telegram()
+            for record in quarantined:
+                self.telegram.notifier.notify(
+                    f"⚠️ Выдача товаров для заказа #{record['order_id']} была прервана во время отправки "
+                    f"(аварийное завершение Кардинала). Товары ({len(record['products'])} шт.) могли быть выданы, "
+                    f"поэтому не возвращены в файл {record['path']}, а сохранены в "
+                    f"{self.products_store.quarantine_path}. Проверьте чат заказа.",
+                    notification_type=NotificationTypes.critical)  # locale
             for module in [auto_response_cp, auto_delivery_cp, config_loader_cp, templates_cp, plugins_cp,
-                           file_uploader, authorized_users_cp, proxy_cp, default_cp]:
+                           file_uploader, authorized_users_cp, proxy_cp, default_cp, handlers_stats_cp]:
                 self.add_handlers_from_plugin(module)
 
         self.run_handlers(self.pre_init_handlers, (self,))
+        self.rebuild_handler_tables()  # Плагины могут добавлять хэндлеры в списки напрямую при инициализации.
 
         if self.MAIN_CFG["Telegram"].getboolean("enabled"):
             self.telegram.setup_commands()
@@ -671,7 +815,10 @@ class Cardinal(object):
         self.__init_account()
         self.runner = FunPayAPI.Runner(self.account, self.old_mode_enabled)
         self.__update_profile()
+        if (journal_path := os.getenv("FPC_RECORD_EVENTS", "0")) != "0":
+            self.start_events_recording(self.EVENTS_JOURNAL_PATH if journal_path == "1" else journal_path)
         self.run_handlers(self.post_init_handlers, (self,))
+        self.rebuild_handler_tables()
         return self
 
     def run(self):
@@ -685,6 +832,8 @@ class Cardinal(object):
 
         Thread(target=self.lots_raise_loop, daemon=True).start()
         Thread(target=self.update_session_loop, daemon=True).start()
+        Thread(target=self.handler_stats_loop, daemon=True).start()
+        Thread(target=self.old_users_loop, daemon=True).start()
         self.process_events()
 
     def start(self):
@@ -726,13 +875,85 @@ class Cardinal(object):
     @staticmethod
     def save_config(config: configparser.ConfigParser, file_path: str) -> None:
         """
-        Сохраняет конфиг в указанный файл.
+        Сохраняет конфиг в указанный файл. Если сохраняется основной конфиг, обновляет снимок настроек.
 
         :param config: объект конфига.
         :param file_path: путь до файла, в который нужно сохранить конфиг.
         """
         with open(file_path, "w", encoding="utf-8") as f:
             config.write(f)
+        if (crd := get_cardinal()) is None:
+            return
+        if config is getattr(crd, "MAIN_CFG", None):
+            crd.update_settings()
+        elif config is getattr(crd, "AR_CFG", None) or config is getattr(crd, "RAW_AR_CFG", None):
+            crd.rebuild_auto_response_index()
+        elif config is getattr(crd, "AD_CFG", None):
+            crd.rebuild_auto_delivery_index()
+
+    def rebuild_auto_response_index(self) -> None:
+        """
+        Пересобирает индекс команд автоответчика из AR_CFG.
+        Должна вызываться после любого изменения AR_CFG (save_config вызывает ее сама).
+        """
+        self.auto_response_index = AutoResponseIndex(self.AR_CFG)
+
+    def match_auto_response(self, command: str) -> str | None:
+        """
+        Ищет команду автоответчика, которой соответствует текст сообщения.
+
+        :param command: текст сообщения (без пробелов по краям, в нижнем регистре).
+
+        :return: название секции команды в AR_CFG или None.
+        """
+        if self.auto_response_index.config is not self.AR_CFG:  # Конфиг был заменен (например, загружен из TG).
+            self.rebuild_auto_response_index()
+        return self.auto_response_index.match(command)
+
+    def rebuild_auto_delivery_index(self) -> None:
+        """
+        Пересобирает индекс секций автовыдачи из AD_CFG.
+        Должна вызываться после любого изменения AD_CFG (save_config вызывает ее сама).
+        """
+        self.auto_delivery_index = AutoDeliveryIndex(self.AD_CFG)
+
+    def get_auto_delivery_index(self) -> AutoDeliveryIndex:
+        """
+        Возвращает актуальный индекс секций автовыдачи.
+        """
+        if self.auto_delivery_index.config is not self.AD_CFG:  # Конфиг был заменен (например, загружен из TG).
+            self.rebuild_auto_delivery_index()
+        return self.auto_delivery_index
+
+    def invalidate_lots_description_indexes(self) -> None:
+        """
+        Сбрасывает индексы описаний лотов. Должна вызываться после любого изменения лотов в self.profile.
+        """
+        self.lots_description_indexes = {}
+
+    def get_lots_description_index(self, subcategory: FunPayAPI.types.SubCategory) -> LotsDescriptionIndex:
+        """
+        Возвращает индекс описаний лотов подкатегории из self.profile.
+
+        :param subcategory: подкатегория.
+        """
+        indexes = self.lots_description_indexes
+        if (index := indexes.get(subcategory)) is None:
+            lots = self.profile.get_sorted_lots(2).get(subcategory, {}).values()
+            index = indexes[subcategory] = LotsDescriptionIndex(lots)
+        return index
+
+    def update_settings(self) -> None:
+        """
+        Пересоздает снимок настроек (self.settings) из MAIN_CFG.
+        Должна вызываться после любого изменения MAIN_CFG (save_config вызывает ее сама).
+        """
+        try:
+            self.settings = Settings(self.MAIN_CFG)
+            self.old_users.greetings_cooldown = self.settings.greetings_cooldown
+        except:
+            logger.error("Не удалось обновить настройки из _main.cfg, используются предыдущие.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
 
     # Загрузка плагинов
     @staticmethod
@@ -839,6 +1060,15 @@ class Cardinal(object):
             for func in functions:
                 func.plugin_uuid = uuid
             self.handler_bind_var_names[name].extend(functions)
+
+        for func, spec in (getattr(plugin, "HANDLER_FILTERS", None) or {}).items():
+            try:
+                func.event_filters = event_filters.compile_filters(spec)
+            except:
+                logger.error(f"Не удалось загрузить фильтры хэндлера {self.get_handler_name(func)}. "
+                             f"Хэндлер будет вызываться для всех событий.")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
+        self.rebuild_handler_tables()
         logger.info(_("crd_handlers_registered", plugin.__name__))
 
     def add_handlers(self):
@@ -849,6 +1079,43 @@ class Cardinal(object):
             plugin = self.plugins[i].plugin
             self.add_handlers_from_plugin(plugin, i)
 
+    def is_handler_enabled(self, func: Callable) -> bool:
+        """
+        Проверяет, включен ли плагин, которому принадлежит хэндлер.
+
+        :param func: хэндлер.
+        """
+        plugin_uuid = getattr(func, "plugin_uuid", None)
+        return plugin_uuid is None or (plugin_uuid in self.plugins and self.plugins[plugin_uuid].enabled)
+
+    def rebuild_handler_tables(self) -> None:
+        """
+        Пересобирает таблицы активных хэндлеров (self.handler_tables).
+        Должна вызываться после любого изменения списков хэндлеров или включения / выключения плагинов.
+        """
+        self.handler_tables = {
+            name: tuple((func, self.get_handler_name(func), getattr(func, "plugin_uuid", None),
+                         getattr(func, "event_filters", None))
+                        for func in handlers_list if self.is_handler_enabled(func))
+            for name, handlers_list in self.handler_bind_var_names.items()
+        }
+        self.handler_subcategory_index = {
+            name: index for name, table in self.handler_tables.items()
+            if (index := event_filters.build_subcategory_index(table)) is not None
+        }
+
+    def get_handlers_table(self, event_type: str, event) -> tuple[tuple[Callable, str, str | None, tuple | None], ...]:
+        """
+        Возвращает таблицу хэндлеров для события с учетом индекса по подкатегориям заказов.
+
+        :param event_type: тип события (название переменной BIND_TO_*).
+        :param event: событие FunPay.
+        """
+        index = self.handler_subcategory_index.get(event_type)
+        if index is None or (order := getattr(event, "order", None)) is None:
+            return self.handler_tables[event_type]
+        return index.get(event_filters.get_order_subcategory_id(order), index[None])
+
     def run_handlers(self, handlers_list: list[Callable], args) -> None:
         """
         Выполняет функции из списка handlers.
@@ -856,11 +1123,36 @@ class Cardinal(object):
         :param handlers_list: Список хэндлеров.
         :param args: аргументы для хэндлеров.
         """
-        for func in handlers_list:
+        if (event_type := self.__handlers_list_names.get(id(handlers_list))) is not None:
+            table = self.handler_tables[event_type]
+        else:
+            event_type = "OTHER"
+            table = tuple((func, self.get_handler_name(func), getattr(func, "plugin_uuid", None), None)
+                          for func in handlers_list if self.is_handler_enabled(func))
+        self.run_handlers_table(table, event_type, args)
+
+    def run_handlers_table(self, table: tuple[tuple[Callable, str, str | None, tuple | None], ...], event_type: str,
+                           args, event=None) -> None:
+        """
+        Выполняет хэндлеры из таблицы активных хэндлеров (см. rebuild_handler_tables).
+
+        :param table: таблица активных хэндлеров: ((хэндлер, имя хэндлера, UUID плагина, фильтры | None), ...).
+        :param event_type: тип события (название переменной BIND_TO_*) для статистики.
+        :param args: аргументы для хэндлеров.
+        :param event: событие FunPay для проверки фильтров хэндлеров (None - фильтры не проверяются).
+        """
+        for func, handler_name, plugin_uuid, filters in table:
+            if filters is not None and event is not None:
+                try:
+                    if not event_filters.check_filters(filters, self, event):
+                        continue
+                except:
+                    logger.error(f"Произошла ошибка при проверке фильтров хэндлера {handler_name}.")  # locale
+                    logger.debug("TRACEBACK", exc_info=True)
+            wall, cpu, error = time.perf_counter(), time.thread_time(), True
             try:
-                plugin_uuid = getattr(func, "plugin_uuid")
-                if plugin_uuid is None or (plugin_uuid in self.plugins and self.plugins[plugin_uuid].enabled):
-                    func(*args)
+                func(*args)
+                error = False
             except Exception as ex:
                 text = _("crd_handler_err")
                 try:
@@ -870,6 +1162,42 @@ class Cardinal(object):
                 logger.error(text)
                 logger.debug("TRACEBACK", exc_info=True)
                 continue
+            finally:
+                self.handler_stats.record(handler_name, plugin_uuid, event_type,
+                                          time.perf_counter() - wall, time.thread_time() - cpu, error)
+
+    @staticmethod
+    def get_handler_name(func: Callable) -> str:
+        """
+        Возвращает имя хэндлера для статистики (модуль.имя).
+
+        :param func: хэндлер.
+        """
+        return f"{getattr(func, '__module__', None)}.{getattr(func, '__qualname__', repr(func))}"
+
+    def handler_stats_loop(self):
+        """
+        Запускает бесконечный цикл сохранения статистики хэндлеров в storage/cache/handlers_stats.json.
+        """
+        while True:
+            time.sleep(self.HANDLER_STATS_DUMP_INTERVAL)
+            try:
+                self.handler_stats.dump()
+            except:
+                logger.warning("Не удалось сохранить статистику хэндлеров.")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
+
+    def old_users_loop(self):
+        """
+        Запускает бесконечный цикл записи накопленных изменений old_users в storage/cache/old_users.log.
+        """
+        while True:
+            time.sleep(self.OLD_USERS_FLUSH_INTERVAL)
+            try:
+                self.old_users.flush()
+            except:
+                logger.warning("Не удалось сохранить список написавших пользователей.")  # locale
+                logger.debug("TRACEBACK", exc_info=True)
 
     def add_telegram_commands(self, uuid: str, commands: list[tuple[str, str, bool]]):
         """
@@ -901,88 +1229,89 @@ class Cardinal(object):
         elif not self.plugins[uuid].enabled and uuid not in self.disabled_plugins:
             self.disabled_plugins.append(uuid)
         cardinal_tools.cache_disabled_plugins(self.disabled_plugins)
+        self.rebuild_handler_tables()
 
     # Настройки
     @property
     def autoraise_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("autoRaise")
+        return self.settings.autoraise_enabled
 
     @property
     def autoresponse_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("autoResponse")
+        return self.settings.autoresponse_enabled
 
     @property
     def autodelivery_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("autoDelivery")
+        return self.settings.autodelivery_enabled
 
     @property
     def multidelivery_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("multiDelivery")
+        return self.settings.multidelivery_enabled
 
     @property
     def autorestore_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("autoRestore")
+        return self.settings.autorestore_enabled
 
     @property
     def autodisable_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("autoDisable")
+        return self.settings.autodisable_enabled
 
     @property
     def old_mode_enabled(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("oldMsgGetMode")
+        return self.settings.old_mode_enabled
 
     @property
     def keep_sent_messages_unread(self) -> bool:
-        return self.MAIN_CFG["FunPay"].getboolean("keepSentMessagesUnread")
+        return self.settings.keep_sent_messages_unread
 
     @property
     def show_image_name(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("showImageName")
+        return self.settings.show_image_name
 
     @property
     def bl_delivery_enabled(self) -> bool:
-        return self.MAIN_CFG["BlockList"].getboolean("blockDelivery")
+        return self.settings.bl_delivery_enabled
 
     @property
     def bl_response_enabled(self) -> bool:
-        return self.MAIN_CFG["BlockList"].getboolean("blockResponse")
+        return self.settings.bl_response_enabled
 
     @property
     def bl_msg_notification_enabled(self) -> bool:
-        return self.MAIN_CFG["BlockList"].getboolean("blockNewMessageNotification")
+        return self.settings.bl_msg_notification_enabled
 
     @property
     def bl_order_notification_enabled(self) -> bool:
-        return self.MAIN_CFG["BlockList"].getboolean("blockNewOrderNotification")
+        return self.settings.bl_order_notification_enabled
 
     @property
     def bl_cmd_notification_enabled(self) -> bool:
-        return self.MAIN_CFG["BlockList"].getboolean("blockCommandNotification")
+        return self.settings.bl_cmd_notification_enabled
 
     @property
     def include_my_msg_enabled(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("includeMyMessages")
+        return self.settings.include_my_msg_enabled
 
     @property
     def include_fp_msg_enabled(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("includeFPMessages")
+        return self.settings.include_fp_msg_enabled
 
     @property
     def include_bot_msg_enabled(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("includeBotMessages")
+        return self.settings.include_bot_msg_enabled
 
     @property
     def only_my_msg_enabled(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("notifyOnlyMyMessages")
+        return self.settings.only_my_msg_enabled
 
     @property
     def only_fp_msg_enabled(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("notifyOnlyFPMessages")
+        return self.settings.only_fp_msg_enabled
 
     @property
     def only_bot_msg_enabled(self) -> bool:
-        return self.MAIN_CFG["NewMessageView"].getboolean("notifyOnlyBotMessages")
+        return self.settings.only_bot_msg_enabled
 
     @property
     def block_tg_login(self) -> bool:
-        return self.MAIN_CFG["Telegram"].getboolean("blockLogin")
+        return self.settings.block_tg_login
@@ -16,15 +16,22 @@ from FunPayAPI.updater.events import *
 from tg_bot import utils, keyboards
 from Utils import cardinal_tools
 from locales.localizer import Localizer
-from threading import Thread
+from Utils.executor import FUNPAY_IO, BACKGROUND
+from Utils import outbox
 import configparser
 from datetime import datetime
+import threading
 import logging
 import time
 import re
 
-LAST_STACK_ID = ""
-MSG_LOG_LAST_STACK_ID = ""
+# ID последнего обработанного стека сообщений по чатам {ID чата: ID стека}. События разных чатов обрабатываются
+# параллельно и могут чередоваться, поэтому последний стек хранится для каждого чата отдельно.
+LAST_STACK_IDS: dict[int, str] = {}
+MSG_LOG_LAST_STACK_IDS: dict[int, str] = {}
+# Хэндлеры выполняются параллельно в нескольких потоках: проверка и обновление общего состояния должны быть атомарными.
+STACK_ID_LOCK = threading.Lock()  # LAST_STACK_IDS, MSG_LOG_LAST_STACK_IDS
+GREETINGS_LOCK = threading.Lock()  # c.greeting_chat_id_threshold, c.greeting_threshold_chat_ids
 
 logger = logging.getLogger("FPC.handlers")
 localizer = Localizer()
@@ -63,17 +70,17 @@ def save_init_chats_handler(c: Cardinal, e: InitialChatEvent):
     """
     Кэширует существующие чаты (чтобы не отправлять приветственные сообщения).
     """
-    if c.MAIN_CFG["Greetings"].getboolean("sendGreetings") and e.chat.id not in c.old_users:
+    if c.settings.greetings_enabled and e.chat.id not in c.old_users:
         c.old_users[e.chat.id] = int(time.time())
-        cardinal_tools.cache_old_users(c.old_users)
 
 
 def update_threshold_on_initial_chat(c: Cardinal, e: InitialChatEvent):
     """
     Обновляет пороговое значение для определения новых чатов.
     """
-    if e.chat.id > c.greeting_chat_id_threshold:
-        c.greeting_chat_id_threshold = e.chat.id
+    with GREETINGS_LOCK:
+        if e.chat.id > c.greeting_chat_id_threshold:
+            c.greeting_chat_id_threshold = e.chat.id
 
 
 # NEW MESSAGE / LAST CHAT MESSAGE CHANGED
@@ -95,11 +102,11 @@ def old_log_msg_handler(c: Cardinal, e: LastChatMessageChangedEvent):
 
 
 def log_msg_handler(c: Cardinal, e: NewMessageEvent):
-    global MSG_LOG_LAST_STACK_ID
-    if e.stack.id() == MSG_LOG_LAST_STACK_ID:
-        return
-
     chat_name, chat_id = e.message.chat_name, e.message.chat_id
+    with STACK_ID_LOCK:
+        if MSG_LOG_LAST_STACK_IDS.get(chat_id) == e.stack.id():
+            return
+        MSG_LOG_LAST_STACK_IDS[chat_id] = e.stack.id()
 
     logger.info(_("log_new_msg", chat_name, chat_id))
     for index, event in enumerate(e.stack.get_stack()):
@@ -111,7 +118,6 @@ def log_msg_handler(c: Cardinal, e: NewMessageEvent):
                 logger.info(f"      $YELLOW{username}: $CYAN{line}")
             else:
                 logger.info(f"      $CYAN{line}")
-    MSG_LOG_LAST_STACK_ID = e.stack.id()
 
 
 def update_threshold_on_last_message_change(c: Cardinal, e: LastChatMessageChangedEvent | NewMessageEvent):
@@ -126,18 +132,19 @@ def update_threshold_on_last_message_change(c: Cardinal, e: LastChatMessageChang
         chat_id = e.message.chat_id
     else:
         chat_id = e.chat.id
-    if e.runner_tag != c.last_greeting_chat_id_threshold_change_tag:
-        c.greeting_chat_id_threshold = max([c.greeting_chat_id_threshold, *c.greeting_threshold_chat_ids])
-        c.greeting_threshold_chat_ids = set()
-        c.last_greeting_chat_id_threshold_change_tag = e.runner_tag
-    c.greeting_threshold_chat_ids.add(chat_id)
+    with GREETINGS_LOCK:
+        if e.runner_tag != c.last_greeting_chat_id_threshold_change_tag:
+            c.greeting_chat_id_threshold = max([c.greeting_chat_id_threshold, *c.greeting_threshold_chat_ids])
+            c.greeting_threshold_chat_ids = set()
+            c.last_greeting_chat_id_threshold_change_tag = e.runner_tag
+        c.greeting_threshold_chat_ids.add(chat_id)
 
 
 def greetings_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEvent):
     """
     Отправляет приветственное сообщение.
     """
-    if not c.MAIN_CFG["Greetings"].getboolean("sendGreetings"):
+    if not c.settings.greetings_enabled:
         return
     if not c.old_mode_enabled:
         if isinstance(e, LastChatMessageChangedEvent):
@@ -147,24 +154,28 @@ def greetings_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEv
     else:
         obj = e.chat
         chat_id, chat_name, mtype, its_me, badge = obj.id, obj.name, obj.last_message_type, not obj.unread, None
-    if any([c.MAIN_CFG["Greetings"].getboolean("onlyNewChats") and
-            (chat_id <= c.greeting_chat_id_threshold or chat_id in c.greeting_threshold_chat_ids),
-            time.time() - c.old_users.get(chat_id, 0) < float(
-                c.MAIN_CFG["Greetings"]["greetingsCooldown"]) * 24 * 60 * 60,
+    settings = c.settings
+    if any([time.time() - c.old_users.get(chat_id, 0) < settings.greetings_cooldown * 24 * 60 * 60,
             its_me, mtype in (MessageTypes.DEAR_VENDORS, MessageTypes.ORDER_CONFIRMED_BY_ADMIN), badge is not None,
-            (mtype is not MessageTypes.NON_SYSTEM and c.MAIN_CFG["Greetings"].getboolean("ignoreSystemMessages"))]):
+            (mtype is not MessageTypes.NON_SYSTEM and settings.greetings_ignore_system_messages)]):
         return
+    if settings.greetings_only_new_chats:
+        with GREETINGS_LOCK:
+            if chat_id <= c.greeting_chat_id_threshold or chat_id in c.greeting_threshold_chat_ids:
+                return
+            # Сразу помечаем чат, чтобы параллельный хэндлер не отправил приветствие повторно.
+            c.greeting_threshold_chat_ids.add(chat_id)
 
     logger.info(_("log_sending_greetings", chat_name, chat_id))
-    text = cardinal_tools.format_msg_text(c.MAIN_CFG["Greetings"]["greetingsText"], obj)
-    Thread(target=c.send_message, args=(chat_id, text, chat_name), daemon=True).start()
+    text = cardinal_tools.format_msg_text(settings.greetings_text, obj)
+    c.queue_message(chat_id, text, chat_name, priority=outbox.GREETING)
 
 
 def add_old_user_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEvent):
     """
     Добавляет пользователя в список написавших.
     """
-    if not c.MAIN_CFG["Greetings"].getboolean("sendGreetings") or c.MAIN_CFG["Greetings"].getboolean("onlyNewChats"):
+    if not c.settings.greetings_enabled or c.settings.greetings_only_new_chats:
         return
 
     if not c.old_mode_enabled:
@@ -178,7 +189,6 @@ def add_old_user_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChange
         return
 
     c.old_users[chat_id] = int(time.time())
-    cardinal_tools.cache_old_users(c.old_users)
 
 
 def send_response_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEvent):
@@ -197,18 +207,20 @@ def send_response_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChang
         chat_id, chat_name, username = obj.id, obj.name, obj.name
 
     mtext = mtext.replace("\n", "")
-    if any([c.bl_response_enabled and username in c.blacklist, (command := mtext.strip().lower()) not in c.AR_CFG]):
+    if c.bl_response_enabled and username in c.blacklist:
+        return
+    if (section := c.match_auto_response(command := mtext.strip().lower())) is None:
         return
 
     logger.info(_("log_new_cmd", command, chat_name, chat_id))
-    response_text = cardinal_tools.format_msg_text(c.AR_CFG[command]["response"], obj)
-    Thread(target=c.send_message, args=(chat_id, response_text, chat_name), daemon=True).start()
+    response_text = cardinal_tools.format_msg_text(c.AR_CFG[section]["response"], obj)
+    c.queue_message(chat_id, response_text, chat_name, priority=outbox.AUTO_RESPONSE)
 
 
 def old_send_new_msg_notification_handler(c: Cardinal, e: LastChatMessageChangedEvent):
     if any([not c.old_mode_enabled, not c.telegram, not e.chat.unread,
             c.bl_msg_notification_enabled and e.chat.name in c.blacklist,
-            e.chat.last_message_type is not MessageTypes.NON_SYSTEM, str(e.chat).strip().lower() in c.AR_CFG.sections(),
+            e.chat.last_message_type is not MessageTypes.NON_SYSTEM, c.match_auto_response(str(e.chat).strip().lower()) is not None,
             str(e.chat).startswith("!автовыдача")]):
         return
     user = e.chat.name
@@ -220,20 +232,20 @@ def old_send_new_msg_notification_handler(c: Cardinal, e: LastChatMessageChanged
         user = f"👤 {user}"
     text = f"<i><b>{user}: </b></i><code>{utils.escape(str(e.chat))}</code>"
     kb = keyboards.reply(e.chat.id, e.chat.name, extend=True)
-    Thread(target=c.telegram.send_notification, args=(text, kb, utils.NotificationTypes.new_message),
-           daemon=True).start()
+    c.telegram.notifier.notify(text, kb, utils.NotificationTypes.new_message)
 
 
 def send_new_msg_notification_handler(c: Cardinal, e: NewMessageEvent) -> None:
     """
     Отправляет уведомление о новом сообщении в телеграм.
     """
-    global LAST_STACK_ID
-    if not c.telegram or e.stack.id() == LAST_STACK_ID:
+    if not c.telegram:
         return
-    LAST_STACK_ID = e.stack.id()
-
     chat_id, chat_name = e.message.chat_id, e.message.chat_name
+    with STACK_ID_LOCK:
+        if LAST_STACK_IDS.get(chat_id) == e.stack.id():
+            return
+        LAST_STACK_IDS[chat_id] = e.stack.id()
     if c.bl_msg_notification_enabled and chat_name in c.blacklist:
         return
 
@@ -269,7 +281,7 @@ def send_new_msg_notification_handler(c: Cardinal, e: NewMessageEvent) -> None:
     last_by_vertex = False
     for i in events:
         message_text = str(e.message)
-        if message_text.strip().lower() in c.AR_CFG.sections() and len(events) < 2:
+        if len(events) < 2 and c.match_auto_response(message_text.strip().lower()) is not None:
             return
         elif message_text.startswith("!автовыдача") and len(events) < 2:
             return
@@ -305,20 +317,17 @@ def send_new_msg_notification_handler(c: Cardinal, e: NewMessageEvent) -> None:
         last_by_vertex = i.message.by_vertex
         last_badge = i.message.badge
     kb = keyboards.reply(chat_id, chat_name, extend=True)
-    Thread(target=c.telegram.send_notification, args=(text, kb, utils.NotificationTypes.new_message),
-           daemon=True).start()
+    c.telegram.notifier.notify(text, kb, utils.NotificationTypes.new_message)
 
 
 def send_review_notification(c: Cardinal, order: Order, chat_id: int, reply_text: str | None):
     if not c.telegram:
         return
     reply_text = _("ntfc_review_reply_text").format(utils.escape(reply_text)) if reply_text else ""
-    Thread(target=c.telegram.send_notification,
-           args=(_("ntfc_new_review").format('⭐' * order.review.stars, order.id, utils.escape(order.review.text),
-                                             reply_text),
-                 keyboards.new_order(order.id, order.buyer_username, chat_id),
-                 utils.NotificationTypes.review),
-           daemon=True).start()
+    c.telegram.notifier.notify(_("ntfc_new_review").format('⭐' * order.review.stars, order.id,
+                                                           utils.escape(order.review.text), reply_text),
+                               keyboards.new_order(order.id, order.buyer_username, chat_id),
+                               utils.NotificationTypes.review)
 
 
 def process_review_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEvent):
@@ -352,10 +361,9 @@ def process_review_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChan
 
         logger.info(f"Изменен отзыв на заказ #{order.id}.")  # locale
 
-        toggle = f"star{order.review.stars}Reply"
-        text = f"star{order.review.stars}ReplyText"
+        review_text = c.settings.review_replies.get(order.review.stars)
         reply_text = None
-        if c.MAIN_CFG["ReviewReply"].getboolean(toggle) and c.MAIN_CFG["ReviewReply"].get(text):
+        if review_text:
             try:
                 # Укорачиваем текст до 999 символов (оставляем 1 на спецсимвол), до 10 строк
                 def format_text4review(text_: str):
@@ -378,7 +386,7 @@ def process_review_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChan
                         text_ = text_[::-1].replace("\n", " ", text_.count("\n") - 9)[::-1]
                     return text_
 
-                reply_text = cardinal_tools.format_order_text(c.MAIN_CFG["ReviewReply"].get(text), order)
+                reply_text = cardinal_tools.format_order_text(review_text, order)
                 reply_text = format_text4review(reply_text)
                 c.account.send_review(order.id, reply_text)
             except:
@@ -386,7 +394,7 @@ def process_review_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChan
                 logger.debug("TRACEBACK", exc_info=True)
         send_review_notification(c, order, chat_id, reply_text)
 
-    Thread(target=send_reply, daemon=True).start()
+    c.executor.submit(FUNPAY_IO, send_reply)
 
 
 def send_command_notification_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEvent):
@@ -407,16 +415,16 @@ def send_command_notification_handler(c: Cardinal, e: NewMessageEvent | LastChat
     if c.bl_cmd_notification_enabled and username in c.blacklist:
         return
     command = message_text.strip().lower()
-    if command not in c.AR_CFG or not c.AR_CFG[command].getboolean("telegramNotification"):
+    section = c.match_auto_response(command)
+    if section is None or not c.AR_CFG[section].getboolean("telegramNotification"):
         return
 
-    if not c.AR_CFG[command].get("notificationText"):
+    if not c.AR_CFG[section].get("notificationText"):
         text = f"🧑‍💻 Пользователь <b><i>{username}</i></b> ввел команду <code>{utils.escape(command)}</code>."  # locale
     else:
-        text = cardinal_tools.format_msg_text(c.AR_CFG[command]["notificationText"], obj)
+        text = cardinal_tools.format_msg_text(c.AR_CFG[section]["notificationText"], obj)
 
-    Thread(target=c.telegram.send_notification, args=(text, keyboards.reply(chat_id, chat_name),
-                                                      utils.NotificationTypes.command), daemon=True).start()
+    c.telegram.notifier.notify(text, keyboards.reply(chat_id, chat_name), utils.NotificationTypes.command)
 
 
 def test_auto_delivery_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChangedEvent):
@@ -466,9 +474,7 @@ def send_categories_raised_notification_handler(c: Cardinal, cat: types.Category
         return
 
     text = f"""⤴️<b><i>Поднял все лоты категории</i></b> <code>{cat.name}</code>\n<tg-spoiler>{error_text}</tg-spoiler>"""  # locale
-    Thread(target=c.telegram.send_notification,
-           args=(text,),
-           kwargs={"notification_type": utils.NotificationTypes.lots_raise}, daemon=True).start()
+    c.telegram.notifier.notify(text, notification_type=utils.NotificationTypes.lots_raise)
 
 
 # Изменен список ордеров (REGISTER_TO_ORDERS_LIST_CHANGED)
@@ -481,16 +487,20 @@ def get_lot_config_by_name(c: Cardinal, name: str) -> configparser.SectionProxy
 
     :return: секцию конфига или None.
     """
-    for i in c.AD_CFG.sections():
-        if i in name:
-            return c.AD_CFG[i]
-    return None
+    section = c.get_auto_delivery_index().find_substring(name)
+    return c.AD_CFG[section] if section is not None else None
 
 
-def check_products_amount(config_obj: configparser.SectionProxy) -> int:
+def check_products_amount(config_obj: configparser.SectionProxy, c: Cardinal | None = None) -> int:
+    """
+    Возвращает кол-во товаров лота (1, если файл товаров не привязан).
+    Если передан Кардинал, кол-во берется из хранилища товаров (без чтения файла, если он не изменился).
+    """
     file_name = config_obj.get("productsFileName")
     if not file_name:
         return 1
+    if c is not None:
+        return c.products_store.count(f"storage/products/{file_name}")
     return cardinal_tools.count_products(f"storage/products/{file_name}")
 
 
@@ -521,6 +531,7 @@ def update_profile_lots_handler(c: Cardinal, e: OrdersListChangedEvent):
 
     for lot_id, lot in lots.items():
         c.profile.update_lot(lot)
+    c.invalidate_lots_description_indexes()
 
 
 # Новый ордер (REGISTER_TO_NEW_ORDER)
@@ -538,32 +549,14 @@ def setup_event_attributes_handler(c: Cardinal, e: NewOrderEvent, *args):
     lot_id = None
     lot_description = e.order.description
     # пробуем найти лот, чтобы не выдавать по строке, которую вписал покупатель при оформлении заказа
-    for lot in sorted(list(c.profile.get_sorted_lots(2).get(e.order.subcategory, {}).values()),
-                      key=lambda l: len(f"{l.server}, {l.side}, {l.description}"), reverse=True):
-
-        temp_desc = ", ".join([i for i in [lot.server, lot.side, lot.description] if i])
-
-        if temp_desc in e.order.description:
-            lot_description = temp_desc
-            lot_shortcut = lot
-            lot_id = lot.id
-            break
+    if found := c.get_lots_description_index(e.order.subcategory).find(e.order.description):
+        lot_description, lot_shortcut = found
+        lot_id = lot_shortcut.id
 
-    for i in range(3):
-        for lot_name in c.AD_CFG:
-            if i == 0:
-                rule = lot_description == lot_name
-            elif i == 1:
-                rule = lot_description.startswith(lot_name)
-            else:
-                rule = lot_name in lot_description
-
-            if rule:
-                config_section_obj = c.AD_CFG[lot_name]
-                config_section_name = lot_name
-                break
-        if config_section_obj:
-            break
+    # точное совпадение -> начало описания -> подстрока описания
+    if (lot_name := c.get_auto_delivery_index().match(lot_description)) is not None:
+        config_section_obj = c.AD_CFG[lot_name]
+        config_section_name = lot_name
 
     attributes = {"config_section_name": config_section_name, "config_section_obj": config_section_obj,
                   "delivered": False, "delivery_text": None, "goods_delivered": 0, "goods_left": None,
@@ -583,7 +576,7 @@ def send_new_order_notification_handler(c: Cardinal, e: NewOrderEvent, *args):
     """
     if not c.telegram:
         return
-    if e.order.buyer_username in c.blacklist and c.MAIN_CFG["BlockList"].getboolean("blockNewOrderNotification"):
+    if e.order.buyer_username in c.blacklist and c.bl_order_notification_enabled:
         return
     if not (config_obj := getattr(e, "config_section_obj")):
         delivery_info = _("ntfc_new_order_not_in_cfg")
@@ -601,8 +594,7 @@ def send_new_order_notification_handler(c: Cardinal, e: NewOrderEvent, *args):
 
     chat_id = c.account.get_chat_by_name(e.order.buyer_username, True).id
     keyboard = keyboards.new_order(e.order.id, e.order.buyer_username, chat_id)
-    Thread(target=c.telegram.send_notification, args=(text, keyboard, utils.NotificationTypes.new_order),
-           daemon=True).start()
+    c.telegram.notifier.notify(text, keyboard, utils.NotificationTypes.new_order)
 
 
 def deliver_goods(c: Cardinal, e: NewOrderEvent, *args):
@@ -610,12 +602,16 @@ def deliver_goods(c: Cardinal, e: NewOrderEvent, *args):
     cfg_obj = getattr(e, "config_section_obj")
     delivery_text = cardinal_tools.format_order_text(cfg_obj["response"], e.order)
 
-    amount, goods_left, products = 1, -1, []
+    amount, goods_left, products, reservation = 1, -1, [], None
     try:
         if file_name := cfg_obj.get("productsFileName"):
             if c.multidelivery_enabled and not cfg_obj.getboolean("disableMultiDelivery"):
                 amount = e.order.amount if e.order.amount else 1
-            products, goods_left = cardinal_tools.get_products(f"storage/products/{file_name}", amount)
+            reservation = c.products_store.reserve(f"storage/products/{file_name}", amount, e.order.id)
+            products, goods_left = reservation.products, reservation.left
+            if cfg_obj.getboolean("checkDuplicates") and (duplicates := c.products_store.find_delivered(products)):
+                logger.warning(f"Товары для заказа $YELLOW{e.order.id}$RESET (вероятно) уже выдавались ранее: "
+                               f"{len(duplicates)} из {len(products)} шт.")  # locale
             delivery_text = delivery_text.replace("$product", "\n".join(products).replace("\\n", "\n"))
     except Exception as exc:
         logger.error(
@@ -626,14 +622,23 @@ def deliver_goods(c: Cardinal, e: NewOrderEvent, *args):
                 f"Произошла ошибка при получении товаров для заказа {e.order.id}: {str(exc)}")  # locale
         return
 
-    result = c.send_message(chat_id, delivery_text, e.order.buyer_username)
+    try:
+        if reservation:
+            c.products_store.mark_sending(reservation)
+        result = c.send_message(chat_id, delivery_text, e.order.buyer_username, priority=outbox.DELIVERY)
+    except:
+        if reservation:
+            c.products_store.release(reservation)
+        raise
     if not result:
         logger.error(f"Не удалось отправить товар для ордера $YELLOW{e.order.id}$RESET.")  # locale
         setattr(e, "error", 1)
         setattr(e, "error_text", f"Не удалось отправить сообщение с товаром для заказа {e.order.id}.")  # locale
-        if file_name and products:
-            cardinal_tools.add_products(f"storage/products/{file_name}", products, at_zero_position=True)
+        if reservation:
+            c.products_store.release(reservation)
     else:
+        if reservation:
+            c.products_store.commit(reservation)
         logger.info(f"Товар для заказа {e.order.id} выдан.")  # locale
         setattr(e, "delivered", True)
         setattr(e, "delivery_text", delivery_text)
@@ -645,7 +650,7 @@ def deliver_product_handler(c: Cardinal, e: NewOrderEvent, *args) -> None:
     """
     Обертка для deliver_product(), обрабатывающая ошибки.
     """
-    if not c.MAIN_CFG["FunPay"].getboolean("autoDelivery"):
+    if not c.autodelivery_enabled:
         return
     if e.order.buyer_username in c.blacklist and c.bl_delivery_enabled:
         logger.info(f"Пользователь {e.order.buyer_username} находится в ЧС и включена блокировка автовыдачи. "
@@ -680,8 +685,7 @@ def send_delivery_notification_handler(c: Cardinal, e: NewOrderEvent):
 <code>{utils.escape(getattr(e, "delivery_text"))}</code>\n
 📋 <b><i>Осталось товаров: </i></b>{amount}"""  # locale
 
-    Thread(target=c.telegram.send_notification, args=(text,),
-           kwargs={"notification_type": utils.NotificationTypes.delivery}, daemon=True).start()
+    c.telegram.notifier.notify(text, notification_type=utils.NotificationTypes.delivery)
 
 
 def update_lot_state(cardinal: Cardinal, lot: types.LotShortcut, task: int) -> bool:
@@ -756,17 +760,17 @@ def update_lots_states(cardinal: Cardinal, event: NewOrderEvent):
                         current_task = 1
                     # если глобальная автодеактивация включена - восстанавливаем только если есть товары.
                     else:
-                        if check_products_amount(config_obj):
+                        if check_products_amount(config_obj, cardinal):
                             current_task = 1
 
         # Если же лот активен
         else:
             # и найден в конфиге автовыдачи
             if config_obj:
-                products_count = check_products_amount(config_obj)
+                products_count = check_products_amount(config_obj, cardinal)
                 # и все условия выполнены: нет товаров + включено глобальная автодеактивация + она не выключена в
                 # самом лоте в конфига автовыдачи - отключаем.
-                if all((not products_count, cardinal.MAIN_CFG["FunPay"].getboolean("autoDisable"),
+                if all((not products_count, cardinal.autodisable_enabled,
                         config_obj.get("disableAutoDisable") in ["0", None])):
                     current_task = -1
 
@@ -784,20 +788,18 @@ def update_lots_states(cardinal: Cardinal, event: NewOrderEvent):
         text = f"""🔴 <b>Деактивировал лоты:</b>
         
 <code>{lots}</code>"""
-        Thread(target=cardinal.telegram.send_notification, args=(text,),
-               kwargs={"notification_type": utils.NotificationTypes.lots_deactivate}, daemon=True).start()
+        cardinal.telegram.notifier.notify(text, notification_type=utils.NotificationTypes.lots_deactivate)
     if restored:
         lots = "\n".join(restored)  # locale
         text = f"""🟢 <b>Активировал лоты:</b>
 
 <code>{lots}</code>"""
-        Thread(target=cardinal.telegram.send_notification, args=(text,),
-               kwargs={"notification_type": utils.NotificationTypes.lots_restore}, daemon=True).start()
+        cardinal.telegram.notifier.notify(text, notification_type=utils.NotificationTypes.lots_restore)
     cardinal.last_state_change_tag = event.runner_tag
 
 
 def update_lots_state_handler(cardinal: Cardinal, event: NewOrderEvent, *args):
-    Thread(target=update_lots_states, args=(cardinal, event), daemon=True).start()
+    cardinal.executor.submit(BACKGROUND, update_lots_states, cardinal, event)
 
 
 # BIND_TO_ORDER_STATUS_CHANGED
@@ -805,16 +807,15 @@ def send_thank_u_message_handler(c: Cardinal, e: OrderStatusChangedEvent):
     """
     Отправляет ответное сообщение на подтверждение заказа.
     """
-    if not c.MAIN_CFG["OrderConfirm"].getboolean("sendReply") or e.order.status is not types.OrderStatuses.CLOSED:
+    if not c.settings.order_confirm_reply_enabled or e.order.status is not types.OrderStatuses.CLOSED:
         return
 
-    text = cardinal_tools.format_order_text(c.MAIN_CFG["OrderConfirm"]["replyText"], e.order)
+    text = cardinal_tools.format_order_text(c.settings.order_confirm_reply_text, e.order)
     chat = c.account.get_chat_by_name(e.order.buyer_username, True)
     logger.info(f"Пользователь $YELLOW{e.order.buyer_username}$RESET подтвердил выполнение заказа "  # locale
                 f"$YELLOW{e.order.id}.$RESET")  # locale
     logger.info(f"Отправляю ответное сообщение ...")  # locale
-    Thread(target=c.send_message, args=(chat.id, text, e.order.buyer_username),
-           kwargs={'watermark': c.MAIN_CFG["OrderConfirm"].getboolean("watermark")}, daemon=True).start()
+    c.queue_message(chat.id, text, e.order.buyer_username, watermark=c.settings.order_confirm_watermark)
 
 
 def send_order_confirmed_notification_handler(cardinal: Cardinal, event: OrderStatusChangedEvent):
@@ -825,13 +826,11 @@ def send_order_confirmed_notification_handler(cardinal: Cardinal, event: OrderSt
         return
 
     chat = cardinal.account.get_chat_by_name(event.order.buyer_username, True)
-    Thread(target=cardinal.telegram.send_notification,  # locale
-           args=(
-               f"""🪙 Пользователь <a href="https://funpay.com/chat/?node={chat.id}">{event.order.buyer_username}</a> """
-               f"""подтвердил выполнение заказа <code>{event.order.id}</code>. (<code>{event.order.price} {event.order.currency}</code>)""",
-               keyboards.new_order(event.order.id, event.order.buyer_username, chat.id),
-               utils.NotificationTypes.order_confirmed),
-           daemon=True).start()
+    cardinal.telegram.notifier.notify(  # locale
+        f"""🪙 Пользователь <a href="https://funpay.com/chat/?node={chat.id}">{event.order.buyer_username}</a> """
+        f"""подтвердил выполнение заказа <code>{event.order.id}</code>. (<code>{event.order.price} {event.order.currency}</code>)""",
+        keyboards.new_order(event.order.id, event.order.buyer_username, chat.id),
+        utils.NotificationTypes.order_confirmed)
 
 
 def send_bot_started_notification_handler(c: Cardinal, *args):
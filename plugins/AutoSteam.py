@@ -1,7 +1,6 @@
 from __future__ import annotations
 import json
 import time
-import requests
 import uuid
 import re
 import logging
@@ -12,11 +11,14 @@ from os.path import exists
 import telebot
 from telebot.types import InlineKeyboardMarkup as K, InlineKeyboardButton as B
 from FunPayAPI.updater.events import NewMessageEvent
-from FunPayAPI.types import OrderStatuses, SubCategoryTypes
+from FunPayAPI.types import OrderStatuses, SubCategoryTypes, MessageTypes
 from FunPayAPI.common import exceptions
 import tg_bot
 from tg_bot import CBT
 from bs4 import BeautifulSoup
+from requests.exceptions import RequestException
+from Utils import http_pool
+from Utils.executor import FUNPAY_IO, BACKGROUND
 import os
 import datetime
 
@@ -148,7 +150,7 @@ def save_black_list(black_list):
 def get_balance():
     try:
         token = get_token()
-        response = requests.post("https://api.ns.gifts/api/v1/check_balance", headers={"Authorization": f"Bearer {token}"})
+        response = http_pool.get_pool().post("https://api.ns.gifts/api/v1/check_balance", headers={"Authorization": f"Bearer {token}"})
         if response.status_code == 200:
             data = response.json()
             logger.info(f"{LOGGER_PREFIX} Баланс успешно получен!")
@@ -184,7 +186,7 @@ def format_amount(amount: float, currency: str) -> str:
 def get_currency_rates():
     try:
         token = get_token()
-        response = requests.post("https://api.ns.gifts/api/v1/steam/get_currency_rate", headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"})
+        response = http_pool.get_pool().post("https://api.ns.gifts/api/v1/steam/get_currency_rate", headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"})
         if response.status_code == 200:
             data = response.json()
             logger.info(f"{LOGGER_PREFIX} Получены курсы валют: {data}")
@@ -432,11 +434,8 @@ def send_notification(cardinal: Cardinal, order_id: str, status: str, details: d
             message += f"\n<b>L Дополнительно:</b> <code>{details['message']}</code>"
         message += f"\n\n<b>• Дата:</b> <code>{timestamp}</code>"
     kb = K(row_width=2).add(B("💙 FunPay", url=f"https://funpay.com/orders/{order_id}/"), B("💙 Покупатель", url=f"https://funpay.com/users/{buyer_id if order else 'Неизвестно'}/"))
-    for chat_id in SETTINGS["notification_chats"]:
-        try:
-            bot.send_message(chat_id, message, parse_mode="HTML", reply_markup=kb if kb.keyboard else None)
-        except Exception as e:
-            logger.error(f"{LOGGER_PREFIX} Ошибка уведомления в чат {chat_id}: {e}")
+    cardinal.telegram.notifier.send_to(SETTINGS["notification_chats"], message, kb if kb.keyboard else None,
+                                       parse_mode="HTML")
 
 def cancel_input(call: telebot.types.CallbackQuery, cardinal: Cardinal):
     tg.clear_state(call.message.chat.id, call.from_user.id)
@@ -484,7 +483,7 @@ def handle_new_message(cardinal: Cardinal, event: NewMessageEvent):
                     order = cardinal.account.get_order(order_id)
                     buyer_id = order.buyer_id
                     USER_ORDER_QUEUES.setdefault(buyer_id, Queue()).put({"order_id": order_id, "chat_id": message.chat_id})
-                    threading.Thread(target=process_user_orders, args=(cardinal, buyer_id), daemon=True).start()
+                    cardinal.executor.submit(BACKGROUND, process_user_orders, cardinal, buyer_id)
                     logger.info(f"{LOGGER_PREFIX} Заказ #{order_id} добавлен в очередь обработки")
                 except Exception as e:
                     logger.error(f"{LOGGER_PREFIX} Ошибка при получении информации о заказе #{order_id}: {e}")
@@ -637,7 +636,7 @@ def get_token():
     if time.time() < TOKEN_DATA["expiry"]:
         return TOKEN_DATA["token"]
     payload = {"email": SETTINGS["api_login"], "password": SETTINGS["api_password"]}
-    response = requests.post("https://api.ns.gifts/api/v1/get_token", json=payload)
+    response = http_pool.get_pool().post("https://api.ns.gifts/api/v1/get_token", json=payload)
     if response.status_code == 200:
         data = response.json()
         TOKEN_DATA["token"] = data.get("token") or data.get("access_token") or data["data"]["token"]
@@ -647,16 +646,16 @@ def get_token():
 
 def get_steam_amount(amount: float, currency: str = "RUB"):
     token = get_token()
-    response = requests.post("https://api.ns.gifts/api/v1/steam/get_amount", json={"amount": round(amount, 2), "currency": currency}, headers={"Authorization": f"Bearer {token}"})
+    response = http_pool.get_pool().post("https://api.ns.gifts/api/v1/steam/get_amount", json={"amount": round(amount, 2), "currency": currency}, headers={"Authorization": f"Bearer {token}"})
     if response.status_code == 200:
         return float(response.json().get("usd_price", 0))
     logger.error(f"{LOGGER_PREFIX} Ошибка при получении курса: {response.status_code} - {response.text}")
     raise Exception(f"Ошибка API NSGifts: {response.status_code}")
 
-def create_order(service_id: int, quantity: str, data: str):
+def create_order(service_id: int, quantity: str, data: str, custom_id: str | None = None):
     token = get_token()
-    custom_id = str(uuid.uuid4())
-    response = requests.post("https://api.ns.gifts/api/v1/create_order", json={"service_id": service_id, "quantity": quantity, "custom_id": custom_id, "data": data}, headers={"Authorization": f"Bearer {token}"})
+    custom_id = custom_id or str(uuid.uuid4())
+    response = http_pool.get_pool().post("https://api.ns.gifts/api/v1/create_order", json={"service_id": service_id, "quantity": quantity, "custom_id": custom_id, "data": data}, headers={"Authorization": f"Bearer {token}"}, timeout=http_pool.LONG_TIMEOUT)
     if response.status_code == 200:
         return response.json().get("custom_id")
     error_text = response.text
@@ -666,7 +665,7 @@ def create_order(service_id: int, quantity: str, data: str):
 
 def pay_order(custom_id: str):
     token = get_token()
-    response = requests.post("https://api.ns.gifts/api/v1/pay_order", json={"custom_id": custom_id}, headers={"Authorization": f"Bearer {token}"})
+    response = http_pool.get_pool().post("https://api.ns.gifts/api/v1/pay_order", json={"custom_id": custom_id}, headers={"Authorization": f"Bearer {token}"}, timeout=http_pool.LONG_TIMEOUT)
     if response.status_code == 200:
         return True
     error_message = response.json().get("detail", "Неизвестная ошибка")
@@ -695,8 +694,21 @@ def perform_top_up(cardinal: Cardinal, order_id: str, steam_login: str, currency
         logger.info(f"{LOGGER_PREFIX} Курс для пополнения {currency}: {rate_key} = {rate}")
         amount_usd = round(float(quantity) / float(rate), 2) if rate != 0 else 0.22
         logger.info(f"{LOGGER_PREFIX} Сумма в USD для {quantity} {currency}: {amount_usd} (курс: {rate})")
-        custom_id = create_order(1, f"{amount_usd:.2f}", steam_login)
-        pay_order(custom_id)
+        custom_id = str(uuid.uuid4())
+        get_token()  # Заранее: ошибка получения токена не должна считаться неизвестным статусом заказа.
+        try:
+            custom_id = create_order(1, f"{amount_usd:.2f}", steam_login, custom_id)
+            pay_order(custom_id)
+        except RequestException as ex:
+            if not http_pool.is_ambiguous_error(ex):
+                raise
+            # Запрос отправлен, но ответ не получен: заказ мог быть создан и оплачен, возврат средств привел бы к потере денег.
+            logger.error(f"{LOGGER_PREFIX} Нет ответа NSGifts при выполнении заказа #{order_id}, статус заказа {custom_id} неизвестен: {ex}")
+            logger.debug("TRACEBACK", exc_info=True)
+            cardinal.send_message(chat_id, "⏳ Платежный сервис долго не отвечает. Продавец проверит статус пополнения и свяжется с вами.")
+            send_notification(cardinal, order_id, "error", {"steam_login": steam_login, "quantity": float(quantity), "currency": currency, "timestamp": time.time(), "message": f"NSGifts не ответил, пополнение могло быть выполнено. Проверьте заказ {custom_id} в личном кабинете NSGifts, автовозврат не выполнялся"}, parse_mode="HTML")
+            FUNPAY_STATES.pop(state_key, None)
+            return
         current_time = time.strftime('%H:%M:%S | %Y-%m-%d')
         cardinal.send_message(chat_id, f"⁡🎉⁡-----------------------------------------------------------🎉\n\n💙 Средства успешно отправлены!\n\nL Логин Steam: {steam_login}\nL Сумма пополнения: {format_amount(quantity, currency)}\nL Время выполнения: {current_time}\n\n• Подтвердите заказ: https://funpay.com/orders/{order_id}/\n\n❤️ Не забудьте оставить отзыв с упоминанием полной автоматизации заказа, приятного использования!")
         logger.info(f"{LOGGER_PREFIX} Заказ #{order_id} успешно выполнен!")
@@ -709,7 +721,7 @@ def perform_top_up(cardinal: Cardinal, order_id: str, steam_login: str, currency
         if SETTINGS["notification_types"]["success"]:
             send_notification(cardinal, order_id, "success", {"steam_login": steam_login, "quantity": float(quantity), "currency": currency, "timestamp": time.time(), "amount_usd": amount_usd, "rate": rate}, parse_mode="HTML")
         SUCCESSFUL_ORDERS[order_id] = time.time()
-        threading.Thread(target=check_order_confirmation, args=(cardinal, order_id, chat_id, author_id), daemon=True).start()
+        cardinal.executor.schedule(2 * 60, FUNPAY_IO, check_order_confirmation, cardinal, order_id, chat_id, author_id)
         order_info = {"order_id": order_id, "buyer_username": order.buyer_username, "buyer_id": order.buyer_id, "sum": order.sum, "currency": currency, "quantity": float(quantity), "steam_login": steam_login, "status": "success", "timestamp": time.time(), "amount_usd": amount_usd, "rate": rate}
         orders = load_orders()
         orders.append(order_info)
@@ -737,7 +749,6 @@ def perform_top_up(cardinal: Cardinal, order_id: str, steam_login: str, currency
                 FUNPAY_STATES.pop(state_key, None)
 
 def check_order_confirmation(cardinal: Cardinal, order_id: str, chat_id: int, author_id: int):
-    time.sleep(2 * 60)
     order = cardinal.account.get_order(order_id)
     if order.status not in [OrderStatuses.CLOSED, OrderStatuses.REFUNDED]:
         cardinal.send_message(chat_id, f"⁡🔔 Напоминание: Пожалуйста, подтвердите заказ. Это является обязательным!\n\n• Ссылка на заказ: https://funpay.com/orders/{order_id}/")
@@ -807,7 +818,7 @@ def process_new_order(cardinal: Cardinal, message: NewMessageEvent):
                 order = cardinal.account.get_order(order_id)
                 buyer_id = order.buyer_id
                 USER_ORDER_QUEUES.setdefault(buyer_id, Queue()).put({"order_id": order_id, "chat_id": message.chat_id})
-                threading.Thread(target=process_user_orders, args=(cardinal, buyer_id), daemon=True).start()
+                cardinal.executor.submit(BACKGROUND, process_user_orders, cardinal, buyer_id)
                 logger.info(f"{LOGGER_PREFIX} Заказ #{order_id} добавлен в очередь обработки через process_new_order")
             except Exception as e:
                 logger.error(f"{LOGGER_PREFIX} Ошибка при получении информации о заказе #{order_id}: {e}")
@@ -870,4 +881,11 @@ def init(cardinal: Cardinal):
         cardinal.new_message_handlers.append(handle_new_message)
 
 BIND_TO_PRE_INIT = [init]
-BIND_TO_DELETE = None
\ No newline at end of file
+BIND_TO_DELETE = None
+HANDLER_FILTERS = {
+    # Сообщение об оплате заказа или сообщение покупателя, с которым ведется диалог.
+    handle_new_message: [
+        {"message_types": [MessageTypes.ORDER_PURCHASED]},
+        {"active_dialog": lambda m: (m.chat_id, m.author_id) in FUNPAY_STATES},
+    ]
+}
@@ -9,7 +9,12 @@ import os
 import json
 import logging
 import threading
+import sqlite3
+import queue
+import itertools
+import heapq
 import requests
+from Utils import http_pool
 import shutil
 import time
 import uuid
@@ -17,7 +22,10 @@ import hashlib
 from telebot import types
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime, timedelta
+from concurrent.futures import Future
 from FunPayAPI.updater.events import NewMessageEvent, NewOrderEvent
+from Utils.outbox import backoff_delay
+from Utils.lot_matcher import LotNameMatcher
 
 try:
     import pymysql
@@ -42,12 +50,15 @@ HASH_MAC = hashlib.sha256(MAC_ID.encode()).hexdigest()[17:32]
 RUNNING = False
 IS_STARTED = False
 ORDER_CHECK_THREAD = None
+STATUS_POLLER = None
+LEDGER = None
+LOT_MATCHER = None
+LEDGER_LOCK = threading.Lock()
 AUTO_LOTS_SEND_THREAD = None
 logger = logging.getLogger("auto_smm")
 
 orders_info = {}
 processed_users = {}
-waiting_for_link: Dict[str, Dict] = {}
 waiting_for_lots_upload = set()
 CACHE_RUNNING = False
 
@@ -58,12 +69,74 @@ CONFIG_PATH = os.path.join("storage", "cache", "auto_lots.json")
 ORDERS_PATH = os.path.join("storage", "cache", "auto_smm_orders.json")
 ORDERS_DATA_PATH = os.path.join("storage", "cache", "orders_data.json")
 VALID_WEBSITES_PATH = os.path.join("storage", "cache", "valid_websites.json")
+LEDGER_PATH = os.path.join("storage", "cache", "auto_smm.sqlite3")
 LOG_PATH = os.path.join("logs", "log.log")
+
+STATUS_CHECK_INTERVAL = 300  # Интервал проверки статуса заказа (сек).
+STATUS_MAX_DELAY = 3600  # Макс. задержка проверки при ошибках (сек).
+STATUS_RATE_LIMIT_DELAY = 60  # Начальная пауза проверок в сервисе после ответа 429 (сек).
+STATUS_BATCH_SIZE = 100  # Макс. кол-во заказов в одном запросе статусов.
+STATUS_NO_BATCH_RETRY = 6 * 3600  # Через сколько снова пробовать пачки в сервисе, не вернувшем статусы пачкой (сек).
+STATUS_IDLE_WAIT = 5  # Макс. время ожидания потока проверки (для проверки остановки плагина).
+LINK_DIALOG_TTL = 2 * 24 * 60 * 60  # Время ожидания ссылки / подтверждения от покупателя (сек).
+LEDGER_BATCH_SIZE = 100  # Макс. кол-во запросов изменения в одной транзакции журнала заказов.
+COMPLETED_STATUSES = ("completed", "done", "success", "partial")
+FAILED_STATUSES = ("failed", "error", "canceled")
 os.makedirs(os.path.dirname(ORDERS_PATH), exist_ok=True)
 os.makedirs(os.path.dirname(ORDERS_DATA_PATH), exist_ok=True)
 os.makedirs(os.path.dirname(VALID_WEBSITES_PATH), exist_ok=True)
 
+class JsonFileCache:
+    """
+    Кэш содержимого JSON-файла: файл перечитывается только если изменился на диске (mtime / размер)
+    или был перезаписан через set().
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: путь до файла.
+        """
+        self.path = path
+        self.value = None
+        self.__signature = None
+        self.__loaded = False
+        self.lock = threading.RLock()
+
+    def __get_signature(self) -> Tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def get(self, loader):
+        """
+        :param loader: функция чтения файла (вызывается, только если файл изменился).
+
+        :return: содержимое файла.
+        """
+        with self.lock:
+            if self.__loaded and self.__get_signature() == self.__signature:
+                return self.value
+            self.set(loader())
+            return self.value
+
+    def set(self, value):
+        """
+        Обновляет кэш после записи файла.
+        """
+        with self.lock:
+            self.value = value
+            self.__signature = self.__get_signature()
+            self.__loaded = True
+
+CONFIG_CACHE = JsonFileCache(CONFIG_PATH)
+VALID_LINKS_CACHE = JsonFileCache(VALID_WEBSITES_PATH)
+
 def load_valid_links() -> List[str]:
+    return VALID_LINKS_CACHE.get(read_valid_links)
+
+def read_valid_links() -> List[str]:
     if not os.path.exists(VALID_WEBSITES_PATH):
         return ["teletype.in", "t.me", "vk.com", "ok.ru", "youtube.com", "youtu.be"]
     try:
@@ -73,8 +146,10 @@ def load_valid_links() -> List[str]:
         return ["teletype.in", "t.me", "vk.com", "ok.ru", "youtube.com", "youtu.be"]
 
 def save_valid_links(links: List[str]):
-    with open(VALID_WEBSITES_PATH, 'w', encoding='utf-8') as f:
-        json.dump(links, f, ensure_ascii=False, indent=4)
+    with VALID_LINKS_CACHE.lock:
+        with open(VALID_WEBSITES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(links, f, ensure_ascii=False, indent=4)
+        VALID_LINKS_CACHE.set(links)
 
 def add_website(message: types.Message, new_site: str):
     valid_links = load_valid_links()
@@ -86,6 +161,13 @@ def add_website(message: types.Message, new_site: str):
     bot.send_message(message.chat.id, f"✅ Сайт {new_site} добавлен в список разрешенных.")
 
 def load_config() -> Dict:
+    """
+    Возвращает конфигурацию (auto_lots.json) из кэша; файл перечитывается только при изменении.
+    Измененную конфигурацию нужно сохранять через save_config().
+    """
+    return CONFIG_CACHE.get(read_config)
+
+def read_config() -> Dict:
     logger.info("Загрузка конфигурации (auto_lots.json)...")
     
     file_lock = threading.Lock()
@@ -186,10 +268,14 @@ def create_default_config() -> Dict:
     }
 
 def save_config(cfg: Dict):
+    global LOT_MATCHER
     logger.info("Сохранение конфигурации (auto_lots.json)...")
     os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(cfg, f, ensure_ascii=False, indent=4)
+    with CONFIG_CACHE.lock:
+        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+            json.dump(cfg, f, ensure_ascii=False, indent=4)
+        CONFIG_CACHE.set(cfg)
+        LOT_MATCHER = None
     logger.info("Конфигурация сохранена.")
 
 def reindex_lots(cfg: Dict):
@@ -206,7 +292,10 @@ def reindex_lots(cfg: Dict):
     save_config(cfg)
     logger.info("Лоты были переиндексированы после удаления.")
 
-def load_orders_data() -> List[Dict]:
+def read_orders_data() -> List[Dict]:
+    """
+    Загружает orders_data.json (для переноса в журнал заказов).
+    """
     if not os.path.exists(ORDERS_DATA_PATH):
         return []
     try:
@@ -237,23 +326,427 @@ def load_orders_data() -> List[Dict]:
         
         return []
 
-def save_orders_data(orders: List[Dict]):
-    temp_path = f"{ORDERS_DATA_PATH}.tmp"
+class SmmLedger:
+    """
+    Журнал заказов auto_smm в SQLite (WAL).
+
+    Таблица orders - заказы, отправленные в SMM-сервисы (раньше - orders_data.json), таблица orders_info - оплаченные
+    заказы для статистики (раньше - auto_smm_orders.json). Все изменения выполняет один поток записи: накопившиеся
+    запросы выполняются одной транзакцией. Чтение идет из отдельного соединения каждого потока и не блокируется
+    записью. При первом запуске данные переносятся из JSON-файлов (они переименовываются в *.migrated).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            provider_id TEXT,
+            chat_id INTEGER,
+            status TEXT,
+            chistota REAL,
+            customer_url TEXT,
+            quantity INTEGER,
+            service_number TEXT,
+            is_refunded INTEGER NOT NULL DEFAULT 0,
+            spent REAL NOT NULL DEFAULT 0,
+            summa REAL,
+            currency TEXT
+        );
+        CREATE INDEX IF NOT EXISTS orders_provider_id ON orders (provider_id);
+        CREATE INDEX IF NOT EXISTS orders_status ON orders (status);
+        CREATE INDEX IF NOT EXISTS orders_service_number ON orders (service_number);
+        CREATE TABLE IF NOT EXISTS orders_info (
+            order_id TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            summa REAL NOT NULL DEFAULT 0,
+            service_name TEXT,
+            chistota REAL,
+            spent REAL,
+            currency TEXT,
+            completed_notification_sent INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS orders_info_date ON orders_info (date);
+        CREATE TABLE IF NOT EXISTS link_dialogs (
+            order_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated REAL NOT NULL
+        );
+    """
+    ORDER_COLUMNS = ("order_id", "provider_id", "chat_id", "status", "chistota", "customer_url", "quantity",
+                     "service_number", "is_refunded", "spent", "summa", "currency")
+    INFO_COLUMNS = ("order_id", "date", "summa", "service_name", "chistota", "spent", "currency",
+                    "completed_notification_sent")
+
+    def __init__(self, path: str = LEDGER_PATH):
+        """
+        :param path: путь до файла базы данных.
+        """
+        self.path = path
+        self.__local = threading.local()
+        self.__queue: queue.Queue = queue.Queue()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self.__connect()
+        conn.executescript(self.SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+            with conn:
+                self.__migrate(conn)
+                conn.execute("PRAGMA user_version = 1")
+            for path_ in (ORDERS_DATA_PATH, ORDERS_PATH):
+                if os.path.exists(path_):
+                    os.replace(path_, f"{path_}.migrated")
+        conn.close()
+        self.__writer = threading.Thread(target=self.__write_loop, daemon=True, name="auto_smm-ledger")
+        self.__writer.start()
+
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def __reader(self) -> sqlite3.Connection:
+        if (conn := getattr(self.__local, "conn", None)) is None:
+            conn = self.__local.conn = self.__connect()
+        return conn
+
+    def __migrate(self, conn: sqlite3.Connection):
+        """
+        Переносит заказы из orders_data.json и auto_smm_orders.json.
+        """
+        orders = read_orders_data()
+        for order in orders:
+            conn.execute(self.__insert_sql("orders", self.ORDER_COLUMNS, "REPLACE"), self.__order_row(order))
+        orders_info = read_orders_info()
+        for info in orders_info:
+            conn.execute(self.__insert_sql("orders_info", self.INFO_COLUMNS, "IGNORE"), self.__info_row(info))
+        if orders or orders_info:
+            logger.info(f"Заказы перенесены в {self.path}: {len(orders)} заказов, {len(orders_info)} записей "
+                        f"статистики.")
+
+    @staticmethod
+    def __insert_sql(table: str, columns: Tuple[str, ...], conflict: str) -> str:
+        return f"INSERT OR {conflict} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    @staticmethod
+    def __order_row(order: Dict) -> tuple:
+        return (str(order["order_id"]), str(order.get("id_zakaz")), order.get("chat_id"), order.get("status"),
+                order.get("chistota"), order.get("customer_url"), order.get("quantity"),
+                str(order.get("service_number", 1)), int(bool(order.get("is_refunded", False))),
+                order.get("spent", 0.0) or 0.0, order.get("summa"), order.get("currency"))
+
+    @staticmethod
+    def __info_row(info: Dict) -> tuple:
+        return (str(info["order_id"]), info["date"], info.get("summa", 0) or 0, info.get("service_name"),
+                info.get("chistota"), info.get("spent"), info.get("currency"),
+                int(bool(info.get("completed_notification_sent", False))))
+
+    @staticmethod
+    def __order_dict(row: sqlite3.Row | None) -> Dict | None:
+        """
+        :return: заказ в формате orders_data.json.
+        """
+        if row is None:
+            return None
+        order = dict(row)
+        order["id_zakaz"] = order.pop("provider_id")
+        order["is_refunded"] = bool(order["is_refunded"])
+        return order
+
+    @staticmethod
+    def __info_dict(row: sqlite3.Row | None) -> Dict | None:
+        """
+        :return: запись статистики в формате auto_smm_orders.json.
+        """
+        if row is None:
+            return None
+        info = dict(row)
+        info["completed_notification_sent"] = bool(info["completed_notification_sent"])
+        return info
+
+    def __write_loop(self):
+        conn = self.__connect()
+        while True:
+            batch = [self.__queue.get()]
+            while len(batch) < LEDGER_BATCH_SIZE:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    results = [conn.execute(sql, params).rowcount for sql, params, _ in batch]
+            except Exception:
+                # Выполняем запросы по одному, чтобы ошибка одного запроса не отменила остальные.
+                for sql, params, future in batch:
+                    try:
+                        with conn:
+                            future.set_result(conn.execute(sql, params).rowcount)
+                    except Exception as e:
+                        logger.error(f"Ошибка при записи в {self.path}: {e}")
+                        logger.debug("TRACEBACK", exc_info=True)
+                        future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def write(self, sql: str, params: tuple = ()) -> int:
+        """
+        Выполняет запрос изменения в потоке записи и ожидает завершения транзакции.
+
+        :return: кол-во измененных строк.
+        """
+        future = Future()
+        self.__queue.put((sql, params, future))
+        return future.result()
+
+    def add_order(self, order: Dict):
+        self.write(self.__insert_sql("orders", self.ORDER_COLUMNS, "REPLACE"), self.__order_row(order))
+
+    def add_order_info(self, info: Dict):
+        self.write(self.__insert_sql("orders_info", self.INFO_COLUMNS, "IGNORE"), self.__info_row(info))
+
+    def get_order(self, order_id: str) -> Dict | None:
+        return self.__order_dict(self.__reader().execute("SELECT * FROM orders WHERE order_id = ?",
+                                                         (str(order_id),)).fetchone())
+
+    def get_order_by_provider_id(self, provider_id: int | str) -> Dict | None:
+        return self.__order_dict(self.__reader().execute("SELECT * FROM orders WHERE provider_id = ?",
+                                                         (str(provider_id),)).fetchone())
+
+    def get_order_info(self, order_id: str) -> Dict | None:
+        return self.__info_dict(self.__reader().execute("SELECT * FROM orders_info WHERE order_id = ?",
+                                                        (str(order_id),)).fetchone())
+
+    def get_open_orders(self) -> List[Dict]:
+        """
+        :return: незавершенные заказы (не выполненные, не возвращенные, без отправленного уведомления о завершении).
+        """
+        rows = self.__reader().execute("""
+            SELECT o.* FROM orders o LEFT JOIN orders_info i ON i.order_id = o.order_id
+            WHERE lower(o.status) != 'completed' AND o.is_refunded = 0
+                AND coalesce(i.completed_notification_sent, 0) = 0
+        """).fetchall()
+        return [self.__order_dict(row) for row in rows]
+
+    def get_statistics(self, now: datetime) -> Dict[str, float]:
+        """
+        :return: кол-во и сумма заказов за 24 часа / неделю / месяц / все время.
+        """
+        borders = [(now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") for days in (1, 7, 30)]
+        row = self.__reader().execute("""
+            SELECT count(*), total(summa),
+                count(CASE WHEN date >= :day THEN 1 END), total(CASE WHEN date >= :day THEN summa END),
+                count(CASE WHEN date >= :week THEN 1 END), total(CASE WHEN date >= :week THEN summa END),
+                count(CASE WHEN date >= :month THEN 1 END), total(CASE WHEN date >= :month THEN summa END)
+            FROM orders_info
+        """, dict(zip(("day", "week", "month"), borders))).fetchone()
+        return {
+            "day_orders": row[2],
+            "day_total": row[3],
+            "week_orders": row[4],
+            "week_total": row[5],
+            "month_orders": row[6],
+            "month_total": row[7],
+            "all_time_orders": row[0],
+            "all_time_total": row[1],
+        }
+
+    def export(self) -> Tuple[List[Dict], List[Dict]]:
+        """
+        :return: все заказы в формате orders_data.json и auto_smm_orders.json.
+        """
+        conn = self.__reader()
+        return ([self.__order_dict(row) for row in conn.execute("SELECT * FROM orders ORDER BY rowid")],
+                [self.__info_dict(row) for row in conn.execute("SELECT * FROM orders_info ORDER BY rowid")])
+
+    def get_link_dialogs(self) -> List[Tuple[str, Dict, float]]:
+        """
+        :return: заказы, ожидающие ссылку от покупателя: [(ID заказа, данные диалога, время изменения), ...].
+        """
+        return [(row["order_id"], json.loads(row["data"]), row["updated"]) for row in
+                self.__reader().execute("SELECT * FROM link_dialogs ORDER BY rowid")]
+
+    def save_link_dialog(self, order_id: str, data: Dict, updated: float):
+        # UPSERT (а не REPLACE) сохраняет rowid, а значит и порядок добавления диалогов.
+        self.write("INSERT INTO link_dialogs (order_id, data, updated) VALUES (?, ?, ?) ON CONFLICT (order_id) "
+                   "DO UPDATE SET data = excluded.data, updated = excluded.updated",
+                   (str(order_id), json.dumps(data, ensure_ascii=False), updated))
+
+    def delete_link_dialog(self, order_id: str):
+        self.write("DELETE FROM link_dialogs WHERE order_id = ?", (str(order_id),))
+
+    def clear(self):
+        self.write("DELETE FROM orders")
+        self.write("DELETE FROM orders_info")
+
+def get_ledger() -> SmmLedger:
+    global LEDGER
+    with LEDGER_LOCK:
+        if LEDGER is None:
+            LEDGER = SmmLedger()
+        return LEDGER
+
+def get_order_data(order_id_funpay: str) -> Dict | None:
+    """
+    :return: заказ по ID заказа FunPay.
+    """
+    return get_ledger().get_order(order_id_funpay)
+
+def get_order_by_service_id(twiboost_id: int | str) -> Dict | None:
+    """
+    :return: заказ по ID заказа в SMM-сервисе.
+    """
+    return get_ledger().get_order_by_provider_id(twiboost_id)
+
+def read_orders_info() -> List[Dict]:
+    """
+    Загружает auto_smm_orders.json (для переноса в журнал заказов).
+    """
+    if not os.path.exists(ORDERS_PATH):
+        return []
     try:
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(orders, f, indent=4, ensure_ascii=False)
-        
-        if os.path.exists(temp_path):
-            if os.path.exists(ORDERS_DATA_PATH):
-                os.remove(ORDERS_DATA_PATH)
-            os.rename(temp_path, ORDERS_DATA_PATH)
+        with open(ORDERS_PATH, 'r', encoding='utf-8') as f:
+            file_content = f.read()
+        return json.loads(file_content) if file_content.strip() else []
     except Exception as e:
-        logger.error(f"Ошибка при сохранении orders_data.json: {e}")
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+        logger.error(f"Ошибка при чтении файла {ORDERS_PATH}: {e}")
+        return []
+
+class LinkDialogStore:
+    """
+    Заказы, ожидающие ссылку / подтверждение ссылки от покупателя, с индексами по ID покупателя и ID чата.
+
+    Изменения сначала записываются в журнал заказов (таблица link_dialogs), затем применяются в памяти, поэтому
+    ожидающие диалоги переживают перезапуск. Диалоги без активности дольше LINK_DIALOG_TTL удаляются.
+    """
+
+    def __init__(self, ttl: float = LINK_DIALOG_TTL):
+        """
+        :param ttl: время жизни диалога без активности (сек).
+        """
+        self.ttl = ttl
+        self.__dialogs: Dict[str, Dict] = {}  # {ID заказа FunPay: данные диалога}
+        self.__updated: Dict[str, float] = {}  # {ID заказа FunPay: время последнего изменения}
+        self.__by_buyer: Dict[int, List[str]] = {}  # {ID покупателя: [ID заказов в порядке добавления]}
+        self.__by_chat: Dict[Any, List[str]] = {}  # {ID чата: [ID заказов в порядке добавления]}
+        self.__lock = threading.RLock()
+        self.__loaded = False
+        self.__last_expire = 0.0
+
+    def __load(self):
+        """
+        Загружает диалоги из журнала заказов (при первом обращении).
+        """
+        if self.__loaded:
+            return
+        for order_id, data, updated in get_ledger().get_link_dialogs():
+            self.__set(order_id, data, updated)
+        self.__loaded = True
+        if self.__dialogs:
+            logger.info(f"Восстановлено {len(self.__dialogs)} заказов, ожидающих ссылку.")
+        self.__expire(time.time())
+
+    def __set(self, order_id: str, data: Dict, updated: float):
+        if order_id not in self.__dialogs:
+            self.__by_buyer.setdefault(data["buyer_id"], []).append(order_id)
+            self.__by_chat.setdefault(data["chat_id"], []).append(order_id)
+        self.__dialogs[order_id] = data
+        self.__updated[order_id] = updated
+
+    def __remove(self, order_id: str) -> Dict | None:
+        if (data := self.__dialogs.pop(order_id, None)) is None:
+            return None
+        del self.__updated[order_id]
+        for index, key in ((self.__by_buyer, data["buyer_id"]), (self.__by_chat, data["chat_id"])):
+            index[key].remove(order_id)
+            if not index[key]:
+                del index[key]
+        return data
+
+    def __expire(self, now: float):
+        """
+        Удаляет диалоги без активности дольше ttl (не чаще раза в минуту).
+        """
+        if now - self.__last_expire < 60:
+            return
+        self.__last_expire = now
+        for order_id in [k for k, v in self.__updated.items() if now - v > self.ttl]:
+            logger.info(f"Заказ #{order_id} больше не ожидает ссылку: покупатель не ответил.")
+            get_ledger().delete_link_dialog(order_id)
+            self.__remove(order_id)
+
+    def __find(self, index: Dict[Any, List[str]], key: Any) -> Tuple[str, Dict] | None:
+        with self.__lock:
+            self.__load()
+            self.__expire(time.time())
+            if order_ids := index.get(key):
+                return order_ids[0], self.__dialogs[order_ids[0]]
+            return None
+
+    def add(self, order_id: str, data: Dict):
+        """
+        Добавляет (или заменяет) диалог заказа.
+        """
+        order_id = str(order_id)
+        with self.__lock:
+            self.__load()
+            now = time.time()
+            if (old := self.__dialogs.get(order_id)) is not None and \
+                    (old["buyer_id"], old["chat_id"]) != (data["buyer_id"], data["chat_id"]):
+                self.__remove(order_id)
+            get_ledger().save_link_dialog(order_id, data, now)
+            self.__set(order_id, data, now)
+            self.__expire(now)
+
+    def update(self, order_id: str, **changes):
+        """
+        Изменяет данные диалога заказа (шаг, ссылку и т.д.).
+        """
+        order_id = str(order_id)
+        with self.__lock:
+            self.__load()
+            if (data := self.__dialogs.get(order_id)) is None:
+                return
+            data = {**data, **changes}
+            now = time.time()
+            get_ledger().save_link_dialog(order_id, data, now)
+            self.__set(order_id, data, now)
+
+    def pop(self, order_id: str, default: Dict | None = None) -> Dict | None:
+        """
+        Удаляет диалог заказа.
+
+        :return: данные диалога или default.
+        """
+        order_id = str(order_id)
+        with self.__lock:
+            self.__load()
+            if order_id not in self.__dialogs:
+                return default
+            get_ledger().delete_link_dialog(order_id)
+            return self.__remove(order_id)
+
+    def find_by_buyer(self, buyer_id: int) -> Tuple[str, Dict] | None:
+        """
+        :return: (ID заказа, данные диалога) самого раннего ожидающего заказа покупателя или None.
+        """
+        return self.__find(self.__by_buyer, buyer_id)
+
+    def find_by_chat(self, chat_id: Any) -> Tuple[str, Dict] | None:
+        """
+        :return: (ID заказа, данные диалога) самого раннего ожидающего заказа в чате или None.
+        """
+        return self.__find(self.__by_chat, chat_id)
+
+    def has_buyer(self, buyer_id: int) -> bool:
+        return self.find_by_buyer(buyer_id) is not None
+
+    def __len__(self) -> int:
+        with self.__lock:
+            self.__load()
+            return len(self.__dialogs)
+
+waiting_for_link = LinkDialogStore()
 
 def save_order_data(
     chat_id: int,
@@ -281,14 +774,10 @@ def save_order_data(
         "currency": "RUB"
     }
     
-    orders = load_orders_data()
-    orders.append(data_)
-    save_orders_data(orders)
+    get_ledger().add_order(data_)
     logger.info(f"Данные заказа #{order_id} (twiboost ID: {twiboost_id}) сохранены.")
 
 def save_order_info(order_id: int, order_summa: float, service_name: str, order_chistota: float):
-    file_lock = threading.Lock()
-    
     data_ = {
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "order_id": order_id,
@@ -299,73 +788,21 @@ def save_order_info(order_id: int, order_summa: float, service_name: str, order_
     }
     
     try:
-        with file_lock:
-            if not os.path.exists(ORDERS_PATH):
-                with open(ORDERS_PATH, 'w', encoding='utf-8') as f:
-                    json.dump([], f, indent=4, ensure_ascii=False)
-            
-            try:
-                with open(ORDERS_PATH, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if not content.strip():
-                        orders = []
-                    else:
-                        orders = json.loads(content)
-            except json.JSONDecodeError as e:
-                logger.error(f"Ошибка при чтении {ORDERS_PATH}: {e}. Создаем новый файл.")
-                orders = []
-            
-            orders.append(data_)
-            
-            temp_path = f"{ORDERS_PATH}.tmp"
-            try:
-                with open(temp_path, 'w', encoding='utf-8') as f:
-                    json.dump(orders, f, indent=4, ensure_ascii=False)
-                
-                if os.path.exists(temp_path):
-                    if os.path.exists(ORDERS_PATH):
-                        os.remove(ORDERS_PATH)
-                    os.rename(temp_path, ORDERS_PATH)
-                    logger.info(f"Данные заказа #{order_id} успешно сохранены")
-            except Exception as e:
-                logger.error(f"Ошибка при сохранении данных заказа #{order_id}: {e}")
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
+        get_ledger().add_order_info(data_)
+        logger.info(f"Данные заказа #{order_id} успешно сохранены")
     except Exception as e:
         logger.error(f"Общая ошибка при сохранении информации о заказе #{order_id}: {e}")
 
 def update_order_status(order_id_funpay: str, new_status: str):
-    orders = load_orders_data()
-    updated = False
-
-    for order in orders:
-        if str(order["order_id"]) == str(order_id_funpay):
-            order["status"] = new_status
-            updated = True
-            logger.info(f"Статус заказа #{order_id_funpay} обновлён на '{new_status}'.")
-            break
-
-    if updated:
-        save_orders_data(orders)
+    if get_ledger().write("UPDATE orders SET status = ? WHERE order_id = ?", (new_status, str(order_id_funpay))):
+        logger.info(f"Статус заказа #{order_id_funpay} обновлён на '{new_status}'.")
     else:
-        logger.warning(f"Заказ #{order_id_funpay} не найден в orders_data.json.")
+        logger.warning(f"Заказ #{order_id_funpay} не найден в журнале заказов.")
 
 def update_order_refunded_status(order_id_funpay: str):
-    orders = load_orders_data()
-    updated = False
-    for order in orders:
-        if str(order["order_id"]) == str(order_id_funpay):
-            if not order.get("is_refunded", False):
-                order["is_refunded"] = True
-                updated = True
-                logger.info(f"Статус заказа #{order_id_funpay} обновлён на 'is_refunded': True.")
-            break
-
-    if updated:
-        save_orders_data(orders)
+    if get_ledger().write("UPDATE orders SET is_refunded = 1 WHERE order_id = ? AND is_refunded = 0",
+                          (str(order_id_funpay),)):
+        logger.info(f"Статус заказа #{order_id_funpay} обновлён на 'is_refunded': True.")
     else:
         logger.warning(f"Заказ #{order_id_funpay} не найден или уже отмечен как 'is_refunded'.")
 
@@ -380,8 +817,7 @@ def refund_order(c: Cardinal, order_id_funpay: str, buyer_chat_id: int, reason:
     if detailed_reason is None:
         detailed_reason = reason
 
-    orders = load_orders_data()
-    order_data = next((o for o in orders if str(o["order_id"]) == str(order_id_funpay)), None)
+    order_data = get_order_data(order_id_funpay)
     
     if order_data and order_data.get("is_refunded", False):
         logger.info(f"Заказ #{order_id_funpay} уже был возвращен. Пропуск.")
@@ -429,260 +865,325 @@ def refund_order(c: Cardinal, order_id_funpay: str, buyer_chat_id: int, reason:
             logger.warning("Notification chat_id не задан для уведомления о возврате.")
 
 def update_order_charge_and_net(order_id_funpay: str, spent: float, currency: str = "USD", net_profit: float = None):
-    orders_data = load_orders_data()
-    found_od = False
-    for order in orders_data:
-        if str(order["order_id"]) == str(order_id_funpay):
-            order["spent"] = spent
-            order["currency"] = currency
-            if net_profit is not None:
-                order["chistota"] = net_profit
-            else:
-                net = order["summa"] - spent
-                order["chistota"] = round(net, 2)
-            found_od = True
-            break
+    ledger = get_ledger()
+    for table in ("orders", "orders_info"):
+        ledger.write(f"UPDATE {table} SET spent = ?, currency = ?, chistota = coalesce(?, round(summa - ?, 2)) "
+                     f"WHERE order_id = ?", (spent, currency, net_profit, spent, str(order_id_funpay)))
 
-    if found_od:
-        save_orders_data(orders_data)
-
-    if os.path.exists(ORDERS_PATH):
-        with open(ORDERS_PATH, 'r', encoding='utf-8') as f:
-            orders_list = json.load(f)
-        updated_a = False
-        for o in orders_list:
-            if str(o["order_id"]) == str(order_id_funpay):
-                o["spent"] = spent
-                o["currency"] = currency
-                if net_profit is not None:
-                    o["chistota"] = net_profit
-                else:
-                    net = o["summa"] - spent
-                    o["chistota"] = round(net, 2)
-                updated_a = True
-                break
-
-        if updated_a:
-            with open(ORDERS_PATH, 'w', encoding='utf-8') as f:
-                json.dump(orders_list, f, indent=4, ensure_ascii=False)
-
-def check_order_status(
-    c: Cardinal,
-    twiboost_order_id: int,
-    buyer_chat_id: int,
-    link: str,
-    order_id_funpay: str,
-    attempt: int = 1
-):
+def process_order_status(c: Cardinal, twiboost_order_id: int, buyer_chat_id: int, order_id_funpay: str,
+                         data_: Dict) -> bool:
     """
-    Потоковая проверка статуса заказа на соответствующем SMM-сервисе.
+    Обрабатывает статус заказа, полученный от SMM-сервиса.
+
+    :return: True, если заказ завершен (выполнен / не выполнен) и проверять его больше не нужно.
     """
-    if not RUNNING:
-        logger.info(f"Плагин остановлен, прерываем проверку заказа #{twiboost_order_id}")
-        return
-        
-    file_lock = threading.Lock()
-    orders_info_data = []
-    
-    try:
-        with file_lock:
-            if os.path.exists(ORDERS_PATH):
-                try:
-                    with open(ORDERS_PATH, 'r', encoding='utf-8') as f:
-                        file_content = f.read()
-                        if not file_content.strip():
-                            orders_info_data = []
-                        else:
-                            orders_info_data = json.loads(file_content)
-                except (json.JSONDecodeError, Exception) as e:
-                    logger.error(f"Ошибка при чтении файла {ORDERS_PATH}: {e}")
-                    orders_info_data = []
-    except Exception as e:
-        logger.error(f"Ошибка при доступе к файлу {ORDERS_PATH}: {e}")
-        orders_info_data = []
-    
-    order_info = next((o for o in orders_info_data if str(o["order_id"]) == str(order_id_funpay)), None)
-    if order_info and order_info.get("completed_notification_sent", False):
-        logger.info(f"Уведомление о завершении для заказа #{order_id_funpay} уже было отправлено. Пропускаем проверку.")
-        return
-    
+    status_ = str(data_.get("status", "Unknown"))
+    remains_ = data_.get("remains", "Unknown")
+    logger.info(f"Ответ сервиса #{twiboost_order_id}: {data_}")
     try:
-        orders = load_orders_data()
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке данных о заказах: {e}")
-        orders = []
-    
-    order_data = next((o for o in orders if str(o["order_id"]) == str(order_id_funpay)), None)
-    if not order_data:
-        logger.warning(f"Заказ {order_id_funpay} не найден при check_order_status.")
-        return
+        remains_ = int(remains_)
+    except (TypeError, ValueError):
+        remains_ = None
+
+    status_lower = status_.lower()
+    if status_lower in COMPLETED_STATUSES or (remains_ is not None and remains_ == 0):
+        ledger = get_ledger()
+        order_info = ledger.get_order_info(order_id_funpay)
+        if order_info and order_info.get("completed_notification_sent", False):
+            logger.info(f"Уведомление о завершении для заказа #{order_id_funpay} уже было отправлено.")
+            return True
+        if order_info:
+            try:
+                ledger.write("UPDATE orders_info SET completed_notification_sent = 1 WHERE order_id = ?",
+                             (str(order_id_funpay),))
+                logger.info(f"Успешно обновлен статус уведомления для заказа #{order_id_funpay}")
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении статуса уведомления для заказа #{order_id_funpay}: {e}")
 
-    service_number = order_data["service_number"]
-    
-    try:
-        cfg = load_config()
-        service_cfg = cfg["services"].get(str(service_number))
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке конфигурации: {e}")
-        return
-    
-    if not service_cfg:
-        logger.warning(f"Не найден config.services[{service_number}] — прерываем проверку.")
-        return
+        order_link = f"https://funpay.com/orders/{order_id_funpay}/"
+        message = (
+            f"🎉 Ваш заказ успешно завершён!\n"
+            f"🔢 Номер заказа: {twiboost_order_id}\n"
+            f"🔗 Подтвердите заказ: {order_link}"
+        )
+        c.send_message(buyer_chat_id, message)
+        logger.info(f"Уведомление о завершении отправлено покупателю {buyer_chat_id} (заказ #{twiboost_order_id}).")
+        update_order_status(order_id_funpay, "completed")
+        return True
 
-    api_url = service_cfg["api_url"]
-    api_key = service_cfg["api_key"]
+    if status_lower in FAILED_STATUSES:
+        refund_order(
+            c,
+            order_id_funpay,
+            buyer_chat_id,
+            reason="Заказ не выполнен.",
+            detailed_reason=f"Заказ в сервисе имеет статус '{status_}'."
+        )
+        update_order_status(order_id_funpay, "failed")
+        return True
 
-    url_ = f"{api_url}?action=status&order={twiboost_order_id}&key={api_key}"
-    logger.info(f"Проверка статуса заказа #{twiboost_order_id}, попытка {attempt}...")
+    logger.info(f"Заказ #{twiboost_order_id} в статусе '{status_}' (осталось: {remains_}).")
+    return False
 
-    completed_statuses = ["completed", "done", "success", "partial"]
-    failed_statuses = ["failed", "error", "canceled"]
+class RateLimited(Exception):
+    def __init__(self, retry_after: float | None = None):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
 
-    try:
-        response = requests.get(url_, timeout=10)
-        logger.debug(f"Запрос к {url_} вернул статус {response.status_code}")
-        if response.status_code == 200:
-            data_ = response.json()
-            status_ = data_.get("status", "Unknown")
-            remains_ = data_.get("remains", "Unknown")
-            charge_ = data_.get("charge", "0")
-            currency_ = data_.get("currency", "USD")
-
-            logger.info(f"Ответ сервиса #{twiboost_order_id}: {data_}")
-            try:
-                remains_ = int(remains_)
-            except ValueError:
-                remains_ = None
-            try:
-                spent_ = float(charge_)
-            except ValueError:
-                spent_ = 0.0
+class OrderStatusPoller:
+    """
+    Проверяет статусы заказов в SMM-сервисах одним потоком.
 
-            status_lower = status_.lower()
+    Заказы хранятся в очереди с приоритетом по времени следующей проверки. Подошедшие к проверке заказы
+    группируются по сервису и проверяются пачками (action=status&orders=1,2,3, до STATUS_BATCH_SIZE за запрос).
+    При ошибках время до следующей проверки заказа растет экспоненциально, при ответе 429 проверки в этом
+    сервисе приостанавливаются.
+    """
 
-            if status_lower in completed_statuses or (remains_ is not None and remains_ == 0):
-                if order_info:
-                    try:
-                        with file_lock:
-                            for o in orders_info_data:
-                                if str(o["order_id"]) == str(order_id_funpay):
-                                    o["completed_notification_sent"] = True
-                                    break
-                            with open(ORDERS_PATH, 'w', encoding='utf-8') as f:
-                                json.dump(orders_info_data, f, indent=4, ensure_ascii=False)
-                            logger.info(f"Успешно обновлен статус уведомления для заказа #{order_id_funpay}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при сохранении статуса уведомления для заказа #{order_id_funpay}: {e}")
+    def __init__(self, c: Cardinal):
+        self.c = c
+        self.__queue: List[Tuple[float, int, str]] = []  # Куча (время проверки, порядковый номер, ID заказа FunPay).
+        self.__orders: Dict[str, Dict] = {}  # {ID заказа FunPay: данные заказа}
+        self.__paused: Dict[str, float] = {}  # {номер сервиса: время, до которого проверки приостановлены}
+        self.__rate_limits: Dict[str, int] = {}  # {номер сервиса: кол-во ответов 429 подряд}
+        # {номер сервиса: время, до которого заказы проверяются по одному} - сервис не вернул статусы пачкой.
+        self.__no_batch: Dict[str, float] = {}
+        self.__counter = itertools.count()
+        self.__cond = threading.Condition()
+        self.__thread: Optional[threading.Thread] = None
+
+    def add(self, twiboost_order_id: int, buyer_chat_id: int, link: str, order_id_funpay: str,
+            service_number: int | str, delay: float = 0):
+        """
+        Ставит заказ в очередь проверки (если заказ уже в очереди - переносит его проверку).
+        """
+        order = {"twiboost_id": twiboost_order_id, "chat_id": buyer_chat_id, "link": link,
+                 "order_id": str(order_id_funpay), "service_number": str(service_number), "errors": 0}
+        with self.__cond:
+            self.__orders[order["order_id"]] = order
+            self.__push(order, time.time() + delay)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__loop, daemon=True, name="auto_smm-status")
+                self.__thread.start()
+            self.__cond.notify()
+
+    def __len__(self) -> int:
+        return len(self.__orders)
+
+    def __push(self, order: Dict, due: float):
+        order["seq"] = next(self.__counter)
+        heapq.heappush(self.__queue, (due, order["seq"], order["order_id"]))
+
+    def __reschedule(self, order: Dict, delay: float):
+        with self.__cond:
+            if self.__orders.get(order["order_id"]) is order:
+                self.__push(order, time.time() + delay)
+
+    def __finish(self, order: Dict):
+        with self.__cond:
+            if self.__orders.get(order["order_id"]) is order:
+                del self.__orders[order["order_id"]]
+
+    def __take_due(self) -> List[Dict] | None:
+        """
+        Ожидает и забирает заказы, время проверки которых подошло. None - плагин остановлен.
+        """
+        with self.__cond:
+            while True:
+                if not RUNNING:
+                    self.__queue.clear()
+                    self.__orders.clear()
+                    self.__thread = None
+                    return None
+                now = time.time()
+                due = []
+                while self.__queue and self.__queue[0][0] <= now:
+                    _, seq, order_id = heapq.heappop(self.__queue)
+                    order = self.__orders.get(order_id)
+                    if order is not None and order["seq"] == seq:
+                        due.append(order)
+                if due:
+                    return due
+                timeout = self.__queue[0][0] - now if self.__queue else STATUS_IDLE_WAIT
+                self.__cond.wait(min(timeout, STATUS_IDLE_WAIT))
+
+    def __loop(self):
+        while (due := self.__take_due()) is not None:
+            try:
+                self.__check(due)
+            except Exception as e:
+                logger.error(f"Ошибка при проверке статусов заказов: {e}")
+                logger.debug("TRACEBACK", exc_info=True)
+                for order in due:
+                    self.__reschedule(order, STATUS_CHECK_INTERVAL)
 
-                order_link = f"https://funpay.com/orders/{order_id_funpay}/"
-                message = (
-                    f"🎉 Ваш заказ успешно завершён!\n"
-                    f"🔢 Номер заказа: {twiboost_order_id}\n"
-                    f"🔗 Подтвердите заказ: {order_link}"
-                )
-                c.send_message(buyer_chat_id, message)
-                logger.info(f"Уведомление о завершении отправлено покупателю {buyer_chat_id} (заказ #{twiboost_order_id}).")
-                update_order_status(order_id_funpay, "completed")
-                return
+    def __check(self, due: List[Dict]):
+        cfg = load_config()
+        by_service: Dict[str, List[Dict]] = {}
+        for order in due:
+            by_service.setdefault(order["service_number"], []).append(order)
 
-            elif status_lower in failed_statuses:
-                refund_order(
-                    c,
-                    order_id_funpay,
-                    buyer_chat_id,
-                    reason="Заказ не выполнен.",
-                    detailed_reason=f"Заказ в сервисе имеет статус '{status_}'."
-                )
-                update_order_status(order_id_funpay, "failed")
-                return
+        for service_number, orders in by_service.items():
+            service_cfg = cfg["services"].get(service_number)
+            if not service_cfg:
+                logger.warning(f"Не найден config.services[{service_number}] — прерываем проверку "
+                               f"{len(orders)} заказов.")
+                for order in orders:
+                    self.__finish(order)
+                continue
 
-            else:
-                logger.info(f"Заказ #{twiboost_order_id} в статусе '{status_}' (осталось: {remains_}).")
-                delay = 300
+            batch_size = 1 if self.__no_batch.get(service_number, 0) > time.time() else STATUS_BATCH_SIZE
+            for i in range(0, len(orders), batch_size):
+                if not RUNNING:
+                    return
+                paused = self.__paused.get(service_number, 0) - time.time()
+                if paused > 0:
+                    for order in orders[i:]:
+                        self.__reschedule(order, paused)
+                    break
+                self.__check_batch(service_number, service_cfg, orders[i:i + batch_size])
 
-        elif response.status_code == 429:
-            logger.warning(f"Получен статус 429 (Too Many Requests) для заказа #{twiboost_order_id}.")
-            delay = 3600
+    def __check_batch(self, service_number: str, service_cfg: Dict, orders: List[Dict]):
+        ids = [str(o["twiboost_id"]) for o in orders]
+        logger.info(f"Проверка статусов {len(ids)} заказов в сервисе {service_number}...")
+        try:
+            statuses = self.__request_statuses(service_cfg, ids)
+        except RateLimited as e:
+            attempt = self.__rate_limits.get(service_number, 0)
+            self.__rate_limits[service_number] = attempt + 1
+            delay = max(e.retry_after or 0, backoff_delay(attempt, base=STATUS_RATE_LIMIT_DELAY, cap=STATUS_MAX_DELAY))
+            logger.warning(f"Получен статус 429 (Too Many Requests) от сервиса {service_number}, "
+                           f"проверки приостановлены на {delay:.0f} сек.")
+            self.__paused[service_number] = time.time() + delay
+            for order in orders:
+                self.__reschedule(order, delay)
+            return
+        except Exception as e:
+            logger.error(f"Ошибка при проверке статусов заказов в сервисе {service_number}: {e}")
+            for order in orders:
+                self.__retry(order)
+            return
+        self.__rate_limits.pop(service_number, None)
+
+        if statuses is None:  # Сервис (вероятно) не поддерживает проверку нескольких заказов за запрос.
+            logger.warning(f"Сервис {service_number} не вернул статусы нескольких заказов за запрос, "
+                           f"заказы проверяются по одному (повтор через {STATUS_NO_BATCH_RETRY // 3600} ч.).")
+            self.__no_batch[service_number] = time.time() + STATUS_NO_BATCH_RETRY
+            for order in orders:
+                self.__reschedule(order, 0)
+            return
 
+        for order in orders:
+            data_ = statuses.get(str(order["twiboost_id"]))
+            if not isinstance(data_, dict) or "error" in data_:
+                logger.error(f"Ошибка при проверке заказа #{order['twiboost_id']}: {data_}")
+                self.__retry(order)
+                continue
+            try:
+                finished = process_order_status(self.c, order["twiboost_id"], order["chat_id"], order["order_id"],
+                                                data_)
+            except Exception as e:
+                logger.error(f"Неизвестная ошибка при проверке заказа #{order['twiboost_id']}: {e}")
+                self.__retry(order)
+                continue
+            if finished:
+                self.__finish(order)
+            else:
+                order["errors"] = 0
+                self.__reschedule(order, STATUS_CHECK_INTERVAL)
+
+    def __retry(self, order: Dict):
+        delay = backoff_delay(order["errors"], base=STATUS_CHECK_INTERVAL, cap=STATUS_MAX_DELAY)
+        order["errors"] += 1
+        logger.info(f"Повторная проверка заказа #{order['twiboost_id']} через {delay:.0f} сек.")
+        self.__reschedule(order, delay)
+
+    @staticmethod
+    def __request_statuses(service_cfg: Dict, ids: List[str]) -> Dict[str, Dict] | None:
+        """
+        Запрашивает статусы заказов.
+
+        :return: {ID заказа в сервисе: статус} или None, если сервис не вернул статусы по ID заказов.
+        """
+        api_url, api_key = service_cfg["api_url"], service_cfg["api_key"]
+        if len(ids) == 1:
+            url_ = f"{api_url}?action=status&order={ids[0]}&key={api_key}"
         else:
-            logger.error(f"Ошибка при проверке заказа #{twiboost_order_id}: {response.status_code}, {response.text}")
-            delay = 300
-
-    except requests.exceptions.RequestException as req_ex:
-        logger.error(f"RequestException при проверке #{twiboost_order_id}: {req_ex}")
-        delay = min(300 * (2 ** (attempt - 1)), 3600)
-    except Exception as ex:
-        logger.error(f"Неизвестная ошибка при проверке заказа #{twiboost_order_id}: {ex}")
-        delay = 300
-
-    logger.info(f"Повторная проверка заказа #{twiboost_order_id} через {delay} сек.")
-    if RUNNING:  # Проверка перед запуском нового таймера
-        threading.Timer(
-            delay,
-            check_order_status,
-            args=(c, twiboost_order_id, buyer_chat_id, link, order_id_funpay, attempt + 1)
-        ).start()
+            url_ = f"{api_url}?action=status&orders={','.join(ids)}&key={api_key}"
+        response = http_pool.get_pool().get(url_, timeout=10)
+        logger.debug(f"Запрос статусов {len(ids)} заказов вернул статус {response.status_code}")
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            raise RateLimited(float(retry_after) if retry_after.isdigit() else None)
+        if response.status_code != 200:
+            raise Exception(f"{response.status_code}, {response.text}")
+        data_ = response.json()
+        if len(ids) == 1:
+            return {ids[0]: data_}
+        if isinstance(data_, dict) and "error" in data_ and not any(i in data_ for i in ids):
+            # Ошибка запроса (неверный ключ, техработы и т.д.), а не отсутствие поддержки пачек.
+            raise Exception(f"Ошибка сервиса: {data_['error']}")
+        if not isinstance(data_, dict) or not any(i in data_ for i in ids):
+            return None
+        return data_
+
+def get_status_poller(c: Cardinal) -> OrderStatusPoller:
+    global STATUS_POLLER
+    if STATUS_POLLER is None:
+        STATUS_POLLER = OrderStatusPoller(c)
+    return STATUS_POLLER
+
+def check_order_status(c: Cardinal, twiboost_order_id: int, buyer_chat_id: int, link: str, order_id_funpay: str,
+                       service_number: int | str):
+    """
+    Ставит заказ в очередь проверки статуса на соответствующем SMM-сервисе.
+    """
+    if not RUNNING:
+        logger.info(f"Плагин остановлен, заказ #{twiboost_order_id} не будет проверяться.")
+        return
+    get_status_poller(c).add(twiboost_order_id, buyer_chat_id, link, order_id_funpay, service_number)
 
 def start_order_checking(c: Cardinal):
     if not RUNNING:  
         return
         
     try:
-        all_data = load_orders_data()
+        open_orders = get_ledger().get_open_orders()
     except Exception as e:
         logger.error(f"Ошибка при загрузке данных о заказах в start_order_checking: {e}")
-        all_data = []
-    
-    orders_info_data = []
-    file_lock = threading.Lock()
-    
-    try:
-        with file_lock:
-            if os.path.exists(ORDERS_PATH):
-                try:
-                    with open(ORDERS_PATH, 'r', encoding='utf-8') as f:
-                        file_content = f.read()
-                        if not file_content.strip():
-                            orders_info_data = []
-                        else:
-                            orders_info_data = json.loads(file_content)
-                except (json.JSONDecodeError, Exception) as e:
-                    logger.error(f"Ошибка при чтении файла {ORDERS_PATH} в start_order_checking: {e}")
-                    orders_info_data = []
-    except Exception as e:
-        logger.error(f"Ошибка при доступе к файлу {ORDERS_PATH} в start_order_checking: {e}")
-        orders_info_data = []
-    
-    for od_ in all_data:
+        open_orders = []
+
+    poller = get_status_poller(c)
+    for od_ in open_orders:
         try:
-            if RUNNING and od_["status"].lower() != "completed" and not od_.get("is_refunded", False):
-                order_info = next((o for o in orders_info_data if str(o["order_id"]) == str(od_["order_id"])), None)
-                if order_info and order_info.get("completed_notification_sent", False):
-                    logger.info(f"Пропуск проверки заказа #{od_['order_id']}, уведомление уже отправлено")
-                    continue
-                
-                threading.Thread(
-                    target=check_order_status,
-                    args=(c, od_["id_zakaz"], od_["chat_id"], od_["customer_url"], od_["order_id"])
-                ).start()
-                time.sleep(0.5)
+            if RUNNING:
+                poller.add(od_["id_zakaz"], od_["chat_id"], od_["customer_url"], od_["order_id"],
+                           od_["service_number"])
         except Exception as e:
             logger.error(f"Ошибка при обработке заказа в start_order_checking: {e}")
             continue
+    logger.info(f"Проверяется статус {len(poller)} заказов.")
+
+def get_lot_matcher() -> LotNameMatcher:
+    """
+    :return: индекс названий лотов текущей конфигурации (пересобирается после загрузки / сохранения конфигурации).
+    """
+    global LOT_MATCHER
+    with CONFIG_CACHE.lock:
+        lot_map = load_config().setdefault("lot_mapping", {})
+        if LOT_MATCHER is None or LOT_MATCHER.lot_mapping is not lot_map:
+            LOT_MATCHER = LotNameMatcher(lot_map)
+        return LOT_MATCHER
 
 def get_tg_id_by_description(description: str, order_amount: int) -> Tuple[int, int, int] | None:
-    cfg = load_config()
-    lot_map = cfg.get("lot_mapping", {})
-    for lot_key, lot_data in lot_map.items():
-        lot_name = lot_data["name"]
-        if re.search(re.escape(lot_name), description, re.IGNORECASE):
-            service_id = lot_data["service_id"]
-            base_q = lot_data["quantity"]
-            real_q = base_q * order_amount
-            srv_num = lot_data.get("service_number", 1)
-            return service_id, real_q, srv_num
-    return None
+    if not (found := get_lot_matcher().match(description)):
+        return None
+    lot_key, lot_data = found
+    service_id = lot_data["service_id"]
+    base_q = lot_data["quantity"]
+    real_q = base_q * order_amount
+    srv_num = lot_data.get("service_number", 1)
+    return service_id, real_q, srv_num
 
 def is_valid_link(link: str) -> Tuple[bool, str]:
     valid_links = load_valid_links()
@@ -694,7 +1195,7 @@ def is_valid_link(link: str) -> Tuple[bool, str]:
     return False, "❌ Недопустимая ссылка."
 
 def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *args):
-    global RUNNING, orders_info, waiting_for_link
+    global RUNNING, orders_info
 
     if not RUNNING and not isinstance(e, NewMessageEvent):
         return
@@ -715,8 +1216,7 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
         m_check = re.match(r'^чек\s+(\d+)$', msg_text.lower())
         if m_check:
             order_num = m_check.group(1)
-            od_ = load_orders_data()
-            found = next((o for o in od_ if str(o["id_zakaz"]) == order_num), None)
+            found = get_order_by_service_id(order_num)
             if not found:
                 c.send_message(msg_chat_id, "❌ Заказ не найден в базе.")
                 return
@@ -729,7 +1229,7 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
             api_key = service_cfg["api_key"]
             url_ = f"{api_url}?action=status&order={order_num}&key={api_key}"
             try:
-                rr = requests.get(url_)
+                rr = http_pool.get_pool().get(url_)
                 rr.raise_for_status()
                 rdata = rr.json()
                 st_ = rdata.get("status", "неизв.")
@@ -746,8 +1246,7 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
         if m_refill:
             order_num = m_refill.group(1)
             c.send_message(msg_chat_id, "🔄 Запрашиваю рефилл...")
-            od_ = load_orders_data()
-            found = next((o for o in od_ if str(o["id_zakaz"]) == order_num), None)
+            found = get_order_by_service_id(order_num)
             if not found:
                 c.send_message(msg_chat_id, "❌ Заказ не найден в базе.")
                 return
@@ -760,7 +1259,7 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
             api_key = service_cfg["api_key"]
             url_ = f"{api_url}?action=refill&order={order_num}&key={api_key}"
             try:
-                rr = requests.get(url_)
+                rr = http_pool.get_pool().get(url_)
                 rr.raise_for_status()
                 rdata = rr.json()
                 st_ = rdata.get("status", 0)
@@ -773,50 +1272,50 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
                 c.send_message(msg_chat_id, f"❌ Ошибка при запросе рефилла: {ex}")
             return
         
-        for order_id, data in list(waiting_for_link.items()):
-            if data["buyer_id"] == msg_author_id:
-                if data["step"] == "await_link":
-                    link_m = re.search(r'(https?://\S+)', msg_text)
-                    if not link_m:
-                        c.send_message(msg_chat_id, "❌ Неверная ссылка, повторите...")
-                        return
-                    link_ = link_m.group(0)
-                    ok, reason = is_valid_link(link_)
-                    if not ok:
-                        c.send_message(msg_chat_id, reason)
-                        return
-                    data["link"] = link_
-                    
-                    cfg = load_config()
-                    confirm_link = cfg.get("confirm_link", True)
-                    
-                    if confirm_link:
-                        data["step"] = "await_confirm"
-                        c.send_message(msg_chat_id, f"✅ Ссылка принята: {link_}\nПодтвердите: + / -")
-                        return
-                    else:
-                        order_data = waiting_for_link.pop(order_id, None)
-                        if order_data:
-                            process_link_without_confirmation(c, order_data)
-                        else:
-                            c.send_message(msg_chat_id, "❌ Заказ уже обработан или не найден.")
-                        return
-
-                elif data["step"] == "await_confirm":
-                    if msg_text.lower() == "+":
-                        order_data = waiting_for_link.pop(order_id, None)
-                        if order_data:
-                            process_link_without_confirmation(c, order_data)
-                        else:
-                            c.send_message(msg_chat_id, "❌ Заказ уже обработан или не найден.")
-                        return
-                    elif msg_text.lower() == "-":
-                        data["step"] = "await_link"
-                        c.send_message(msg_chat_id, "❌ Подтверждение отклонено. Введите другую ссылку.")
-                        return
-                    else:
-                        c.send_message(msg_chat_id, "❌ Используйте + или -. Повторите.")
-                        return
+        if not (found := waiting_for_link.find_by_buyer(msg_author_id)):
+            return
+        order_id, data = found
+        if data["step"] == "await_link":
+            link_m = re.search(r'(https?://\S+)', msg_text)
+            if not link_m:
+                c.send_message(msg_chat_id, "❌ Неверная ссылка, повторите...")
+                return
+            link_ = link_m.group(0)
+            ok, reason = is_valid_link(link_)
+            if not ok:
+                c.send_message(msg_chat_id, reason)
+                return
+
+            cfg = load_config()
+            confirm_link = cfg.get("confirm_link", True)
+
+            if confirm_link:
+                waiting_for_link.update(order_id, link=link_, step="await_confirm")
+                c.send_message(msg_chat_id, f"✅ Ссылка принята: {link_}\nПодтвердите: + / -")
+                return
+            else:
+                order_data = waiting_for_link.pop(order_id, None)
+                if order_data:
+                    process_link_without_confirmation(c, {**order_data, "link": link_})
+                else:
+                    c.send_message(msg_chat_id, "❌ Заказ уже обработан или не найден.")
+                return
+
+        elif data["step"] == "await_confirm":
+            if msg_text.lower() == "+":
+                order_data = waiting_for_link.pop(order_id, None)
+                if order_data:
+                    process_link_without_confirmation(c, order_data)
+                else:
+                    c.send_message(msg_chat_id, "❌ Заказ уже обработан или не найден.")
+                return
+            elif msg_text.lower() == "-":
+                waiting_for_link.update(order_id, step="await_link")
+                c.send_message(msg_chat_id, "❌ Подтверждение отклонено. Введите другую ссылку.")
+                return
+            else:
+                c.send_message(msg_chat_id, "❌ Используйте + или -. Повторите.")
+                return
 
     elif isinstance(e, NewOrderEvent):
         order_ = e.order
@@ -860,7 +1359,7 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
         
         c.send_message(buyer_chat_id, msg_payment)
 
-        waiting_for_link[str(orderID)] = {
+        waiting_for_link.add(str(orderID), {
             "buyer_id": buyer_id,
             "chat_id": buyer_chat_id,
             "service_id": service_id,
@@ -869,7 +1368,7 @@ def auto_smm_handler(c: Cardinal, e: Union[NewMessageEvent, NewOrderEvent], *arg
             "price": orderPrice,
             "service_number": srv_number,
             "step": "await_link"
-        }
+        })
 
 def start_smm(call: types.CallbackQuery):
     global RUNNING, IS_STARTED, ORDER_CHECK_THREAD, AUTO_LOTS_SEND_THREAD, cardinal_instance
@@ -1196,36 +1695,10 @@ def links_menu(call: types.CallbackQuery):
     bot.edit_message_text(txt_, call.message.chat.id, call.message.message_id, parse_mode='HTML', reply_markup=kb_)
 
 def get_statistics():
-    if not os.path.exists(ORDERS_PATH):
+    stats = get_ledger().get_statistics(datetime.now())
+    if not stats["all_time_orders"]:
         return None
-    with open(ORDERS_PATH, 'r', encoding='utf-8') as f:
-        orders = json.load(f)
-
-    now_ = datetime.now()
-    day_ago = now_ - timedelta(days=1)
-    week_ago = now_ - timedelta(days=7)
-    month_ago = now_ - timedelta(days=30)
-
-    day_orders = [o for o in orders if datetime.strptime(o["date"], "%Y-%m-%d %H:%M:%S") >= day_ago]
-    week_orders = [o for o in orders if datetime.strptime(o["date"], "%Y-%m-%d %H:%M:%S") >= week_ago]
-    month_orders = [o for o in orders if datetime.strptime(o["date"], "%Y-%m-%d %H:%M:%S") >= month_ago]
-    all_orders = orders
-
-    day_total = sum(o["summa"] for o in day_orders)
-    week_total = sum(o["summa"] for o in week_orders)
-    month_total = sum(o["summa"] for o in month_orders)
-    all_total = sum(o["summa"] for o in all_orders)
-
-    return {
-        "day_orders": len(day_orders),
-        "day_total": day_total,
-        "week_orders": len(week_orders),
-        "week_total": week_total,
-        "month_orders": len(month_orders),
-        "month_total": month_total,
-        "all_time_orders": len(all_orders),
-        "all_time_total": all_total,
-    }
+    return stats
 
 def generate_lots_keyboard(page: int = 0) -> InlineKeyboardMarkup:
     cfg = load_config()
@@ -1568,7 +2041,7 @@ def check_balance_func(call: types.CallbackQuery, service_idx: int):
     url_ = f"{s_['api_url']}?action=balance&key={s_['api_key']}"
     
     try:
-        rr = requests.get(url_, timeout=10)
+        rr = http_pool.get_pool().get(url_, timeout=10)
         rr.raise_for_status()
         d_ = rr.json()
         bal_ = d_.get("balance", "0")
@@ -1881,7 +2354,15 @@ def init_telegram_handlers():
     @bot.callback_query_handler(func=lambda call: call.data == "export_files")
     def export_files(call: types.CallbackQuery):
         chat_id_ = call.message.chat.id
-        files_to_send = [CONFIG_PATH, ORDERS_PATH, ORDERS_DATA_PATH]
+        # Заказы выгружаются из журнала в JSON-файлы прежнего формата.
+        export_folder = os.path.join("storage", "cache", "auto_smm_export")
+        os.makedirs(export_folder, exist_ok=True)
+        files_to_send = [CONFIG_PATH]
+        for path_, data_ in zip((ORDERS_PATH, ORDERS_DATA_PATH), reversed(get_ledger().export())):
+            export_path = os.path.join(export_folder, os.path.basename(path_))
+            with open(export_path, 'w', encoding='utf-8') as f:
+                json.dump(data_, f, indent=4, ensure_ascii=False)
+            files_to_send.append(export_path)
         for f_ in files_to_send:
             if os.path.exists(f_):
                 try:
@@ -1908,10 +2389,7 @@ def init_telegram_handlers():
 
     @bot.callback_query_handler(func=lambda call: call.data == "delete_orders")
     def delete_orders(call: types.CallbackQuery):
-        if os.path.exists(ORDERS_PATH):
-            os.remove(ORDERS_PATH)
-        if os.path.exists(ORDERS_DATA_PATH):
-            os.remove(ORDERS_DATA_PATH)
+        get_ledger().clear()
         bot.edit_message_text("🗑️ Файлы заказов удалены.", call.message.chat.id, call.message.message_id)
         files_menu(call)
 
@@ -2231,7 +2709,7 @@ def send_order_started_notification(c: Cardinal, order_id_funpay: str, twiboost_
         
     try:
         status_url = f"{api_url}?action=status&order={twiboost_id}&key={api_key}"
-        status_resp = requests.get(status_url, timeout=10)
+        status_resp = http_pool.get_pool().get(status_url, timeout=10)
         status_resp.raise_for_status()
         status_data = status_resp.json()
         
@@ -2294,7 +2772,7 @@ def process_link_without_confirmation(c: Cardinal, data: Dict):
     url_req = f"{api_url}?action=add&service={service_id}&link={encoded_link}&quantity={real_amount}&key={api_key}"
 
     try:
-        resp_ = requests.get(url_req)
+        resp_ = http_pool.get_pool().get(url_req, timeout=http_pool.LONG_TIMEOUT)
         resp_.raise_for_status()
         j_ = resp_.json()
         if "order" in j_:
@@ -2323,7 +2801,7 @@ def process_link_without_confirmation(c: Cardinal, data: Dict):
                 real_amount
             )
             
-            check_order_status(c, twiboost_id, buyer_chat_id, link_, order_id_funpay)
+            check_order_status(c, twiboost_id, buyer_chat_id, link_, order_id_funpay, service_number)
 
             msg_confirmation = cfg["messages"]["after_confirmation"].format(
                 twiboost_id=twiboost_id,
@@ -2343,6 +2821,23 @@ def process_link_without_confirmation(c: Cardinal, data: Dict):
             )
 
     except requests.exceptions.RequestException as req_ex:
+        if http_pool.is_ambiguous_error(req_ex):
+            # Запрос отправлен, но ответ не получен: заказ мог быть создан и оплачен. Возврат средств привел бы
+            # к потере денег, а API сервиса не позволяет найти заказ без его ID - статус проверяется вручную.
+            logger.error(f"Нет ответа сервиса на создание заказа #{order_id_funpay}, статус заказа неизвестен: {req_ex}")
+            logger.debug("TRACEBACK", exc_info=True)
+            waiting_for_link.pop(str(order_id_funpay), None)
+            if notification_chat_id := cfg.get("notification_chat_id"):
+                detailed_message = f"""
+⚠️ Нет ответа сервиса на создание заказа #{order_id_funpay}, заказ мог быть создан.
+🔢 Номер заказа: {order_id_funpay}
+🔗 Ссылка: {link_}
+🌐 Сервис: {api_url.split('/')[2] if '//' in api_url else api_url}
+❗ Ошибка: {req_ex}
+❗ Проверьте заказ в панели сервиса и при необходимости оформите возврат вручную: https://funpay.com/orders/{order_id_funpay}/
+                """.strip()
+                bot.send_message(notification_chat_id, detailed_message)
+            return
         logger.error(f"Ошибка сети при создании заказа #{order_id_funpay}: {req_ex}")
         refund_order(
             c,
@@ -2441,4 +2936,11 @@ def auto_start_plugin(c: Cardinal):
 BIND_TO_PRE_INIT = [init_commands]
 BIND_TO_NEW_MESSAGE = [auto_smm_handler]
 BIND_TO_NEW_ORDER = [auto_smm_handler]
-BIND_TO_DELETE = []
\ No newline at end of file
+BIND_TO_DELETE = []
+HANDLER_FILTERS = {
+    # Команды "чек N" / "рефилл N" или ответ покупателя, от которого ожидается ссылка.
+    auto_smm_handler: [
+        {"not_from_me": True, "text_regex": re.compile(r"^(чек|рефилл)\s+\d+$", re.IGNORECASE)},
+        {"not_from_me": True, "active_dialog": lambda m: waiting_for_link.has_buyer(m.author_id)},
+    ]
+}
@@ -2,12 +2,12 @@ import json
 import os
 import re
 import logging
-import requests
 import time
 from datetime import datetime
 from telebot import types
 from FunPayAPI.types import Order
 import datetime
+from Utils import http_pool
 
 API_BASE_URL = "https://api.buysteampoints.com/api"
 
@@ -20,7 +20,7 @@ class SteamPointsAPIClient:
         payload = {"api_key": self.api_key}
         
         try:
-            resp = requests.post(url, json=payload)
+            resp = http_pool.get_pool().post(url, json=payload)
             resp.raise_for_status()
             data = resp.json()
             
@@ -43,7 +43,7 @@ class SteamPointsAPIClient:
         }
         
         try:
-            resp = requests.post(url, json=payload)
+            resp = http_pool.get_pool().post(url, json=payload)
             resp.raise_for_status()
             data = resp.json()
             
@@ -61,7 +61,7 @@ class SteamPointsAPIClient:
         url = f"{API_BASE_URL}/price"
         
         try:
-            resp = requests.get(url)
+            resp = http_pool.get_pool().get(url)
             resp.raise_for_status()
             data = resp.json()
             
@@ -1283,4 +1283,9 @@ def init_commands(c):
 BIND_TO_PRE_INIT    = [init_commands]
 BIND_TO_NEW_ORDER   = [handle_new_order]
 BIND_TO_NEW_MESSAGE = [handle_new_message]
-BIND_TO_DELETE = []
\ No newline at end of file
+BIND_TO_DELETE = []
+HANDLER_FILTERS = {
+    handle_new_order: {"subcategory_ids": [714]},
+    handle_new_message: {"active_dialog": lambda m: any(d["buyer_id"] == m.author_id
+                                                        for d in list(waiting_for_link.values()))},
+}
@@ -17,6 +17,7 @@ from pyrogram.errors.exceptions.bad_request_400 import StargiftUsageLimited
 from pyrogram.enums import ChatType
 from datetime import datetime,timedelta
 import asyncio
+from Utils.lot_matcher import LotNameMatcher
 logger = logging.getLogger("FPC.auto_gifts")
 LOGGER_PREFIX = "[AUTOGIFTS]"
 
@@ -31,6 +32,7 @@ RUNNING = False
 
 config = {}
 lot_mapping = {}
+lot_matcher = LotNameMatcher(lot_mapping)
 waiting_for_lots_upload = set()
 auto_refunds = ""
 
@@ -57,8 +59,20 @@ def save_config(cfg: Dict):
     os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
     with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
         json.dump(cfg, f, ensure_ascii=False, indent=4)
+    update_lot_mapping(cfg)
     logger.info("Конфигурация сохранена.")
 
+def update_lot_mapping(cfg: Dict):
+    """
+    Обновляет сопоставление лотов и индекс их названий.
+    """
+    global lot_mapping, lot_matcher
+    new_mapping = dict(cfg.get("lot_mapping", {}))
+    new_matcher = LotNameMatcher(new_mapping)
+    # Подменяем целиком, а не изменяем на месте: поиск, выполняющийся в другом потоке, дорабатывает со старым
+    # индексом и его сопоставлением (индекс хранит ссылку на свое сопоставление).
+    lot_mapping, lot_matcher = new_mapping, new_matcher
+
 def load_config() -> Dict:
     logger.info("Загрузка конфигурации (gift_lots.json)...")
     if os.path.exists(CONFIG_PATH):
@@ -151,12 +165,11 @@ async def get_amount(gift_id):
 
 
 def get_tg_id_by_description(description: str) -> Tuple[int | None,int | None]:
-    for lot_key, lot_data in lot_mapping.items():
-        lot_name = lot_data["name"]
-        if re.search(re.escape(lot_name), description, re.IGNORECASE):
-            gift_id = lot_data["gift_id"]
-            gift_name = lot_data["gift_name"]
-            return gift_id,gift_name
+    if found := lot_matcher.match(description):
+        lot_key, lot_data = found
+        gift_id = lot_data["gift_id"]
+        gift_name = lot_data["gift_name"]
+        return gift_id,gift_name
     return None,None
 
 def generate_lots_keyboard(page: int = 0) -> InlineKeyboardMarkup:
@@ -398,8 +411,7 @@ def init_commands(c: Cardinal):
 
     cfg = load_config()
     config.update(cfg)
-    lot_mapping.clear()
-    lot_mapping.update(cfg.get("lot_mapping", {}))
+    update_lot_mapping(cfg)
 
 
     def edit_lot(call: types.CallbackQuery, lot_key: str):
@@ -859,30 +871,15 @@ def message_hook(c: Cardinal,e:NewMessageEvent):
                             f"⌛️ Время добавления в очередь: <code>{order_time}</code>\n"
                             f"⌛️ Время выполнения: <code>{time}</code>\n"
                         )
-                        for user_id in get_authorized_users():
-                            bot.send_message(
-                                user_id,
-                                text = text,
-                                parse_mode='HTML',
-                            )
+                        tg.notifier.send_to(get_authorized_users(), text, parse_mode='HTML')
                         queue.pop(buyer_id, None)
                         return
                     except StargiftUsageLimited:
                         logger.error("Этот подарок уже распродан!")
-                        for user_id in get_authorized_users():
-                            bot.send_message(
-                                user_id,
-                                text = text,
-                                parse_mode='HTML',
-                            )
+                        tg.notifier.send_to(get_authorized_users(), text, parse_mode='HTML')
                     except Exception as e:
                         logger.error(f"{LOGGER_PREFIX} Ошибка:{e}")
-                        for user_id in get_authorized_users():
-                            bot.send_message(
-                                user_id,
-                                text = text,
-                                parse_mode='HTML',
-                            )
+                        tg.notifier.send_to(get_authorized_users(), text, parse_mode='HTML')
                         c.send_message(msg_chat_id,"❌ Что-то сломалось!\n📌 Напишите в чате !help чтобы позвать продавца")
                         data["step"] = "await_username"
                         return
@@ -895,12 +892,7 @@ def message_hook(c: Cardinal,e:NewMessageEvent):
                         c.send_message(msg_chat_id,"❌ Баланса не хватило для оплаты,поэтому был осуществлен возврат средств,приношу свои искренние извинения")
                     else:
                         c.send_message(msg_chat_id,"❌ Баланса не хватило для оплаты, возврат средств требует ручного подтверждения. Напишите !help чтобы позвать продавца")
-                        for user_id in get_authorized_users():
-                            bot.send_message(
-                                user_id,
-                                text = f"⚠️ Требуется ручной возврат средств для заказа #{order_id}\n🔗 Перейдите по ссылке, чтобы вернуть деньги: {order_url}",
-                                parse_mode='HTML',
-                            )
+                        tg.notifier.send_to(get_authorized_users(), f"⚠️ Требуется ручной возврат средств для заказа #{order_id}\n🔗 Перейдите по ссылке, чтобы вернуть деньги: {order_url}", parse_mode='HTML')
                     queue.pop(buyer_id, None)
                     state = is_subcat_active(c,3064)
                     if state is False:
@@ -911,13 +903,7 @@ def message_hook(c: Cardinal,e:NewMessageEvent):
                     save_config(cfg)
                     #kb = InlineKeyboardMarkup()
                     #kb.add(InlineKeyboardButton("🔙 Назад", callback_data="to_setting"))
-                    for user_id in get_authorized_users():
-                        bot.send_message(
-                            user_id,
-                            text = f"✅ Звезды закончились,лоты успешно деактивированы",
-                            parse_mode='HTML',
-                            #reply_markup=kb
-                        )
+                    tg.notifier.send_to(get_authorized_users(), f"✅ Звезды закончились,лоты успешно деактивированы", parse_mode='HTML')
                     return
 
 
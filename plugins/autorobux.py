@@ -7,7 +7,8 @@ import uuid
 import re
 import math
 from typing import Dict, List, Optional
-import httpx
+from requests.exceptions import RequestException
+from Utils import http_pool
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, BotCommand
 from FunPayAPI.updater.events import NewMessageEvent
 from FunPayAPI.types import MessageTypes, LotFields
@@ -119,7 +120,7 @@ def get_robux_balance(account: dict) -> int:
     raw = account.get("cookie", "").strip()
     cookie_header = raw if raw.startswith(".ROBLOSECURITY=") else f".ROBLOSECURITY={raw}"
     headers = {"Cookie": cookie_header, "User-Agent": "Mozilla/5.0"}
-    client = httpx.Client()
+    client = http_pool.get_pool()
     try:
         auth_url = "https://users.roblox.com/v1/users/authenticated"
         r = client.get(auth_url, headers=headers, timeout=10)
@@ -143,8 +144,6 @@ def get_robux_balance(account: dict) -> int:
     except Exception as e:
         logger.error(f"Error fetching balance: {e}")
         return -1
-    finally:
-        client.close()
 
 def get_username_sync(account: dict) -> str:
     """
@@ -155,9 +154,7 @@ def get_username_sync(account: dict) -> str:
     cookie_header = raw if raw.startswith(".ROBLOSECURITY=") else f".ROBLOSECURITY={raw}"
     headers = {"Cookie": cookie_header, "User-Agent": "Mozilla/5.0"}
     try:
-        client = httpx.Client()
-        r = client.get(url, headers=headers, timeout=10)
-        client.close()
+        r = http_pool.get_pool().get(url, headers=headers, timeout=10)
         data = r.json()
         logger.debug(f"[User] Data: {data}")
         # используем либо username, либо displayName
@@ -168,20 +165,52 @@ def get_username_sync(account: dict) -> str:
 
 
 # ========== Purchasing ==========
-def purchase_gamepass(account: dict, gamepass_id: int, expected_price: int = 0) -> bool:
+def _auth_headers(account: dict) -> dict:
     raw = account.get("cookie", "").strip()
     cookie_header = raw if raw.startswith(".ROBLOSECURITY=") else f".ROBLOSECURITY={raw}"
-    headers = {
+    return {
         "Cookie":      cookie_header,
         "User-Agent":  "Mozilla/5.0",
     }
 
+
+def check_gamepass_owned(account: dict, gamepass_id: int) -> bool:
+    """Проверяет, есть ли GamePass у аккаунта (после покупки с неизвестным результатом)."""
+    headers = _auth_headers(account)
+    try:
+        me = http_pool.get_pool().get("https://users.roblox.com/v1/users/authenticated", headers=headers)
+        user_id = me.json()["id"]
+        resp = http_pool.get_pool().get(
+            f"https://inventory.roblox.com/v1/users/{user_id}/items/GamePass/{gamepass_id}", headers=headers)
+        return bool(resp.json().get("data"))
+    except Exception as e:
+        logger.error(f"[Purchase] ownership check failed: {e}")
+        return False
+
+
+def notify_unknown_purchase(c, order_id, chat_id, gamepass_id: int):
+    """Покупка могла пройти: не возвращаем средства и не покупаем другим аккаунтом, продавец проверяет вручную."""
+    c.send_message(chat_id, "⏳ Roblox не подтвердил покупку GamePass. Продавец проверит заказ и свяжется с вами.")
+    try:
+        c.telegram.bot.send_message(
+            FUNPAY_USER_ID,
+            f"⚠️ Нет ответа Roblox на покупку GamePass {gamepass_id} для заказа #{order_id}: покупка могла пройти. "
+            f"Проверьте вручную, автовозврат не выполнялся."
+        )
+    except Exception as e:
+        logger.error(f"[Purchase] Не удалось отправить уведомление о заказе #{order_id}: {e}")
+
+
+def purchase_gamepass(account: dict, gamepass_id: int, expected_price: int = 0) -> Optional[bool]:
+    """Покупает GamePass. Возвращает True / False, или None, если результат покупки неизвестен."""
+    headers = _auth_headers(account)
+
     logger.info(f"[Purchase] Called purchase_gamepass for GamePass {gamepass_id}")
 
     try:
         # 1) GET product-info
         info_url   = f"https://apis.roblox.com/game-passes/v1/game-passes/{gamepass_id}/product-info"
-        info_resp  = httpx.get(info_url, headers=headers, timeout=10)
+        info_resp  = http_pool.get_pool().get(info_url, headers=headers, timeout=10)
         logger.info(f"[Purchase] product-info → {info_resp.status_code} {info_resp.text}")
         if info_resp.status_code != 200:
             logger.error(f"[Purchase] product-info failed: {info_resp.status_code}")
@@ -204,7 +233,7 @@ def purchase_gamepass(account: dict, gamepass_id: int, expected_price: int = 0)
 
         # 3) fetch CSRF token
         purchase_url = f"https://economy.roblox.com/v1/purchases/products/{product_id}"
-        token_resp   = httpx.post(purchase_url, headers=headers, timeout=10)
+        token_resp   = http_pool.get_pool().post(purchase_url, headers=headers, timeout=10)
         csrf_token   = token_resp.headers.get("x-csrf-token")
         logger.info(f"[Purchase] csrf-fetch → {token_resp.status_code}, token={csrf_token}")
         if not csrf_token:
@@ -223,7 +252,17 @@ def purchase_gamepass(account: dict, gamepass_id: int, expected_price: int = 0)
             "expectedSellerId":  seller_id,
         }
         logger.info(f"[Purchase] sending payload: {payload}")
-        purchase_resp = httpx.post(purchase_url, headers=purchase_headers, json=payload, timeout=10)
+        try:
+            purchase_resp = http_pool.get_pool().post(purchase_url, headers=purchase_headers, json=payload,
+                                                      timeout=http_pool.LONG_TIMEOUT)
+        except RequestException as e:
+            if not http_pool.is_ambiguous_error(e):
+                raise
+            logger.error(f"[Purchase] no response to purchase request, outcome unknown: {e}")
+            if check_gamepass_owned(account, gamepass_id):
+                logger.info("[Purchase] GamePass is owned by the account - transaction succeeded")
+                return True
+            return None
         logger.info(f"[Purchase] final → {purchase_resp.status_code} {purchase_resp.text}")
 
         # parse JSON response
@@ -275,9 +314,12 @@ class PaymentProcessor:
             return
         success = False
         for account in ACCOUNTS:
-            if purchase_gamepass(account, gid):
-                success = True
+            success = purchase_gamepass(account, gid)
+            if success is not False:  # None - результат неизвестен, другими аккаунтами не покупаем.
                 break
+        if success is None:
+            notify_unknown_purchase(c, order['order_id'], buyer_id, gid)
+            return
         if success:
             msg = f"✅ Заказ #{order['order_id']} выполнен: gamepass {gid}. После проверки подтвердите выполнение заказа!"
             logger.info(f"[Processor] {msg}")
@@ -402,7 +444,7 @@ def handle_new_message(c, e, *args):
     # Проверяем цену GamePass
     try:
         info_url = f"https://apis.roblox.com/game-passes/v1/game-passes/{gamepass_id}/product-info"
-        resp = httpx.get(info_url, timeout=10)
+        resp = http_pool.get_pool().get(info_url, timeout=10)
         logger.debug(f"[handle_new_message] 🌐 GamePass info → {resp.status_code} {resp.text[:200]}")
         if resp.status_code != 200:
             raise Exception(f"Status {resp.status_code}: {resp.text}")
@@ -425,11 +467,16 @@ def handle_new_message(c, e, *args):
     # Покупаем GamePass
     success = False
     for acc in ACCOUNTS:
-        if purchase_gamepass(acc, gamepass_id, expected_price):
-            success = True
+        success = purchase_gamepass(acc, gamepass_id, expected_price)
+        if success is not False:  # None - результат неизвестен, другими аккаунтами не покупаем.
             break
 
-    if success:
+    if success is None:
+        notify_unknown_purchase(c, order_id, chat_id, gamepass_id)
+        # Удаляем заказ, чтобы повторно отправленный ID не привел ко второй покупке
+        orders.pop(author_id)
+        save_orders(orders)
+    elif success:
         c.send_message(chat_id, f"✅ Заказ #{order_id} выполнен: GamePass {gamepass_id} куплен! Не забудьте подтвердить заказ!")
         # Удаляем заказ после успешной покупки
         orders.pop(author_id)
@@ -560,6 +607,11 @@ def handle_debug_gamepass_id(c, m):
         BOT.send_message(m.chat.id, res_txt)
         c.send_message(m.chat.id, res_txt)
 
+        if result is None:
+            unknown_txt = f"⚠️ Debug: нет ответа на покупку GamePass {gid}, результат неизвестен — проверьте вручную."
+            BOT.send_message(m.chat.id, unknown_txt)
+            c.send_message(m.chat.id, unknown_txt)
+            return
         if result:
             ok_txt = f"✅ Debug: покупка GamePass {gid} за {price} Robux — УСПЕШНА."
             BOT.send_message(m.chat.id, ok_txt)
@@ -807,4 +859,8 @@ BIND_TO_PRE_INIT    = [init_commands]
 BIND_TO_NEW_ORDER   = [handle_new_order]
 BIND_TO_NEW_MESSAGE = [handle_new_message]
 BIND_TO_DELETE      = []
+HANDLER_FILTERS     = {
+    handle_new_order:   {"subcategory_ids": [99]},
+    handle_new_message: {"not_from_me": True, "message_types": [MessageTypes.NON_SYSTEM]},
+}
 # End of plugin
@@ -14,6 +14,7 @@ from FunPayAPI.updater.events import NewMessageEvent, NewOrderEvent, OrderStatus
 from FunPayAPI.types import MessageTypes, OrderStatuses
 from FunPayAPI.common.exceptions import RequestFailedError
 from locales.localizer import Localizer
+from Utils import outbox
 from os.path import exists
 
 import tg_bot.static_keyboards
@@ -142,7 +143,7 @@ def time_unit_label(unit: int) -> str:
 def safe_send_message(cardinal: Cardinal, chat_id: int, text: str, attempts: int = 3) -> bool:
     for i in range(attempts):
         try:
-            cardinal.send_message(chat_id, text)
+            cardinal.send_message(chat_id, text, priority=outbox.REMINDER)
             return True
         except RequestFailedError as e:
             if e.status_code == 502:
@@ -229,15 +230,8 @@ def reminder_loop(cardinal: Cardinal):
                                     "Открыть заказ", url=f"https://funpay.com/orders/{oid}/"
                                 )
                             )
-                            for c_id in SETTINGS["tg_reminders_chats"]:
-                                try:
-                                    cardinal.telegram.bot.send_message(
-                                        c_id, notify_txt, parse_mode="HTML", reply_markup=kb
-                                    )
-                                except Exception as e:
-                                    logger.warning(
-                                        f"[ConfirmReminder] Ошибка уведомления чата {c_id}: {e}"
-                                    )
+                            cardinal.telegram.notifier.send_to(SETTINGS["tg_reminders_chats"], notify_txt, kb,
+                                                               parse_mode="HTML")
                     else:
                         logger.warning(f"[ConfirmReminder] 502 => не смогли отправить #{oid} (3 попытки).")
                 except Exception as ex:
@@ -1,8 +1,8 @@
 from __future__ import annotations
 import json
-from threading import Thread
 from typing import TYPE_CHECKING
 from Utils import cardinal_tools
+from Utils import outbox
 from locales.localizer import Localizer
 
 if TYPE_CHECKING:
@@ -60,7 +60,7 @@ def new_greetings_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChang
     Отправляет приветственное сообщение.
     """
 
-    if not c.MAIN_CFG["Greetings"].getboolean("sendGreetings"):
+    if not c.settings.greetings_enabled:
         return
     if not c.old_mode_enabled:
         if isinstance(e, LastChatMessageChangedEvent):
@@ -72,17 +72,17 @@ def new_greetings_handler(c: Cardinal, e: NewMessageEvent | LastChatMessageChang
         chat_id, chat_name, mtype, its_me, badge = obj.id, obj.name, obj.last_message_type, not obj.unread, None
 
     if any([chat_id in c.old_users, its_me, mtype == MessageTypes.DEAR_VENDORS, badge is not None,
-            (mtype is not MessageTypes.NON_SYSTEM and c.MAIN_CFG["Greetings"].getboolean("ignoreSystemMessages"))]):
+            (mtype is not MessageTypes.NON_SYSTEM and c.settings.greetings_ignore_system_messages)]):
         return
 
     logger.info(_("log_sending_greetings", chat_name, chat_id))
-    text = cardinal_tools.format_msg_text(c.MAIN_CFG["Greetings"]["greetingsText"], obj)
+    text = cardinal_tools.format_msg_text(c.settings.greetings_text, obj)
     status_t = time.time() - SETTINGS["time"]
     last = time.time() - last_action_time
     logger.info(f"[STATUS] Приветственное сообщение переопределено плагином Status Plugin")
-    Thread(target=c.send_message,
-           args=(chat_id, text + f"\n\n🚦 Статус: {SETTINGS['status']} (установлен {time_to_str(status_t)} назад)\n"
-                                 f"⌛ Последнее действие: {time_to_str(last)} назад", chat_name), daemon=True).start()
+    c.queue_message(chat_id, text + f"\n\n🚦 Статус: {SETTINGS['status']} (установлен {time_to_str(status_t)} назад)\n"
+                                    f"⌛ Последнее действие: {time_to_str(last)} назад", chat_name,
+                    priority=outbox.GREETING)
 
 
 def activate_plugin(c: Cardinal, *args):
@@ -95,6 +95,7 @@ def activate_plugin(c: Cardinal, *args):
         if f.__name__ == "greetings_handler" and f.__module__ == "handlers" and f.plugin_uuid is None:
             c.new_message_handlers[i] = new_greetings_handler
             c.new_message_handlers[i].plugin_uuid = UUID
+    c.rebuild_handler_tables()
 
 
 def init(cardinal: Cardinal):
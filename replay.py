@@ -0,0 +1,246 @@
+"""
+Воспроизводит журнал событий FunPay (записывается при FPC_RECORD_EVENTS=1) через Cardinal.process_events и все
+зарегистрированные хэндлеры. Запросы к FunPay не выполняются: вместо FunPayAPI.Account используется заглушка.
+Используется для нагрузочного тестирования изменений handlers.py и плагинов на реальном потоке событий.
+
+Воспроизведение выполняется в песочнице: configs, storage и plugins копируются во временную папку (товары, журналы
+и базы плагинов установки не изменяются), Telegram отключен, а все HTTP-запросы (http_pool, requests, telebot)
+блокируются - платные API плагинов не вызываются.
+
+Пример: python replay.py storage/cache/events.journal --speed 10 --plugins
+"""
+
+from collections import Counter
+from threading import Lock
+from urllib.parse import urlsplit
+import argparse
+import logging.config
+import tempfile
+import shutil
+import time
+import sys
+import os
+
+import requests
+
+import Utils.config_loader as cfg_loader
+from Utils import http_pool
+from Utils.logger import LOGGER_CONFIG
+from Utils.event_journal import read_journal
+from cardinal import Cardinal
+import announcements
+import handlers
+
+logger = logging.getLogger("main")
+
+
+class ReplayAccount:
+    """
+    Заглушка FunPayAPI.Account: не выполняет запросов к FunPay, считает вызовы методов и имитирует задержку сети.
+    Все методы возвращают None.
+    """
+
+    def __init__(self, account_id: int, username: str, latency: float = 0.0):
+        """
+        :param account_id: ID аккаунта, на котором записан журнал.
+        :param username: никнейм аккаунта.
+        :param latency: имитируемая задержка каждого запроса (сек).
+        """
+        self.id = account_id
+        self.username = username
+        self.latency = latency
+        self.interlocutor_ids = {}
+        self.is_initiated = True
+        self.calls = Counter()
+        self.__calls_lock = Lock()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            with self.__calls_lock:
+                self.calls[name] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return None
+
+        return method
+
+
+class ReplayRunner:
+    """
+    Заглушка FunPayAPI.Runner: отдает события из журнала с исходными интервалами, ускоренными в speed раз.
+    """
+
+    def __init__(self, events, speed: float):
+        """
+        :param events: итератор (время получения, runner_tag, событие).
+        :param speed: множитель скорости (0 - без пауз между событиями).
+        """
+        self.events = events
+        self.speed = speed
+        self.count = 0
+
+    def listen(self, *args, **kwargs):
+        start, first = time.perf_counter(), None
+        for received, _, event in self.events:
+            if self.speed:
+                if first is None:
+                    first = received
+                if (delay := (received - first) / self.speed - (time.perf_counter() - start)) > 0:
+                    time.sleep(delay)
+            self.count += 1
+            yield event
+
+
+class ReplayHttpPool(http_pool.HttpPool):
+    """
+    Заглушка общего пула HTTP-сессий (Cardinal.http, http_pool.get_pool()): запросы не выполняются
+    (requests.ConnectionError), вызовы считаются по хостам.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+        self.__calls_lock = Lock()
+
+    def count(self, method: str, url: str) -> None:
+        with self.__calls_lock:
+            self.calls[f"{method.upper()} {urlsplit(url).netloc}"] += 1
+
+    def request(self, method: str, url: str, use_proxy: bool = False, **kwargs) -> requests.Response:
+        self.count(method, url)
+        raise requests.exceptions.ConnectionError(f"Сетевые запросы при воспроизведении отключены: {urlsplit(url).netloc}")  # locale
+
+
+def block_network(pool: ReplayHttpPool) -> None:
+    """
+    Подменяет общий пул HTTP-сессий заглушкой и блокирует запросы в обход него (requests, telebot).
+    """
+    http_pool.set_pool(pool)
+
+    def request(session, method, url, *args, **kwargs):
+        pool.count(method, url)
+        raise requests.exceptions.ConnectionError(f"Сетевые запросы при воспроизведении отключены: {urlsplit(url).netloc}")  # locale
+
+    requests.Session.request = request
+
+
+def make_sandbox(root: str) -> str:
+    """
+    Копирует configs, storage и plugins установки во временную папку.
+
+    :param root: папка установки.
+
+    :return: путь до песочницы.
+    """
+    sandbox = tempfile.mkdtemp(prefix="fpc_replay_")
+    ignore = shutil.ignore_patterns("__pycache__", f"{os.path.basename(Cardinal.EVENTS_JOURNAL_PATH)}*")
+    for folder in ("configs", "storage", "plugins"):
+        if os.path.isdir(src := os.path.join(root, folder)):
+            shutil.copytree(src, os.path.join(sandbox, folder), ignore=ignore)
+    return sandbox
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Воспроизведение журнала событий FunPay Cardinal.")  # locale
+    parser.add_argument("journal", nargs="?", default=Cardinal.EVENTS_JOURNAL_PATH,
+                        help="путь до журнала событий")  # locale
+    parser.add_argument("--speed", default="1",
+                        help="множитель скорости воспроизведения (1, 10, ...) или max")  # locale
+    parser.add_argument("--plugins", action="store_true", help="загрузить плагины")  # locale
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="имитируемая задержка запросов к FunPay (мс)")  # locale
+    parser.add_argument("--top", type=int, default=20, help="кол-во хэндлеров в отчете")  # locale
+    parser.add_argument("--output", default="storage/cache/replay_stats.json",
+                        help="путь для сохранения статистики хэндлеров")  # locale
+    parser.add_argument("--keep-sandbox", action="store_true",
+                        help="не удалять папку песочницы после воспроизведения")  # locale
+    return parser.parse_args()
+
+
+def print_report(crd: Cardinal, account: ReplayAccount, http: ReplayHttpPool, runner: ReplayRunner, elapsed: float,
+                 top: int):
+    print(f"\nСобытий: {runner.count}, время: {elapsed:.2f} с, "
+          f"пропускная способность: {runner.count / elapsed if elapsed else 0:.1f} событий/с\n")  # locale
+    print(f"{'хэндлер':<60} {'событие':<34} {'вызовов':>8} {'ошибок':>7} "
+          f"{'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'CPU p95':>9}")  # locale
+    for i in crd.handler_stats.snapshot()[:top]:
+        print(f"{i['handler'][-60:]:<60} {i['event']:<34} {i['calls']:>8} {i['errors']:>7} "
+              f"{i['wall_p50_ms']:>9} {i['wall_p95_ms']:>9} {i['wall_p99_ms']:>9} {i['cpu_p95_ms']:>9}")
+    if account.calls:
+        print("\nВызовы FunPayAPI.Account: " +
+              ", ".join(f"{k}={v}" for k, v in account.calls.most_common()))  # locale
+    if http.calls:
+        print("Заблокированные HTTP-запросы: " +
+              ", ".join(f"{k}={v}" for k, v in http.calls.most_common()))  # locale
+    print("\nОчереди: " + "; ".join(f"{name}: " + ", ".join(f"{k}={v}" for k, v in lane.items())
+                                     for name, lane in crd.executor.stats().items()))  # locale
+    print("Исходящие сообщения: " + ", ".join(f"{k}={v}" for k, v in crd.outbox.stats().items()))  # locale
+
+
+def main():
+    args = parse_args()
+    root = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(root)
+    logging.config.dictConfig(LOGGER_CONFIG)
+    logging.raiseExceptions = False
+    journal, output = os.path.abspath(args.journal), os.path.abspath(args.output)
+
+    try:
+        header, events = read_journal(journal)
+    except (OSError, ValueError) as e:
+        logger.error(f"Не удалось открыть журнал событий: {e}")  # locale
+        sys.exit(1)
+
+    http = ReplayHttpPool()
+    block_network(http)
+    sandbox = make_sandbox(root)
+    os.chdir(sandbox)
+    logger.info(f"Песочница воспроизведения: {sandbox}")  # locale
+    try:
+        replay(args, header, events, http, journal, output)
+    finally:
+        os.chdir(root)
+        if not args.keep_sandbox:
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+
+def replay(args, header: dict, events, http: ReplayHttpPool, journal: str, output: str):
+    speed = 0 if args.speed == "max" else float(args.speed)
+    main_cfg = cfg_loader.load_main_config("configs/_main.cfg")
+    main_cfg["Telegram"]["enabled"] = "0"
+    main_cfg["Proxy"]["enable"] = "0"
+    ar_cfg = cfg_loader.load_auto_response_config("configs/auto_response.cfg")
+    raw_ar_cfg = cfg_loader.load_raw_auto_response_config("configs/auto_response.cfg")
+    ad_cfg = cfg_loader.load_auto_delivery_config("configs/auto_delivery.cfg")
+
+    crd = Cardinal(main_cfg, ad_cfg, ar_cfg, raw_ar_cfg, "replay")
+    account = ReplayAccount(header["account_id"], header["username"], args.latency / 1000)
+    runner = ReplayRunner(events, speed)
+    crd.account = account
+    crd.runner = runner
+    crd.profile = crd.tg_profile = header["profile"]
+
+    crd.add_handlers_from_plugin(handlers)
+    crd.add_handlers_from_plugin(announcements)
+    if args.plugins:
+        crd.load_plugins()
+        crd.add_handlers()
+    crd.run_handlers(crd.pre_init_handlers, (crd,))
+    crd.rebuild_handler_tables()
+    crd.handler_stats.reset()
+
+    logger.info(f"Воспроизвожу {journal} (аккаунт {header['username']}, скорость: {args.speed})...")  # locale
+    start = time.perf_counter()
+    crd.process_events()
+    elapsed = time.perf_counter() - start
+
+    crd.handler_stats.dump(output)
+    print_report(crd, account, http, runner, elapsed, args.top)
+    print(f"\nПолная статистика: {output}")  # locale
+
+
+if __name__ == "__main__":
+    main()
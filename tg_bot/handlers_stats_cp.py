@@ -0,0 +1,54 @@
+"""
+В данном модуле описана команда Telegram для просмотра статистики выполнения хэндлеров.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cardinal import Cardinal
+
+from tg_bot import utils
+from telebot.types import Message
+import logging
+
+logger = logging.getLogger("TGBot")
+
+TOP_HANDLERS = 10  # Кол-во самых медленных хэндлеров в сообщении.
+
+
+def init_handlers_stats_cp(crd: Cardinal, *args):
+    tg = crd.telegram
+    bot = tg.bot
+
+    def send_handlers_stats(m: Message):
+        stats = crd.handler_stats.snapshot()
+        try:
+            crd.handler_stats.dump()
+        except:
+            logger.warning("Не удалось сохранить статистику хэндлеров.")  # locale
+            logger.debug("TRACEBACK", exc_info=True)
+
+        if not stats:
+            bot.send_message(m.chat.id, "📊 Статистика хэндлеров пока пуста.")  # locale
+            return
+
+        text = "📊 <b>Самые медленные хэндлеры (p50 / p95 / p99, мс):</b>\n\n"  # locale
+        for i in stats[:TOP_HANDLERS]:
+            plugin = crd.plugins[i["plugin_uuid"]].name if i["plugin_uuid"] in crd.plugins else "FPC"
+            text += f"<code>{utils.escape(i['handler'])}</code> ({utils.escape(plugin)}, {i['event']})\n" \
+                    f"  ⏱ {i['wall_p50_ms']} / {i['wall_p95_ms']} / {i['wall_p99_ms']}, " \
+                    f"CPU: {i['cpu_p95_ms']}, вызовов: {i['calls']}, ошибок: {i['errors']}\n"  # locale
+
+        text += "\n🧵 <b>Очереди:</b>\n"  # locale
+        for name, lane in crd.executor.stats().items():
+            text += f"<code>{name}</code>: " + ", ".join(f"{k}={v}" for k, v in lane.items()) + "\n"
+        text += "\n<i>Полная статистика: storage/cache/handlers_stats.json</i>"  # locale
+        bot.send_message(m.chat.id, text)
+
+    tg.msg_handler(send_handlers_stats, commands=["handlers_stats"])
+    tg.add_command_to_menu("handlers_stats", "Статистика хэндлеров")  # locale
+
+
+BIND_TO_PRE_INIT = [init_handlers_stats_cp]